@@ -4,24 +4,70 @@
     の二つで共通して用いる関数を定義しているプログラム
 """
 import openai
+import httpx
 import os
 import json
+import sqlite3
 import config 
 from datetime import datetime
+from types import SimpleNamespace
+from .response_cache import ResponseCache, make_cache_key
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# 非同期OpenAIクライアント (get_async_client で初回のみ生成)
+_async_client = None
+
 def read_file(filepath):
     """ ファイルの内容を読み込む """
     with open(filepath, "r", encoding="utf-8") as f:
         return f.read()
  
+def read_travel_costs():
+    """ 登録地点間の移動コスト表を読み込む (無効・未作成なら空文字) """
+    if not config.LLM_INCLUDE_TRAVEL_COSTS:
+        return ""
+    try:
+        return read_file(config.TRAVEL_COSTS_PATH)
+    except FileNotFoundError:
+        return ""
+
+def travel_costs_section():
+    """ プロンプトに添付する移動コスト表の節 (表が無ければ空文字) """
+    table = read_travel_costs()
+    return f"### Travel Costs ###\n{table}\n\n" if table else ""
+
+def travel_costs_paths():
+    """ キャッシュキーに含める移動コスト表のパス (表が変われば別の計画として扱う) """
+    return [config.TRAVEL_COSTS_PATH] if config.LLM_INCLUDE_TRAVEL_COSTS else []
+
 def read_json(filepath):
     """ JSONファイルの内容を読み込む """
     with open(filepath, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def get_chat_response(prompt, model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE):
+def read_prompt(prompt_path):
+    """ プロンプトファイルを文字列として読み込む (JSONは整形して文字列にする) """
+    ext = os.path.splitext(prompt_path)[1].lower()
+    if ext == '.json':
+        return json.dumps(read_json(prompt_path), indent=2, ensure_ascii=False)
+    return read_file(prompt_path)
+
+def _format_options(response_format):
+    """ 出力形式の指定 (例: {"type": "json_object"}) があればAPI引数に追加する """
+    return {} if response_format is None else {"response_format": response_format}
+
+def _message_of(response):
+    """
+    応答のメッセージ本文と終了理由を取り出す
+    finish_reason が "stop" 以外 (長さ制限での打ち切りなど) の応答はキャッシュしない
+    """
+    choice = response.choices[0]
+    if choice.finish_reason != "stop":
+        print(f"⚠️ 応答が途中で終了しました (finish_reason={choice.finish_reason})")
+    return SimpleNamespace(content=choice.message.content, finish_reason=choice.finish_reason)
+
+def get_chat_response(prompt, model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE, response_format=None):
     """
     ChatGPT APIでpromptを入力して返信を受け取る
     戻り値: (message_object, usage_object) のタプル
@@ -33,14 +79,171 @@ def get_chat_response(prompt, model=config.OPENAI_MODEL, temperature=config.OPEN
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
             ],
-            temperature = temperature
+            temperature = temperature,
+            **_format_options(response_format)
         )
         # メッセージ本体と、トークン使用量の両方を返す
-        return response.choices[0].message, response.usage
+        return _message_of(response), response.usage
+    except Exception as e:
+        print(f"❌ OpenAI API Error: {e}")
+        return None, None
+
+def get_async_client():
+    """
+    共有の非同期OpenAIクライアントを取得する
+    接続プール (HTTP keep-alive) を使い回すため、プロセス内で1つだけ生成する
+    """
+    global _async_client
+    if _async_client is None:
+        timeout = httpx.Timeout(**config.OPENAI_TIMEOUT)
+        pool = config.OPENAI_CONNECTION_POOL
+        _async_client = openai.AsyncOpenAI(
+            api_key = os.getenv("OPENAI_API_KEY"),
+            timeout = timeout,
+            max_retries = config.OPENAI_MAX_RETRIES,
+            http_client = httpx.AsyncClient(
+                timeout = timeout,
+                limits = httpx.Limits(
+                    max_connections = pool["max_connections"],
+                    max_keepalive_connections = pool["max_keepalive_connections"],
+                    keepalive_expiry = pool["keepalive_expiry"],
+                ),
+            ),
+        )
+    return _async_client
+
+async def get_chat_response_async(prompt, model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE, response_format=None):
+    """
+    get_chat_response の非同期版 (共有クライアントを使用し、キャンセル可能)
+    戻り値: (message_object, usage_object) のタプル
+    """
+    try:
+        response = await get_async_client().chat.completions.create(
+            model = model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature = temperature,
+            **_format_options(response_format)
+        )
+        return _message_of(response), response.usage
     except Exception as e:
         print(f"❌ OpenAI API Error: {e}")
         return None, None
 
+async def get_tool_call_async(prompt, tool, model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE):
+    """
+    Function calling で指定したツールを必ず呼び出させ、その引数を受け取る
+    戻り値: (arguments_json_string, usage_object) のタプル
+    """
+    try:
+        response = await get_async_client().chat.completions.create(
+            model = model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature = temperature,
+            tools = [tool],
+            tool_choice = {"type": "function", "function": {"name": tool["function"]["name"]}}
+        )
+        if response.choices[0].finish_reason == "length":
+            # 長さ制限で打ち切られた引数 (JSON) は使えない
+            print("⚠️ 応答が長さ制限で打ち切られました")
+            return None, response.usage
+        tool_calls = response.choices[0].message.tool_calls
+        arguments = tool_calls[0].function.arguments if tool_calls else None
+        return arguments, response.usage
+    except Exception as e:
+        print(f"❌ OpenAI API Error: {e}")
+        return None, None
+
+async def stream_chat_response(prompt, model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE):
+    """
+    ChatGPT APIの返信をストリーミングで受け取る
+    戻り値: (テキスト断片, usage_object, finish_reason) を順に返す非同期ジェネレータ
+            (usage は最後の断片のみ、finish_reason は終了した断片のみ)
+    途中で通信エラーになった場合は finish_reason が返らないため、最後まで生成されたかを判定できる
+    キャンセルされた場合はストリームを閉じて接続をプールへ返す
+    """
+    try:
+        stream = await get_async_client().chat.completions.create(
+            model = model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature = temperature,
+            stream = True,
+            stream_options = {"include_usage": True}
+        )
+    except Exception as e:
+        print(f"❌ OpenAI API Error: {e}")
+        return
+
+    try:
+        async for chunk in stream:
+            choice = chunk.choices[0] if chunk.choices else None
+            text = choice.delta.content if choice else None
+            yield text or "", chunk.usage, choice.finish_reason if choice else None
+    except Exception as e:
+        print(f"❌ OpenAI API Error: {e}")
+    finally:
+        await stream.close()
+
+# =================================================================
+#  応答キャッシュ (同じオーダーの再生成を省略する)
+# =================================================================
+_response_cache = None
+
+def get_response_cache():
+    """ 応答キャッシュを取得する (無効化されている場合は None) """
+    global _response_cache
+    settings = config.LLM_CACHE
+    if not settings["enabled"]:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(settings["path"], settings["max_entries"], settings["max_bytes"])
+    return _response_cache
+
+def lookup_cached_response(key):
+    """ キャッシュを検索し、ヒットすれば message_object 互換のオブジェクトを返す """
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    try:
+        content = cache.get(key)
+    except sqlite3.Error as e:
+        print(f"⚠️ キャッシュ読み込みエラー: {e}")
+        return None
+    if content is None:
+        return None
+    print("⚡ キャッシュヒット: API呼び出しを省略します")
+    return SimpleNamespace(content=content)
+
+def store_cached_response(key, kind, res):
+    """ 生成結果をキャッシュに保存する (最後まで生成されなかった応答は保存しない) """
+    cache = get_response_cache()
+    if cache is None or not (res and getattr(res, "content", None)):
+        return
+    if getattr(res, "finish_reason", "stop") != "stop":
+        print("⚠️ 応答が途中で終了したため、キャッシュには保存しません")
+        return
+    try:
+        cache.put(key, kind, res.content)
+    except sqlite3.Error as e:
+        print(f"⚠️ キャッシュ書き込みエラー: {e}")
+
+def clear_response_cache(kind=None):
+    """ 応答キャッシュを明示的に削除する。削除件数を返す """
+    cache = get_response_cache()
+    if cache is None:
+        return 0
+    removed = cache.clear(kind)
+    print(f"🧹 応答キャッシュを削除しました ({removed}件)")
+    return removed
+
 def save_response_to_file(res, filepath):
     """ 返信の内容を.txtファイルに書いて保存 """
     if res and hasattr(res, 'content'):
@@ -52,13 +255,15 @@ def save_response_to_file(res, filepath):
     else:
         print("⚠️ Warning: No valid content to save.")
 
-def append_to_script_log(filename, log_filename, max_entries=3):
-    """ スクリプトの内容をログに追記 """
+def append_to_script_log(filename, log_filename, max_entries=3, note=None):
+    """ スクリプトの内容をログに追記 (note があれば先頭にコメントとして付ける) """
     if not os.path.exists(filename):
         return
 
     with open(filename, "r", encoding="utf-8") as f:
         script_content = f.read().strip()
+    if note:
+        script_content = f"# {note}\n{script_content}"
 
     entries = []
     if os.path.exists(log_filename):
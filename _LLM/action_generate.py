@@ -0,0 +1,105 @@
+"""
+    action_generate.py
+    「ユーザータスク」に基づいて、ChatGPT APIの Function calling を使用して
+    行動計画（会話文を含むJSONのアクションリスト）を生成し、保存する
+"""
+import json
+from types import SimpleNamespace
+import config
+
+from .LLM_manager import (
+    read_prompt, get_tool_call_async,
+    make_cache_key, lookup_cached_response, store_cached_response,
+    travel_costs_section, travel_costs_paths,
+    save_response_to_file,
+    append_to_script_log,
+    append_token_usage_log
+)
+from _robot_function.action_plan import (
+    ActionPlanError, build_tool_schema, parse_action_plan, render_script
+)
+
+PROMPT_KEYS = ("action", "task", "talk")
+
+def build_prompt(user_msg):
+    """ アクションリスト用・行動計画用・会話文用のプロンプトとユーザータスクを結合する """
+    # ===== 1. プロンプト読み込み =====
+    try:
+        action_prompt, task_prompt, talk_prompt = (read_prompt(config.PROMPTS[key]) for key in PROMPT_KEYS)
+    except FileNotFoundError as e:
+        print(f"❌ プロンプトファイルが見つかりません: {e.filename}")
+        return None
+
+    # ===== 2. ログコンテンツ =====
+    log_content = ""
+
+    # ===== 3. プロンプト結合 =====
+    return (
+        f"{action_prompt}\n\n"
+        f"### Task Generation Rules ###\n{task_prompt}\n\n"
+        f"### Conversation Rules ###\n{talk_prompt}\n\n"
+        f"{travel_costs_section()}"
+        f"### User Task ###\n{user_msg}\n\n"
+        f"### Log Content ###\n{log_content}"
+    )
+
+def cache_key(user_msg, tool):
+    """ アクションリストのキャッシュキー (ツール定義＝ロボットの公開メソッドの変更も反映する) """
+    return make_cache_key(
+        "action", user_msg, [config.PROMPTS[key] for key in PROMPT_KEYS] + travel_costs_paths(),
+        context=json.dumps(tool, sort_keys=True, ensure_ascii=False)
+    )
+
+def save_result(actions, usage, cached=False):
+    """ アクションリストを保存し、互換性のためスクリプト形式の行動計画・最終スクリプトも書き出す """
+    # ===== 5. レスポンス保存 =====
+    with open(config.LLM_ACTION_PLAN_PATH, "w", encoding="utf-8") as f:
+        json.dump({"actions": actions}, f, indent=2, ensure_ascii=False)
+    save_response_to_file(SimpleNamespace(content=render_script(actions, include_talk=False)), config.LLM_TASK_SCRIPT_PATH)
+    save_response_to_file(SimpleNamespace(content=render_script(actions)), config.LLM_FINAL_SCRIPT_PATH)
+
+    # ===== 6. ログファイル追記 =====
+    append_to_script_log(config.LLM_TASK_SCRIPT_PATH, config.LOGS["task"])
+    append_to_script_log(config.LLM_FINAL_SCRIPT_PATH, config.LOGS["talk"])
+
+    # ===== 7. トークンログ記録 (キャッシュヒット時はAPIを使っていないため記録しない) =====
+    if not cached:
+        append_token_usage_log(usage, config.LOGS["token"])
+
+    print(f"✅ 生成された行動計画を保存しました: {config.LLM_ACTION_PLAN_PATH} ({len(actions)}アクション)")
+
+async def main_async(user_msg):
+    """ 行動計画をアクションリストとして生成・保存する。成功すれば True を返す """
+    print(f"🤖 [Action Generate] アクションリストの生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg)
+    if combined_prompt is None:
+        return False
+
+    tool = build_tool_schema()
+    key = cache_key(user_msg, tool)
+    res = lookup_cached_response(key)
+    usage = None
+    cached = res is not None
+    if cached:
+        arguments = res.content
+    else:
+        # ===== 4. レスポンス取得 (ツール呼び出しの引数としてアクションリストを受け取る) =====
+        arguments, usage = await get_tool_call_async(combined_prompt, tool)
+
+    if arguments is None:
+        print("⚠️ Warning: No valid content to save.")
+        return False
+
+    try:
+        actions = parse_action_plan(arguments)
+    except ActionPlanError as e:
+        print(f"❌ アクションリストがスキーマに一致しません: {e}")
+        if not cached:
+            append_token_usage_log(usage, config.LOGS["token"])
+        return False
+
+    if not cached:
+        store_cached_response(key, "action", SimpleNamespace(content=arguments))
+    save_result(actions, usage, cached=cached)
+    return True
@@ -0,0 +1,111 @@
+"""
+    combined_generate.py
+    「ユーザータスク」に基づいて、行動計画と会話文を1回のChatGPT API呼び出しで生成し、
+    行動計画スクリプトと会話付きスクリプトの両方を保存する
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+import config
+
+from .LLM_manager import (
+    read_prompt, get_chat_response_async,
+    make_cache_key, lookup_cached_response, store_cached_response,
+    travel_costs_section, travel_costs_paths,
+    save_response_to_file,
+    append_to_script_log,
+    append_token_usage_log
+)
+from .script_parser import strip_talk_statements
+
+PROMPT_KEYS = ("combined", "task", "talk")
+
+def build_prompt(user_msg):
+    """ 一括生成用・行動計画用・会話文用のプロンプトとユーザータスクを結合する """
+    # ===== 1. プロンプト読み込み =====
+    try:
+        combined_prompt, task_prompt, talk_prompt = (read_prompt(config.PROMPTS[key]) for key in PROMPT_KEYS)
+    except FileNotFoundError as e:
+        print(f"❌ プロンプトファイルが見つかりません: {e.filename}")
+        return None
+
+    # ===== 2. ログコンテンツ =====
+    log_content = ""
+
+    # ===== 3. プロンプト結合 =====
+    return (
+        f"{combined_prompt}\n\n"
+        f"### Task Generation Rules ###\n{task_prompt}\n\n"
+        f"### Conversation Rules ###\n{talk_prompt}\n\n"
+        f"{travel_costs_section()}"
+        f"### User Task ###\n{user_msg}\n\n"
+        f"### Log Content ###\n{log_content}"
+    )
+
+def cache_key(user_msg):
+    """ 一括生成のキャッシュキー """
+    return make_cache_key("combined", user_msg, [config.PROMPTS[key] for key in PROMPT_KEYS] + travel_costs_paths())
+
+def parse_script(res):
+    """ JSON形式の返信から会話付きスクリプトを取り出す (JSONでなければ本文をそのまま使う) """
+    if not (res and getattr(res, "content", None)):
+        return None
+    try:
+        script = json.loads(res.content)["script"]
+        if isinstance(script, str):
+            return script
+    except (json.JSONDecodeError, KeyError, TypeError):
+        pass
+    print("⚠️ JSON形式の返信ではないため、本文をスクリプトとして扱います")
+    return res.content
+
+def save_result(res, usage, cached=False):
+    """
+    会話付きスクリプトと、発話文を除いた行動計画スクリプトの両方を保存する
+    戻り値: 保存できたか (True/False)
+    """
+    script = parse_script(res)
+    if script is None:
+        print("⚠️ Warning: No valid content to save.")
+    else:
+        # ===== 5. レスポンス保存 (互換性のため両方のファイルを書き出す) =====
+        save_response_to_file(SimpleNamespace(content=strip_talk_statements(script)), config.LLM_TASK_SCRIPT_PATH)
+        save_response_to_file(SimpleNamespace(content=script), config.LLM_FINAL_SCRIPT_PATH)
+
+        # ===== 6. ログファイル追記 =====
+        append_to_script_log(config.LLM_TASK_SCRIPT_PATH, config.LOGS["task"])
+        append_to_script_log(config.LLM_FINAL_SCRIPT_PATH, config.LOGS["talk"])
+
+    # ===== 7. トークンログ記録 (キャッシュヒット時はAPIを使っていないため記録しない) =====
+    if not cached:
+        append_token_usage_log(usage, config.LOGS["token"])
+
+    if script is None:
+        return False
+    print(f"✅ 生成されたスクリプトを保存しました: {config.LLM_FINAL_SCRIPT_PATH}")
+    return True
+
+def main(user_msg):
+    """ main_async() の同期版 """
+    return asyncio.run(main_async(user_msg))
+
+async def main_async(user_msg):
+    """
+    行動計画と会話文を一括生成して保存する (キャンセルすると生成中の通信も中断される)
+    戻り値: 保存できたか (失敗した場合、前回のスクリプトは実行しないこと)
+    """
+    print(f"🤖 [Combined Generate] 行動計画と会話文の一括生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg)
+    if combined_prompt is None:
+        return False
+
+    key = cache_key(user_msg)
+    res = lookup_cached_response(key)
+    if res is not None:
+        return save_result(res, None, cached=True)
+
+    # ===== 4. レスポンス取得 (JSON形式を指定) =====
+    res, usage = await get_chat_response_async(combined_prompt, response_format={"type": "json_object"})
+    store_cached_response(key, "combined", res)
+    return save_result(res, usage)
@@ -0,0 +1,109 @@
+"""
+    response_cache.py
+    LLMの応答キャッシュ (同じオーダーの再生成を省略する)
+    キャッシュキーの作成と、SQLiteに保存する永続キャッシュを定義しているプログラム
+    OpenAI に依存しないため、API キーや通信なしで読み込んで確認できる
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import time
+import unicodedata
+import config
+from contextlib import contextmanager
+
+def normalize_order(user_msg):
+    """ キャッシュキー用にオーダー文を正規化する (全角/半角・空白の揺れを吸収) """
+    text = unicodedata.normalize("NFKC", user_msg)
+    return " ".join(text.split())
+
+def file_hash(filepath):
+    """ ファイル内容のハッシュ値 (プロンプト変更の検知用) """
+    try:
+        with open(filepath, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+def make_cache_key(kind, user_msg, prompt_paths, context="",
+                   model=config.OPENAI_MODEL, temperature=config.OPENAI_TEMPERATURE):
+    """
+    キャッシュキーを作成する
+    オーダー文・プロンプトファイルの内容・モデル・temperature・追加の入力(context)の組み合わせ
+    """
+    payload = json.dumps({
+        "kind": kind,
+        "order": normalize_order(user_msg),
+        "prompts": [file_hash(path) for path in prompt_paths],
+        "context": hashlib.sha256(context.encode("utf-8")).hexdigest(),
+        "model": model,
+        "temperature": temperature,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """ SQLiteに保存する永続キャッシュ (件数・容量の上限を超えたら最終利用が古い順に削除) """
+
+    def __init__(self, path, max_entries, max_bytes):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, kind TEXT, content TEXT,"
+                " size INTEGER, created REAL, last_access REAL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """ 接続を開き、終了時にコミットして閉じる """
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """ キーに対応する内容を返す (無ければ None)。ヒット時は最終利用時刻を更新 """
+        with self._connect() as conn:
+            row = conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, kind, content):
+        """ 内容を保存し、上限を超えた分を削除する """
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, content, size, now, now)
+            )
+            self._evict(conn)
+
+    def clear(self, kind=None):
+        """ キャッシュを削除する (kind指定時はその種類のみ)。削除件数を返す """
+        with self._connect() as conn:
+            if kind:
+                cur = conn.execute("DELETE FROM responses WHERE kind = ?", (kind,))
+            else:
+                cur = conn.execute("DELETE FROM responses")
+            return cur.rowcount
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
@@ -0,0 +1,201 @@
+"""
+    script_parser.py
+    LLMが生成したスクリプトテキストを「トップレベル文」単位に分割する処理を定義しているプログラム
+    ストリーミング生成時に、完成した文から順に実行器へ渡すために使用する
+"""
+import ast
+import json
+
+CODE_FENCE = "```"
+
+# 直前の文の続きとして扱うキーワード (if/try ブロックの後続節)
+CONTINUATION_KEYWORDS = ("elif", "else", "except", "finally")
+
+# 会話文 (発話) を表す関数名
+TALK_FUNCTIONS = ("speak_kachaka", "speak_akari", "speak_log")
+
+# 発話挿入 (talk insert) のロボット名 -> 発話関数の呼び出し
+TALK_INSERT_CALLS = {
+    "kachaka": "await a.speak_kachaka",
+    "akari": "await b.speak_akari",
+}
+
+# ブロックを持つ文 (インデントが戻るまで完成とみなさない)
+COMPOUND_STATEMENTS = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith,
+    ast.Try, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+)
+
+
+def compile_statement(source):
+    """ トップレベルの await を許可してコンパイルする """
+    return compile(source, "<llm_script>", "exec", flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+
+
+def _try_parse(source):
+    """ 構文として完結していれば AST を、未完成なら None を返す """
+    try:
+        return ast.parse(source)
+    except SyntaxError:
+        return None
+
+
+class StatementStreamParser:
+    """ 受信したテキスト断片を行単位で組み立て、完成したトップレベル文を取り出すパーサ """
+
+    def __init__(self, keep_comments=False):
+        """ keep_comments: 文の直前のコメント行をその文に含める (並べ替えてもコメントが文から離れないように) """
+        self.keep_comments = keep_comments
+        self._buffer = ""    # 改行がまだ届いていない未完成の行
+        self._pending = []   # 組み立て中の文の行リスト
+        self._comments = []  # 次の文に付けるコメント行 (keep_comments=True の場合)
+
+    def feed(self, text):
+        """ テキスト断片を追加し、完成したトップレベル文のリストを返す """
+        self._buffer += text
+        statements = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            statements.extend(self._push_line(line))
+        return statements
+
+    def close(self):
+        """ ストリーム終了時に、残っている行を文として確定させて返す """
+        statements = []
+        if self._buffer:
+            statements.extend(self._push_line(self._buffer))
+            self._buffer = ""
+        statement = self._flush()
+        if statement:
+            statements.append(statement)
+        if self._comments:
+            # 最後の文の後にあるコメントは、それだけで1つの項目にする
+            statements.append("\n".join(self._comments))
+            self._comments = []
+        return statements
+
+    def _push_line(self, line):
+        line = line.rstrip()
+        stripped = line.lstrip()
+
+        # コードブロックの囲み (```python など) は無視
+        if stripped.startswith(CODE_FENCE):
+            return []
+
+        # 文の外側にある空行・コメント行は読み飛ばす
+        if not self._pending and (not stripped or stripped.startswith("#")):
+            if self.keep_comments and stripped:
+                self._comments.append(line)
+            return []
+
+        statements = []
+
+        # インデントなしの新しい行が来た時点で、組み立て中のブロック文は完成
+        if self._pending and self._starts_new_statement(line):
+            if _try_parse(self._pending_source()) is not None:
+                statements.append(self._flush())
+
+        self._pending.append(line)
+
+        # 単文は構文が完結した時点で即座に確定する
+        tree = _try_parse(self._pending_source())
+        if tree is not None and tree.body and not isinstance(tree.body[-1], COMPOUND_STATEMENTS):
+            statements.append(self._flush())
+
+        return [s for s in statements if s]
+
+    def _starts_new_statement(self, line):
+        if not line or line[0].isspace() or line.startswith("#"):
+            return False
+        keyword = line.split(None, 1)[0].rstrip(":")
+        return keyword not in CONTINUATION_KEYWORDS
+
+    def _pending_source(self):
+        return "\n".join(self._pending)
+
+    def _flush(self):
+        source = self._pending_source().strip("\n")
+        self._pending = []
+        if not source.strip():
+            return None
+        if self._comments:
+            source = "\n".join(self._comments + [source])
+            self._comments = []
+        return source
+
+
+def split_statements(code, keep_comments=False):
+    """ スクリプト全体をトップレベル文のリストに分割する (keep_comments=True なら直前のコメント行を文に含める) """
+    parser = StatementStreamParser(keep_comments)
+    return parser.feed(code + "\n") + parser.close()
+
+
+def is_talk_statement(statement):
+    """ 文が発話関数の呼び出しのみ (例: await b.speak_akari("...")) かを判定する """
+    tree = _try_parse(statement)
+    if tree is None or len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+        return False
+    call = tree.body[0].value
+    if isinstance(call, ast.Await):
+        call = call.value
+    return (
+        isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Attribute)
+        and call.func.attr in TALK_FUNCTIONS
+    )
+
+
+def strip_talk_statements(code):
+    """ 会話付きスクリプトから発話文を取り除き、行動計画のみのスクリプトを返す """
+    return "\n".join(s for s in split_statements(code) if not is_talk_statement(s))
+
+
+def validate_talk_inserts(inserts, statement_count):
+    """
+    発話挿入リストを検証する
+    index は「この番号の文の直前に話す」を表し、statement_count (末尾の後) まで有効
+    戻り値: (有効な挿入のリスト, 不正な挿入のリスト)
+    """
+    valid, rejected = [], []
+    if not isinstance(inserts, list):
+        return valid, [inserts]
+
+    for insert in inserts:
+        if not isinstance(insert, dict):
+            rejected.append(insert)
+            continue
+        index = insert.get("index")
+        robot = str(insert.get("robot", "")).lower()
+        text = insert.get("text")
+        if (
+            isinstance(index, int) and not isinstance(index, bool)
+            and 0 <= index <= statement_count
+            and robot in TALK_INSERT_CALLS
+            and isinstance(text, str) and text.strip()
+        ):
+            valid.append({"index": index, "robot": robot, "text": text.strip()})
+        else:
+            rejected.append(insert)
+    return valid, rejected
+
+
+def render_talk_insert(insert):
+    """ 発話挿入を1行の発話文に変換する """
+    return f"{TALK_INSERT_CALLS[insert['robot']]}({json.dumps(insert['text'], ensure_ascii=False)})"
+
+
+def merge_talk_inserts(statements, inserts):
+    """
+    検証済みの発話挿入を行動計画の文リストに合成し、会話付きスクリプトを返す
+    同じ index の発話は与えられた順に並べる (結果は入力に対して常に同じ)
+    """
+    by_index = {}
+    for insert in inserts:
+        by_index.setdefault(insert["index"], []).append(render_talk_insert(insert))
+
+    lines = []
+    for index in range(len(statements) + 1):
+        lines.extend(by_index.get(index, []))
+        if index < len(statements):
+            lines.append(statements[index])
+    return "\n".join(lines)
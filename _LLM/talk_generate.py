@@ -3,39 +3,60 @@
     生成された「スクリプトテキスト」と、「ユーザータスク」「ログコンテンツ」に基づいて、
     ChatGPT APIを使用して会話文型スクリプトを生成後、保存
 """
-import os
+import asyncio
 import json
+from types import SimpleNamespace
 import config
 
 from .LLM_manager import ( 
-    read_file, read_json, get_chat_response, 
+    read_file, read_prompt, get_chat_response_async,
+    make_cache_key, lookup_cached_response, store_cached_response,
     save_response_to_file,
     append_to_script_log,
     append_token_usage_log 
 )
+from .script_parser import split_statements, validate_talk_inserts, merge_talk_inserts
 
-def main(user_msg):
-    print(f"🤖 [Talk Generate] 会話スクリプトの生成を開始します...")
+def uses_inserts(inserts=None):
+    """ 発話挿入リスト形式 (差分形式) で会話文を生成するか (None なら config の設定に従う) """
+    return config.LLM_TALK_FORMAT == "inserts" if inserts is None else inserts
 
-    # ===== 1. プロンプト読み込み =====
-    prompt_path = config.PROMPTS["talk"]
-    ext = os.path.splitext(prompt_path)[1].lower()
-    
+def prompt_path(inserts=None):
+    """ 会話文生成に使うプロンプトファイル """
+    return config.PROMPTS["talk_insert"] if uses_inserts(inserts) else config.PROMPTS["talk"]
+
+def response_format(inserts=None):
+    """ 差分形式ではJSONでの返信を指定する """
+    return {"type": "json_object"} if uses_inserts(inserts) else None
+
+def read_task_script():
+    """ 会話文を付与する元の行動計画スクリプトを読み込む """
     try:
-        if ext == '.json':
-            create_talk_prompt = read_json(prompt_path)
-            system_prompt = json.dumps(create_talk_prompt, indent=2, ensure_ascii=False)
-        else:
-            system_prompt = read_file(prompt_path)
+        return read_file(config.LLM_TASK_SCRIPT_PATH)
     except FileNotFoundError:
-        print(f"❌ プロンプトファイルが見つかりません: {prompt_path}")
-        return
+        return "# No task script generated yet."
 
-    # ===== 2. コンテキスト情報の読み込み =====
+def cache_key(user_msg, inserts=None):
+    """ 会話スクリプトのキャッシュキー (元の行動計画の内容も含める) """
+    return make_cache_key("talk", user_msg, [prompt_path(inserts)], context=read_task_script())
+
+def build_prompt(user_msg, inserts=None):
+    """ システムプロンプト・行動計画スクリプト・ユーザータスクを結合したプロンプトを作成する """
+    # ===== 1. プロンプト読み込み =====
+    talk_prompt_path = prompt_path(inserts)
     try:
-        generated_script_content = read_file(config.LLM_TASK_SCRIPT_PATH)
+        system_prompt = read_prompt(talk_prompt_path)
     except FileNotFoundError:
-        generated_script_content = "# No task script generated yet."
+        print(f"❌ プロンプトファイルが見つかりません: {talk_prompt_path}")
+        return None
+
+    # ===== 2. コンテキスト情報の読み込み =====
+    generated_script_content = read_task_script()
+    if uses_inserts(inserts):
+        # 差分形式では文番号で挿入位置を指定させるため、番号付きで渡す
+        generated_script_content = "\n".join(
+            f"[{i}] {statement}" for i, statement in enumerate(split_statements(generated_script_content))
+        )
 
     log_path = config.LOGS["talk"]
     log_content = ""
@@ -43,25 +64,106 @@ def main(user_msg):
     #     log_content = read_file(log_path)
     
     # ===== 3. プロンプト結合 =====
-    combined_prompt = (
+    return (
         f"{system_prompt}\n\n"
         f"### Generated Robot Action Script ###\n{generated_script_content}\n\n"
         f"### User Task ###\n{user_msg}\n\n"
         f"### Log Content ###\n{log_content}"
     )
-    
-    # ===== 4. レスポンス取得 =====
-    # (res=メッセージ, usage=トークン情報)
-    res, usage = get_chat_response(combined_prompt)
-    
+
+def parse_inserts(res, statements):
+    """ 発話挿入リスト(JSON)を読み取り、検証済みの挿入のリストを返す """
+    if not (res and getattr(res, "content", None)):
+        return []
+    try:
+        inserts = json.loads(res.content).get("inserts", [])
+    except (json.JSONDecodeError, AttributeError):
+        print("⚠️ 発話挿入リストを読み取れませんでした。会話文なしで扱います")
+        return []
+
+    valid, rejected = validate_talk_inserts(inserts, len(statements))
+    for insert in rejected:
+        print(f"⚠️ 存在しない文を指す、または不正な発話挿入を無視します: {insert}")
+    return valid
+
+def apply_inserts(res):
+    """ 発話挿入リスト(JSON)を行動計画スクリプトに合成し、会話付きスクリプトを返す """
+    if not (res and getattr(res, "content", None)):
+        return None
+
+    statements = split_statements(read_task_script())
+    valid = parse_inserts(res, statements)
+    print(f"💬 発話挿入: {len(valid)}件を合成しました")
+    return SimpleNamespace(content=merge_talk_inserts(statements, valid))
+
+def save_result(res, usage, cached=False, inserts=None):
+    """
+    生成結果を最終スクリプトファイルとログに保存する
+    戻り値: 保存できたか (True/False)
+    """
     # ===== 5. レスポンス保存 =====
+    if uses_inserts(inserts):
+        res = apply_inserts(res)
     output_path = config.LLM_FINAL_SCRIPT_PATH
     save_response_to_file(res, output_path)
     
     # ===== 6. ログファイル追記 =====
-    append_to_script_log(output_path, log_path)
+    append_to_script_log(output_path, config.LOGS["talk"])
 
-    # ===== 7. トークンログ記録 =====
-    append_token_usage_log(usage, config.LOGS["token"])
-    
-    print(f"✅ 生成されたスクリプトを保存しました: {output_path}")
\ No newline at end of file
+    # ===== 7. トークンログ記録 (キャッシュヒット時はAPIを使っていないため記録しない) =====
+    if not cached:
+        append_token_usage_log(usage, config.LOGS["token"])
+
+    if not (res and getattr(res, "content", None)):
+        return False
+    print(f"✅ 生成されたスクリプトを保存しました: {output_path}")
+    return True
+
+def main(user_msg):
+    """ main_async() の同期版 """
+    return asyncio.run(main_async(user_msg))
+
+async def main_async(user_msg):
+    """
+    会話スクリプトを生成して保存する (キャンセルすると生成中の通信も中断される)
+    戻り値: 保存できたか (失敗した場合、前回のスクリプトは実行しないこと)
+    """
+    print(f"🤖 [Talk Generate] 会話スクリプトの生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg)
+    if combined_prompt is None:
+        return False
+
+    key = cache_key(user_msg)
+    res = lookup_cached_response(key)
+    if res is not None:
+        return save_result(res, None, cached=True)
+
+    # ===== 4. レスポンス取得 =====
+    # (res=メッセージ, usage=トークン情報)
+    res, usage = await get_chat_response_async(combined_prompt, response_format=response_format())
+    store_cached_response(key, "talk", res)
+    return save_result(res, usage)
+
+async def generate_inserts_async(user_msg):
+    """
+    差分形式で会話文を生成し、検証済みの発話挿入リストを返す (config の形式設定に関わらず差分形式)
+    行動計画の実行と並行して呼び出し、届いた発話を実行中の計画へ差し込むために使う
+    合成した会話付きスクリプトは通常どおり保存する
+    """
+    print(f"🤖 [Talk Generate] 発話挿入リストの生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg, inserts=True)
+    if combined_prompt is None:
+        return []
+
+    key = cache_key(user_msg, inserts=True)
+    res = lookup_cached_response(key)
+    usage = None
+    cached = res is not None
+    if not cached:
+        res, usage = await get_chat_response_async(combined_prompt, response_format=response_format(True))
+        store_cached_response(key, "talk", res)
+
+    save_result(res, usage, cached=cached, inserts=True)
+    return parse_inserts(res, split_statements(read_task_script()))
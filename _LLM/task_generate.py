@@ -3,33 +3,29 @@
     「ユーザータスク」、「ログコンテンツ」に基づいて、
     ChatGPT APIを使用して行動計画を生成し、保存する
 """
-import os
-import json
+import asyncio
+from types import SimpleNamespace
 import config
 
 from .LLM_manager import ( 
-    read_file, read_json, get_chat_response, 
+    read_prompt, get_chat_response_async, stream_chat_response,
+    make_cache_key, lookup_cached_response, store_cached_response,
+    travel_costs_section, travel_costs_paths,
     save_response_to_file,
     append_to_script_log,
     append_token_usage_log
 )
+from .script_parser import StatementStreamParser, split_statements
 
-def main(user_msg):
-    print(f"🤖 [Task Generate] 行動計画の生成を開始します...")
-
+def build_prompt(user_msg):
+    """ システムプロンプトとユーザータスクを結合したプロンプトを作成する """
     # ===== 1. プロンプト読み込み =====
     prompt_path = config.PROMPTS["task"]
-    ext = os.path.splitext(prompt_path)[1].lower()
-    
     try:
-        if ext == '.json':
-            create_task_prompt = read_json(prompt_path)
-            system_prompt_str = json.dumps(create_task_prompt, indent=2, ensure_ascii=False)
-        else:
-            system_prompt_str = read_file(prompt_path)
+        system_prompt_str = read_prompt(prompt_path)
     except FileNotFoundError:
         print(f"❌ プロンプトファイルが見つかりません: {prompt_path}")
-        return
+        return None
 
     # ===== 2. ログコンテンツ =====
     log_path = config.LOGS["task"]
@@ -38,24 +34,101 @@ def main(user_msg):
     #     log_content = read_file(log_path)
     
     # ===== 3. プロンプト結合 =====
-    combined_prompt = (
+    return (
         f"{system_prompt_str}\n\n"
+        f"{travel_costs_section()}"
         f"### User Task ###\n{user_msg}\n\n"
         f"### Log Content ###\n{log_content}"
     )
-    
-    # ===== 4. レスポンス取得 =====
-    # (res=メッセージ, usage=トークン情報)
-    res, usage = get_chat_response(combined_prompt)
 
+def cache_key(user_msg):
+    """ 行動計画のキャッシュキー """
+    return make_cache_key("task", user_msg, [config.PROMPTS["task"]] + travel_costs_paths())
+
+def save_result(res, usage, cached=False):
+    """
+    生成結果をスクリプトファイルとログに保存する
+    戻り値: 保存できたか (True/False)
+    """
     # ===== 5. レスポンス保存 =====
     output_path = config.LLM_TASK_SCRIPT_PATH
     save_response_to_file(res, output_path)
 
     # ===== 6. ログファイル追記 =====
-    append_to_script_log(output_path, log_path)
+    append_to_script_log(output_path, config.LOGS["task"])
 
-    # ===== 7. トークンログ記録 =====
-    append_token_usage_log(usage, config.LOGS["token"])
-    
-    print(f"✅ 生成されたスクリプトを保存しました: {output_path}")
\ No newline at end of file
+    # ===== 7. トークンログ記録 (キャッシュヒット時はAPIを使っていないため記録しない) =====
+    if not cached:
+        append_token_usage_log(usage, config.LOGS["token"])
+
+    if not (res and getattr(res, "content", None)):
+        return False
+    print(f"✅ 生成されたスクリプトを保存しました: {output_path}")
+    return True
+
+def main(user_msg):
+    """ main_async() の同期版 """
+    return asyncio.run(main_async(user_msg))
+
+async def main_async(user_msg):
+    """
+    行動計画を生成して保存する (キャンセルすると生成中の通信も中断される)
+    戻り値: 保存できたか (失敗した場合、前回のスクリプトは実行しないこと)
+    """
+    print(f"🤖 [Task Generate] 行動計画の生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg)
+    if combined_prompt is None:
+        return False
+
+    key = cache_key(user_msg)
+    res = lookup_cached_response(key)
+    if res is not None:
+        return save_result(res, None, cached=True)
+
+    # ===== 4. レスポンス取得 =====
+    # (res=メッセージ, usage=トークン情報)
+    res, usage = await get_chat_response_async(combined_prompt)
+    store_cached_response(key, "task", res)
+    return save_result(res, usage)
+
+async def main_stream(user_msg):
+    """
+    行動計画をストリーミング生成し、トップレベル文が完成するたびに返す非同期ジェネレータ
+    生成完了後は main_async() と同様にスクリプト・ログを保存する
+    """
+    print(f"🤖 [Task Generate] 行動計画のストリーミング生成を開始します...")
+
+    combined_prompt = build_prompt(user_msg)
+    if combined_prompt is None:
+        return
+
+    # キャッシュヒット時は保存済みの計画をそのまま文単位で返す
+    key = cache_key(user_msg)
+    res = lookup_cached_response(key)
+    if res is not None:
+        for statement in split_statements(res.content):
+            yield statement
+        save_result(res, None, cached=True)
+        return
+
+    # ===== 4. レスポンスを逐次受信し、完成した文から順に返す =====
+    parser = StatementStreamParser()
+    chunks = []
+    usage = None
+    finish_reason = None  # 途中で通信が切れた場合は None のまま
+    async for text, chunk_usage, chunk_finish in stream_chat_response(combined_prompt):
+        if text:
+            chunks.append(text)
+            for statement in parser.feed(text):
+                yield statement
+        if chunk_usage is not None:
+            usage = chunk_usage
+        if chunk_finish is not None:
+            finish_reason = chunk_finish
+    for statement in parser.close():
+        yield statement
+
+    res = SimpleNamespace(content="".join(chunks), finish_reason=finish_reason) if chunks else None
+    store_cached_response(key, "task", res)
+    save_result(res, usage)
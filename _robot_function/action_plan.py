@@ -0,0 +1,234 @@
+"""
+    action_plan.py
+    構造化された行動計画（JSONのアクションリスト）のスキーマ生成・検証・実行を定義しているプログラム
+    スキーマは KachakaModule / AkariModule の公開メソッド（実行ガード付き）から自動生成する
+"""
+
+import inspect
+import json
+import types
+import typing
+
+from _LLM.script_parser import TALK_FUNCTIONS
+from _robot_function.function_list_kachaka import KachakaModule
+from _robot_function.function_list_akari import AkariModule
+
+# ロボット名 -> (モジュールクラス, スクリプト内の変数名)
+ROBOT_MODULES = {
+    "kachaka": (KachakaModule, "a"),
+    "akari": (AkariModule, "b"),
+}
+
+# LLMに呼び出させるツール (Function calling) の名前
+TOOL_NAME = "submit_action_plan"
+
+# 引数の型注釈 -> JSON Schema の型 (注釈なしは文字列として扱う)
+JSON_TYPES = {int: "integer", float: "number", bool: "boolean", str: "string"}
+
+# Optional などの Union 型
+UNION_TYPES = (typing.Union, types.UnionType)
+
+
+class ActionPlanError(ValueError):
+    """ 行動計画がスキーマに合わない場合のエラー """
+
+
+def plan_actions(module_class):
+    """ 行動計画から呼び出せるメソッド（実行ガード付きの公開メソッド）を {名前: 関数} で返す """
+    return {
+        name: func
+        for name, func in inspect.getmembers(module_class, inspect.iscoroutinefunction)
+        if not name.startswith("_") and hasattr(func, "__wrapped__")
+    }
+
+
+def _parameters(func):
+    return [p for p in inspect.signature(func).parameters.values() if p.name != "self"]
+
+
+def _optional_type(annotation):
+    """ X | None の場合は X を、それ以外はそのまま返す """
+    if typing.get_origin(annotation) in UNION_TYPES:
+        options = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(options) == 1:
+            return options[0]
+    return annotation
+
+
+def _json_schema(annotation):
+    """ 引数の型注釈から JSON Schema を作る (list / tuple は配列、注釈なしは文字列) """
+    annotation = _optional_type(annotation)
+    origin, items = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is list:
+        return {"type": "array", "items": _json_schema(items[0]) if items else {}}
+    if origin is tuple and items:
+        # 固定長のタプル (例: (pan, tilt)) は要素数を指定した配列にする
+        return {"type": "array", "items": _json_schema(items[0]), "minItems": len(items), "maxItems": len(items)}
+    return {"type": JSON_TYPES.get(annotation, "string")}
+
+
+def _coerce(value, annotation):
+    """
+    引数の値を型注釈に合わせて変換する (注釈なしはそのまま)
+    LLMが文字列で返した "false" や "[[0.1, 0.2]]" も型どおりの値にする。変換できなければ ValueError
+    """
+    if annotation is inspect.Parameter.empty:
+        return value
+    if value is None and _optional_type(annotation) is not annotation:
+        return None
+    annotation = _optional_type(annotation)
+    origin, items = typing.get_origin(annotation), typing.get_args(annotation)
+
+    if annotation is bool:
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        if not isinstance(value, bool):
+            raise ValueError(f"真偽値ではありません: {value!r}")
+        return value
+    if annotation in (int, float):
+        if isinstance(value, bool):
+            raise ValueError(f"数値ではありません: {value!r}")
+        number = float(value)
+        if annotation is int:
+            if not number.is_integer():
+                raise ValueError(f"整数ではありません: {value!r}")
+            return int(number)
+        return number
+    if origin in (list, tuple):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"配列ではありません: {value!r}")
+        if origin is list:
+            return [_coerce(v, items[0]) for v in value] if items else list(value)
+        if items and len(value) != len(items):
+            raise ValueError(f"要素数が {len(items)} ではありません: {value!r}")
+        return tuple(_coerce(v, t) for v, t in zip(value, items)) if items else tuple(value)
+    return value
+
+
+def coerce_args(func, args):
+    """ アクションの引数をメソッドの型注釈に合わせて変換した辞書を返す """
+    params = inspect.signature(func).parameters
+    return {k: _coerce(v, params[k].annotation) for k, v in args.items()}
+
+
+def _action_schema(robot, name, func):
+    """ 1つのアクション (robot, action, args) のスキーマ """
+    params = _parameters(func)
+    return {
+        "type": "object",
+        "description": inspect.getdoc(func) or name,
+        "properties": {
+            "robot": {"type": "string", "enum": [robot]},
+            "action": {"type": "string", "enum": [name]},
+            "args": {
+                "type": "object",
+                "properties": {p.name: _json_schema(p.annotation) for p in params},
+                "required": [p.name for p in params if p.default is inspect.Parameter.empty],
+                "additionalProperties": False,
+            },
+        },
+        "required": ["robot", "action", "args"],
+    }
+
+
+def build_tool_schema():
+    """ 行動計画を提出させるツールの定義 (OpenAI の tools 形式) """
+    variants = [
+        _action_schema(robot, name, func)
+        for robot, (module_class, _) in ROBOT_MODULES.items()
+        for name, func in sorted(plan_actions(module_class).items())
+    ]
+    return {
+        "type": "function",
+        "function": {
+            "name": TOOL_NAME,
+            "description": "Submit the robots' action plan as an ordered list of actions.",
+            "parameters": {
+                "type": "object",
+                "properties": {"actions": {"type": "array", "items": {"anyOf": variants}}},
+                "required": ["actions"],
+            },
+        },
+    }
+
+
+def validate_action_plan(actions):
+    """ アクションリストをスキーマ (メソッドの存在と引数) と照合し、引数を型注釈どおりの値に変換する。不正なら ActionPlanError """
+    if not isinstance(actions, list):
+        raise ActionPlanError("actions はリストである必要があります")
+
+    errors = []
+    for i, step in enumerate(actions):
+        if not isinstance(step, dict):
+            errors.append(f"[{i}] オブジェクトではありません: {step}")
+            continue
+        robot, name, args = step.get("robot"), step.get("action"), step.get("args", {})
+        if robot not in ROBOT_MODULES:
+            errors.append(f"[{i}] 不明なロボット: {robot}")
+            continue
+        func = plan_actions(ROBOT_MODULES[robot][0]).get(name)
+        if func is None:
+            errors.append(f"[{i}] {robot} に存在しないアクション: {name}")
+            continue
+        if not isinstance(args, dict):
+            errors.append(f"[{i}] args がオブジェクトではありません: {args}")
+            continue
+        try:
+            inspect.signature(func).bind(None, **args)
+            step["args"] = coerce_args(func, args) # 型注釈どおりの値にする ("false" -> False など)
+        except (TypeError, ValueError) as e:
+            errors.append(f"[{i}] {robot}.{name} の引数が不正です: {e}")
+
+    if errors:
+        raise ActionPlanError("; ".join(errors))
+    return actions
+
+
+def parse_action_plan(text):
+    """ ツール呼び出しの引数 (JSON文字列) からアクションリストを取り出して検証する """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ActionPlanError(f"JSONとして読み取れません: {e}")
+    if not isinstance(data, dict):
+        raise ActionPlanError("actions を含むオブジェクトである必要があります")
+    return validate_action_plan(data.get("actions"))
+
+
+def load_action_plan(filepath):
+    """ 保存された行動計画ファイルを読み込んで検証する """
+    with open(filepath, "r", encoding="utf-8") as f:
+        return parse_action_plan(f.read())
+
+
+def is_talk_action(step):
+    """ 発話のアクションかを判定する """
+    return step["action"] in TALK_FUNCTIONS
+
+
+def render_action(step):
+    """ アクションをスクリプト (Python) の1文に変換する """
+    variable = ROBOT_MODULES[step["robot"]][1]
+    args = ", ".join(
+        f"{k}={json.dumps(v, ensure_ascii=False) if isinstance(v, str) else repr(v)}"
+        for k, v in step.get("args", {}).items()
+    )
+    return f"await {variable}.{step['action']}({args})"
+
+
+def render_script(actions, include_talk=True):
+    """ アクションリストをスクリプト (Python) に変換する (ログ・互換性のため) """
+    return "\n".join(render_action(s) for s in actions if include_talk or not is_talk_action(s))
+
+
+async def run_action_plan(actions, robots):
+    """
+    アクションリストを先頭から順に実行するインタプリタ
+    robots: {"kachaka": KachakaModule, "akari": AkariModule} のインスタンス
+    """
+    for i, step in enumerate(actions):
+        print(f"▶️  アクション[{i}]: {step['robot']}.{step['action']} {step.get('args', {})}")
+        method = getattr(robots[step["robot"]], step["action"])
+        await method(**step.get("args", {}))
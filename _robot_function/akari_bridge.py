@@ -0,0 +1,151 @@
+"""
+    akari_bridge.py
+    Akari PC (akari_mqtt_subscriber.py) とのMQTT通信を、リクエストごとの応答待ちとして扱う橋渡し役
+    送信ごとに相関ID (MQTT v5 の Correlation Data) を付け、リクエストごとに Future を用意する
+    応答はpahoのネットワークスレッドで受信し、call_soon_threadsafe でイベントループ側の Future を完了させる
+
+    相関IDの無い応答 (古い akari_mqtt_subscriber.py) は、従来どおり送信順に最も古いリクエストの完了として扱う
+    応答待ちがタイムアウトした場合は、同じ相関IDを付けた "TimeoutError" でそのリクエストだけを取り消す
+"""
+
+import asyncio
+import itertools
+import uuid
+from collections import OrderedDict
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+# Akari側からの完了通知 (相関IDの無い応答はこれだけを完了として扱う)
+COMPLETED_RESULTS = ("0", "1", "4")   # 成功 / 中断による完了 / chat_bot終了
+FAILED_RESULTS = ("-1", "2")          # タイムアウト / エラー
+
+
+class AkariMqttBridge:
+    """ 相関IDつきのリクエスト/レスポンス """
+
+    def __init__(self, broker, port, request_topic, result_topic, use_correlation=True):
+        """
+        broker, port   : MQTTブローカー
+        request_topic  : Akari PCへの送信トピック
+        result_topic   : Akari PCからの完了通知トピック
+        use_correlation: 相関IDを付ける (MQTT v5)。False なら v3.1.1 で接続し、送信順で応答を対応付ける
+        """
+        self.request_topic = request_topic
+        self.result_topic = result_topic
+        self.use_correlation = use_correlation
+
+        self.loop = None                  # Future を完了させるイベントループ (最初のリクエスト時に取得)
+        self.pending = OrderedDict()      # 相関ID -> Future (送信順)
+        self._session = uuid.uuid4().hex[:8]   # 再起動前のリクエストへの応答と区別する
+        self._ids = itertools.count(1)
+
+        protocol = mqtt.MQTTv5 if use_correlation else mqtt.MQTTv311
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=protocol)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+        try:
+            print(f"🚀 MQTTブローカーに接続中 {broker}:{port}...")
+            self.client.connect(broker, port, 60)
+            self.client.loop_start()
+        except Exception as e:
+            print(f"❌ AkariModule内部MQTTクライアント接続エラー: {e}")
+
+    # ========== 送信 ==========
+
+    def is_connected(self):
+        return self.client.is_connected()
+
+    def publish(self, message, correlation=None):
+        """ 応答を待たないメッセージ送信 (stop / pause など) """
+        if not self.client.is_connected():
+            print("❌ MQTT未接続のため送信できません")
+            return False
+        properties = None
+        if correlation is not None and self.use_correlation:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.CorrelationData = correlation.encode("utf-8")
+            properties.ResponseTopic = self.result_topic
+        self.client.publish(self.request_topic, message, properties=properties)
+        print(f"📤 Akari送信: '{message}'")
+        return True
+
+    def request(self, message):
+        """ 相関IDを付けて送信し、応答 (Akari側の結果コード) で完了する Future を返す """
+        return self.send_request(message)[1]
+
+    def send_request(self, message):
+        """ 相関IDを付けて送信し、(相関ID, Future) を返す """
+        self.loop = asyncio.get_running_loop()
+        correlation = f"{self._session}-{next(self._ids)}"
+        future = self.loop.create_future()
+        self.pending[correlation] = future
+        # 待つ側がキャンセル・タイムアウトした場合も表から取り除く
+        future.add_done_callback(lambda f: self._done(correlation, f))
+
+        if not self.publish(message, correlation):
+            future.set_exception(ConnectionError("MQTT未接続"))
+        return correlation, future
+
+    def _done(self, correlation, future):
+        self.pending.pop(correlation, None)
+        # 誰も待っていない Future の例外も取り出して表示する (未取得の例外の警告を出さない)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ Akari: リクエスト {correlation} が失敗しました: {future.exception()}")
+
+    def cancel_request(self, correlation):
+        """ 応答待ちがタイムアウトしたリクエストだけを、Akari側で取り消す (発話待ちなら破棄、発話中なら停止) """
+        self.publish("TimeoutError", correlation)
+
+    async def call(self, message, timeout):
+        """ 送信して応答を待つ。タイムアウト時はそのリクエストを取り消し、asyncio.TimeoutError """
+        correlation, future = self.send_request(message)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.cancel_request(correlation)
+            raise
+
+    def cancel_all(self):
+        """ 応答待ちのリクエストをすべて取り消す (STOP など) """
+        for future in list(self.pending.values()):
+            future.cancel()
+
+    # ========== 受信 (pahoのネットワークスレッド) ==========
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        if rc == 0:
+            print("🔌 MQTTブローカーに接続しました -> AKARI PC")
+            client.subscribe(self.result_topic)
+        else:
+            print(f"❌ 接続失敗: {rc}")
+
+    def _on_message(self, client, userdata, msg):
+        payload = msg.payload.decode("utf-8")
+        print(f"📥 AkariPCから受信: {payload}")
+        if msg.topic != self.result_topic or self.loop is None:
+            return
+        correlation = getattr(msg.properties, "CorrelationData", None)
+        if correlation is not None:
+            correlation = correlation.decode("utf-8")
+        # asyncio の Future はスレッドセーフではないため、イベントループ側で完了させる
+        self.loop.call_soon_threadsafe(self._resolve, correlation, payload)
+
+    def _resolve(self, correlation, payload):
+        """ 応答を対応するリクエストの Future に渡す (イベントループ上で実行) """
+        if correlation is None:
+            # 相関IDの無い応答は完了通知だけを、最も古いリクエストに対応付ける
+            if payload not in COMPLETED_RESULTS + FAILED_RESULTS or not self.pending:
+                return
+            correlation = next(iter(self.pending))
+
+        future = self.pending.pop(correlation, None)
+        if future is None or future.done():
+            return # キャンセル・タイムアウト済みのリクエストへの応答
+        if payload in FAILED_RESULTS:
+            print(f"❌ Akari側エラー受信: {payload}")
+        else:
+            print("✅ Akari側の処理完了を受信")
+        future.set_result(payload)
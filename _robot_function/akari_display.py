@@ -0,0 +1,98 @@
+"""
+    akari_display.py
+    AkariのM5Stackの画面 (背景色・文字表示) の状態を1か所で管理するプログラム
+    短い間に続いた更新はまとめて最後の状態だけを書き込み、表示中の内容と同じ書き込みは送らない
+    一定時間後に白へ戻す処理は1つのタイマーで扱い、新しい表示のたびに延長する
+"""
+
+import asyncio
+
+from akari_client.color import Colors
+from akari_client.position import Positions
+
+
+class AkariDisplay:
+    """ M5Stackの画面の状態 (最後に書き込んだ内容と、表示したい内容) """
+
+    def __init__(self, io, debounce=0.05, revert_delay=10.0):
+        """
+        io          : AkariIO (M5Stackへの書き込みに使用)
+        debounce    : 更新をまとめる時間 [秒]
+        revert_delay: 表情の色を白に戻すまでの時間 [秒]
+        """
+        self.io = io
+        self.debounce = debounce
+        self.revert_delay = revert_delay
+        self.m5 = None
+        self.shown = None      # 最後に書き込んだ画面 (None は不明)
+        self.desired = None    # 表示したい画面
+        self._flush_task = None
+        self._revert_task = None
+
+    def attach(self, m5stack):
+        """ 接続したM5Stackを設定する (画面の状態は不明に戻す) """
+        self.m5 = m5stack
+        self.shown = None
+
+    # ========== 更新 ==========
+
+    def set_color(self, color, revert=True):
+        """ 画面全体を指定した色にする (revert=True なら一定時間後に白に戻す) """
+        self._update(("color", color))
+        if revert:
+            self._schedule_revert()
+
+    def set_text(self, text, back_color):
+        """ 画面中央に文字を表示する """
+        self._update(("text", text, back_color))
+
+    def _update(self, screen):
+        self.desired = screen
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # 続けて届く更新を待ってから、最後の状態だけを書き込む
+        await asyncio.sleep(self.debounce)
+        while self.m5 is not None and self.desired != self.shown:
+            screen = self.desired
+            try:
+                await self._write(screen)
+            except Exception as e:
+                print(f"⚠️ Akari: 画面の更新に失敗しました: {e}")
+                self.shown = None
+                return
+            self.shown = screen
+
+    async def _write(self, screen):
+        if screen[0] == "color":
+            await self.io.call("m5stack", self.m5.set_display_color, screen[1])
+            return
+        _, text, back_color = screen
+        await self.io.call(
+            "m5stack",
+            self.m5.set_display_text,
+            text=text,
+            pos_x=Positions.CENTER,
+            pos_y=Positions.CENTER,
+            size=5,
+            text_color=Colors.WHITE,
+            back_color=back_color,
+            refresh=True,
+            sync=True
+        )
+
+    # ========== 白に戻すタイマー ==========
+
+    def _schedule_revert(self):
+        self.cancel_revert()
+        self._revert_task = asyncio.create_task(self._revert_later())
+
+    def cancel_revert(self):
+        if self._revert_task is not None and not self._revert_task.done():
+            self._revert_task.cancel()
+        self._revert_task = None
+
+    async def _revert_later(self):
+        await asyncio.sleep(self.revert_delay)
+        self._update(("color", Colors.WHITE))
@@ -0,0 +1,43 @@
+"""
+    akari_io.py
+    akari_client (同期のgRPC API) の呼び出しを、イベントループとは別の専用スレッドで実行するプログラム
+    ジョイント・M5Stack ごとに1本のスレッド (レーン) を持ち、同じ機器への呼び出しは送った順に1つずつ実行する
+    呼び出し側は await で結果を受け取るため、通信中も割り込み処理やKachakaの監視は止まらない
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# 機器ごとのレーン (別々のgRPCサービスのため、互いの通信を待たない)
+LANES = ("joints", "m5stack")
+
+
+class AkariIO:
+    """ Akariのハードウェア呼び出し用の専用スレッド """
+
+    def __init__(self, lanes=LANES):
+        self.executors = {
+            lane: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"akari-{lane}")
+            for lane in lanes
+        }
+        self.stats = {lane: {"calls": 0, "max": 0.0} for lane in lanes}
+
+    async def call(self, lane, func, *args, **kwargs):
+        """ func(*args, **kwargs) をレーンのスレッドで実行し、結果を返す """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[lane], partial(self._timed, lane, func, *args, **kwargs))
+
+    def _timed(self, lane, func, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats = self.stats[lane]
+            stats["calls"] += 1
+            stats["max"] = max(stats["max"], time.monotonic() - started)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,119 @@
+"""
+    akari_motion.py
+    Akariの首 (pan / tilt) の動作を、経由点 (ウェイポイント) の列として非同期に実行するプログラム
+    経由点は順にジョイントマネージャへ送り、それぞれの到達で完了する Future を返す
+    呼び出し側は動作の完了を待たずに発話やKachakaの移動を進め、必要なところで Future を待てる
+"""
+
+import asyncio
+from collections import deque
+
+
+class Waypoint:
+    """ 1つの経由点と、その到達で完了する Future """
+
+    def __init__(self, pan, tilt, velocity, future):
+        self.pan = pan
+        self.tilt = tilt
+        self.velocity = velocity    # (pan, tilt) の速度 (None なら現在の速度のまま)
+        self.future = future
+
+    def __repr__(self):
+        return f"(pan={self.pan:.2f}, tilt={self.tilt:.2f})"
+
+
+class AkariMotion:
+    """ 首の経由点のキューと、それを順に実行するワーカー """
+
+    def __init__(self, io, velocity_settle=0.5):
+        """
+        io             : AkariIO (ジョイントへの呼び出しに使用)
+        velocity_settle: 速度を変えた後、動き出すまで待つ時間 [秒]
+        """
+        self.io = io
+        self.velocity_settle = velocity_settle
+        self.joints = None
+        self.limits = None          # ジョイントリミット (初回に取得)
+        self.velocity = None        # 最後に設定した速度
+        self.queue = deque()
+        self._worker = None
+
+    def attach(self, joints):
+        """ 接続したジョイントを設定する """
+        self.joints = joints
+        self.limits = None
+        self.velocity = None
+
+    async def load_limits(self):
+        if self.limits is None:
+            self.limits = await self.io.call("joints", self.joints.get_joint_limits)
+        return self.limits
+
+    def within_limits(self, pan, tilt):
+        return (
+            self.limits["pan"].min <= pan <= self.limits["pan"].max
+            and self.limits["tilt"].min <= tilt <= self.limits["tilt"].max
+        )
+
+    async def move(self, waypoints, velocity=None):
+        """
+        経由点 [(pan, tilt), ...] をキューに積み、経由点ごとの Future のリストを返す
+        リミット外の経由点がある場合は何も積まずに ValueError を送出する
+        """
+        await self.load_limits()
+        waypoints = [(float(pan), float(tilt)) for pan, tilt in waypoints]
+        outside = [w for w in waypoints if not self.within_limits(*w)]
+        if outside:
+            raise ValueError(f"ジョイントリミット外の経由点があります: {outside}")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for pan, tilt in waypoints:
+            future = loop.create_future()
+            future.add_done_callback(self._retrieve)
+            self.queue.append(Waypoint(pan, tilt, velocity, future))
+            futures.append(future)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return futures
+
+    async def _run(self):
+        """ キューの経由点を順にジョイントマネージャへ送る """
+        while self.queue:
+            waypoint = self.queue[0]
+            if waypoint.future.done():      # 待つ側がキャンセルした経由点は飛ばす
+                self.queue.popleft()
+                continue
+            try:
+                if waypoint.velocity is not None and waypoint.velocity != self.velocity:
+                    pan_velocity, tilt_velocity = waypoint.velocity
+                    await self.io.call("joints", self.joints.set_joint_velocities, pan=pan_velocity, tilt=tilt_velocity)
+                    self.velocity = waypoint.velocity
+                    await asyncio.sleep(self.velocity_settle)
+                await self.io.call("joints", self.joints.move_joint_positions, pan=waypoint.pan, tilt=waypoint.tilt, sync=True)
+            except Exception as e:
+                print(f"❌ Akari: 経由点 {waypoint} への移動に失敗しました: {e}")
+                self.cancel(e)
+                return
+            if self.queue and self.queue[0] is waypoint:
+                self.queue.popleft()
+            if not waypoint.future.done():
+                waypoint.future.set_result(waypoint)
+
+    @staticmethod
+    def _retrieve(future):
+        # wait=False で誰も待たなかった経由点の失敗も取り出しておく (失敗の内容は _run で表示済み)
+        if not future.cancelled():
+            future.exception()
+
+    def cancel(self, error=None):
+        """ まだ到達していない経由点をすべて取り消す (送信済みの経由点への動作は止まらない) """
+        while self.queue:
+            future = self.queue.popleft().future
+            if future.done():
+                continue
+            if error is None:
+                future.cancel()
+            else:
+                future.set_exception(error)
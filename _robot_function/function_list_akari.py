@@ -4,7 +4,6 @@
 """
 
 import asyncio
-import paho.mqtt.client as mqtt
 from functools import wraps
 from akari_client import AkariClient
 from akari_client.color import Colors
@@ -13,7 +12,10 @@ from akari_client.config import (
     JointManagerGrpcConfig,
     M5StackGrpcConfig,
 )
-from akari_client.position import Positions
+from _robot_function.akari_bridge import AkariMqttBridge
+from _robot_function.akari_io import AkariIO
+from _robot_function.akari_display import AkariDisplay
+from _robot_function.akari_motion import AkariMotion
 
 # ★ configをインポート
 import config
@@ -34,6 +36,7 @@ class AkariModule:
         # トピック設定
         self.topic_chat = config.ROBOTS["akari"]["topics"]["chat"]
         self.topic_result = config.ROBOTS["akari"]["topics"]["result"]
+        self.response_timeout = config.ROBOTS["akari"]["response_timeout"]
 
         # --- タスク管理用変数 ---
         self.pending_task = None       # 一時停止時に中断したタスク情報
@@ -45,44 +48,29 @@ class AkariModule:
         self.pause_event = asyncio.Event()
         self.pause_event.set()         # set=実行可能, clear=一時停止中
 
-        # --- MQTTクライアント設定 (Akari PCとの通信用) ---
-        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        self.mqtt_client.on_connect = self._on_mqtt_connect
-        self.mqtt_client.on_message = self._on_mqtt_message
-        self.mqtt_completion_event = asyncio.Event()
-        self.mqtt_completion_event.set()
-
-        try:
-            print(f"🚀 MQTTブローカーに接続中 {self.mqtt_broker}:{self.mqtt_port}...")
-            self.mqtt_client.connect(self.mqtt_broker, self.mqtt_port, 60)
-            self.mqtt_client.loop_start() 
-        except Exception as e:
-            print(f"❌ AkariModule内部MQTTクライアント接続エラー: {e}")
+        # --- MQTTクライアント設定 (Akari PCとの通信用・リクエストごとに応答を待つ) ---
+        self.bridge = AkariMqttBridge(
+            self.mqtt_broker, self.mqtt_port, self.topic_chat, self.topic_result,
+            use_correlation=config.ROBOTS["akari"]["correlation_ids"],
+        )
+        self.mqtt_client = self.bridge.client
 
         # Akariクライアント実体 (initialize_akari_robotで生成)
         self.akari = None
 
+        # akari_client の同期APIはイベントループを止めないよう専用スレッドで呼ぶ
+        self.io = AkariIO()
+
+        # M5Stackの画面 (更新をまとめ、白に戻すタイマーを1つで管理する)
+        self.display = AkariDisplay(
+            self.io,
+            debounce=config.ROBOTS["akari"]["display"]["debounce"],
+            revert_delay=config.ROBOTS["akari"]["display"]["revert_delay"],
+        )
+
+        # 首の動作 (経由点を順に送り、経由点ごとの Future で完了を通知する)
+        self.motion = AkariMotion(self.io, velocity_settle=config.ROBOTS["akari"]["velocity_settle"])
 
-    def _on_mqtt_connect(self, client, userdata, flags, rc, properties=None):
-        if rc == 0:
-            print("🔌 MQTTブローカーに接続しました -> AKARI PC")
-            # Configから取得したトピックを購読
-            client.subscribe(self.topic_result)
-        else:
-            print(f"❌ 接続失敗: {rc}")
-    
-    def _on_mqtt_message(self, client, userdata, msg):
-        payload = msg.payload.decode('utf-8')
-        print(f"📥 AkariPCから受信: {payload}")
-        
-        # Configから取得したトピックと比較
-        if msg.topic == self.topic_result:
-            if payload in ["0", "1", "4"]: # 成功/完了/終了
-                print("✅ Akari側の処理完了を受信")
-                self.mqtt_completion_event.set()
-            elif payload in ["-1", "2"]: # エラー系
-                print(f"❌ Akari側エラー受信: {payload}")
-                self.mqtt_completion_event.set()
 
     # =================================================================
     #  1. Wrapper Function (Execution Guard)
@@ -164,18 +152,20 @@ class AkariModule:
         joint_config = JointManagerGrpcConfig(type="grpc", endpoint=self.m5_address, timeout=3.0)
         m5_config = M5StackGrpcConfig(type="grpc", endpoint=self.m5_address, timeout=3.0)
         config = AkariClientConfig(joint_manager=joint_config, m5stack=m5_config)
-        self.akari = AkariClient(config)
+        self.akari = await self.io.call("joints", AkariClient, config)
+        self.display.attach(self.akari.m5stack)
+        self.motion.attach(self.akari.joints)
         return self.akari
 
     @decorated_execution
     async def get_joint_names(self):
         """ ジョイント名を取得 """
-        print("Joint Names:", self.akari.joints.get_joint_names())
+        print("Joint Names:", await self.io.call("joints", self.akari.joints.get_joint_names))
 
     @decorated_execution
     async def get_joint_limits(self):
         """ ジョイントリミットを取得 """
-        joint_limits = self.akari.joints.get_joint_limits()
+        joint_limits = await self.io.call("joints", self.akari.joints.get_joint_limits)
         print("Joint Limits:")
         for joint, lim in joint_limits.items():
             print(f"{joint}: min={lim.min}, max={lim.max}")
@@ -185,16 +175,15 @@ class AkariModule:
         """ 初期位置へ移動 """
         pan_initial = 0.032221462577581406
         tilt_initial = 0.19793184101581573
-        limits = self.akari.joints.get_joint_limits()
+        await self.motion.load_limits()
 
-        if limits['pan'].min <= pan_initial <= limits['pan'].max and \
-           limits['tilt'].min <= tilt_initial <= limits['tilt'].max:
-            self.akari.joints.disable_all_servo()
+        if self.motion.within_limits(pan_initial, tilt_initial):
+            await self.io.call("joints", self.akari.joints.disable_all_servo)
+            self.motion.velocity = None # 速度は設定し直す
             await self._express_emotion('running')
             await self._display_message('running')
-            self.akari.joints.set_joint_velocities(pan=10, tilt=8)
-            await asyncio.sleep(0.5)
-            await asyncio.to_thread(self.akari.joints.move_joint_positions, pan=pan_initial, tilt=tilt_initial, sync=True)
+            (arrived,) = await self.motion.move([(pan_initial, tilt_initial)], velocity=(10, 8))
+            await arrived
             await self._express_emotion('completed')
             await self._display_message('completed')
             print("Moved to initial position.")
@@ -203,13 +192,33 @@ class AkariModule:
             await self._display_message('error')
             print("Initial position is out of joint limits.")
 
+    @decorated_execution
+    async def move_head(
+        self,
+        waypoints: list[tuple[float, float]],
+        velocity: tuple[float, float] | None = None,
+        wait: bool = True,
+    ):
+        """
+        首を経由点 [(pan, tilt), ...] の順に動かす
+        velocity: (pan, tilt) の速度 (None なら現在の速度のまま)
+        wait=False の場合は動作の完了を待たずに、経由点ごとの Future のリストを返す
+        (例: moves = await b.move_head([(0.3, 0.2), (-0.3, 0.2)], wait=False) の後に発話し、
+             await asyncio.gather(*moves) で到達を待つ)
+        """
+        futures = await self.motion.move(waypoints, velocity=velocity)
+        if not wait:
+            return futures
+        await asyncio.gather(*futures)
+        print(f"Moved head through {len(futures)} waypoints.")
+
     @decorated_execution
     async def stop_all_tasks(self):
         """ 全タスク停止 """
         try:
             await self._express_emotion('running')
             await self._display_message("Stopping tasks...")
-            self.akari.joints.disable_all_servo()
+            await self.io.call("joints", self.akari.joints.disable_all_servo)
             await self._express_emotion('completed')
             await self._display_message("Tasks stopped")
             print("Tasks stopped.")
@@ -222,7 +231,7 @@ class AkariModule:
     async def state_object_akari(self):
         """ 状態取得 """
         try:
-            moving = self.akari.joints.get_moving_state()
+            moving = await self.io.call("joints", self.akari.joints.get_moving_state)
             return "READY" if all(not m for m in moving.values()) else "RUNNING"
         except:
             return "Dormant"
@@ -231,40 +240,36 @@ class AkariModule:
     async def chat_bot(self):
         """ チャットボットモード起動 """
         print(f"🤖 AKARI: chat_bot")
-        self.mqtt_completion_event.clear()
-        
-        await self.send_message_to_akari("chat_bot")
         try:
             print("☑️  Akari側の処理待機中...")
-            await asyncio.wait_for(self.mqtt_completion_event.wait(), timeout=20.0)
+            await self.bridge.call("chat_bot", timeout=self.response_timeout)
         except asyncio.TimeoutError:
             print("⚠️ タイムアウト: chat_botが指定時間内に応答しませんでした")
-            await self.send_message_to_akari("TimeoutError")
 
     @decorated_execution  
-    async def speak_akari(self, message):
-        """ 音声発話 """
+    async def speak_akari(self, message: str, wait: bool = True):
+        """
+        音声発話
+        wait=False の場合は発話の完了を待たずに、完了で終わる Future を返す
+        (Akari側は受け取った順に発話するため、続けて送って後からまとめて待てる)
+        """
         print(f"🤖 AKARI: {message}")
-        self.mqtt_completion_event.clear()
+        correlation, future = self.bridge.send_request(f"speak {message}")
+        if not wait:
+            return future
 
-        await self.send_message_to_akari(f"speak {message}")
         try:
             print("☑️  発話完了待機中...")
-            await asyncio.wait_for(self.mqtt_completion_event.wait(), timeout=20.0)
+            await asyncio.wait_for(future, timeout=self.response_timeout)
         except asyncio.TimeoutError:
             print("⚠️ タイムアウト: 発話完了メッセージが届きませんでした")
-            await self.send_message_to_akari("TimeoutError")
+            self.bridge.cancel_request(correlation) # 再生中・発話待ちの他の発話は止めない
 
     # --- 内部ヘルパー関数 ---
     async def _express_emotion(self, state):
         colors = {'running': Colors.YELLOW, 'completed': Colors.GREEN, 'error': Colors.RED}
         color = colors.get(state, Colors.WHITE)
-        self.akari.m5stack.set_display_color(color)
-        asyncio.create_task(self._reset_color(self.akari.m5stack, 10))
-
-    async def _reset_color(self, m5, delay):
-        await asyncio.sleep(delay)
-        m5.set_display_color(Colors.WHITE)
+        self.display.set_color(color, revert=True) # 一定時間後に白に戻す (タイマーは1つだけ)
 
     async def _display_message(self, state):
         messages = {
@@ -277,16 +282,7 @@ class AkariModule:
         else:
             text, back_color = messages.get(state, ("", Colors.BLACK))
 
-        self.akari.m5stack.set_display_text(
-            text=text,
-            pos_x=Positions.CENTER,
-            pos_y=Positions.CENTER,
-            size=5,
-            text_color=Colors.WHITE,
-            back_color=back_color,
-            refresh=True,
-            sync=True
-        )
+        self.display.set_text(text, back_color)
 
     # ========== 割り込み制御関数 ==========
 
@@ -300,6 +296,8 @@ class AkariModule:
         self.stop_flag = True
         self.pause_event.set() # 停止時は一時停止待ちを解除
         self.pending_task = None
+        self.bridge.cancel_all() # 応答待ちの発話も取り消す
+        self.motion.cancel()     # まだ送っていない首の経由点も取り消す
         
         if self.running_asyncio_task:
              self.running_asyncio_task.cancel()
@@ -316,6 +314,7 @@ class AkariModule:
         
         self.pause_event.clear()
         print("\n⏸️  Akari: 一時停止(PAUSE)要求を受信しました")
+        self.motion.cancel() # まだ送っていない首の経由点を取り消す (再開時は動作ごとやり直す)
 
         # 現在のタスクを保存
         if self.current_task and self.pending_task is None:
@@ -340,6 +339,7 @@ class AkariModule:
         print("⏭️  Akari: スキップ(SKIP)要求を受信しました")
         self.stop_flag = False
         self.pause_event.set() 
+        self.motion.cancel() # スキップした動作の残りの経由点も取り消す
 
         if self.current_task:
             await self.send_message_to_akari("skip")
@@ -355,10 +355,5 @@ class AkariModule:
         self.pause_event.set()
     
     async def send_message_to_akari(self, message: str):
-        """ MQTTメッセージ送信ヘルパー """
-        if self.mqtt_client.is_connected():
-            # Configからトピックを取得して送信
-            self.mqtt_client.publish(self.topic_chat, message)
-            print(f"📤 Akari送信: '{message}'")
-        else:
-            print("❌ MQTT未接続のため送信できません")
\ No newline at end of file
+        """ MQTTメッセージ送信ヘルパー (応答を待たない) """
+        self.bridge.publish(message)
\ No newline at end of file
@@ -7,7 +7,16 @@ import asyncio
 import kachaka_api
 from functools import wraps
 import math
+import time
 import config
+from _robot_function.kachaka_map import KachakaMapCache
+from _robot_function.kachaka_telemetry import KachakaTelemetry
+from _robot_function.travel_model import TravelTimeModel, UNKNOWN_START
+from _robot_function.travel_costs import TravelCostMatrix
+from _robot_function.motion_watchdog import MotionWatchdog
+from _robot_function.kachaka_speaker import KachakaSpeaker
+from _robot_function.kachaka_command import KachakaCommand
+from _robot_function.kachaka_errors import ErrorCatalog, build_policy_table, classify_result, TIMEOUT_RESULT
 
 class KachakaModule:
     def __init__(self):
@@ -21,18 +30,84 @@ class KachakaModule:
         self.pending_task = None       # 一時停止時に中断したタスク情報 (func_name, args, kwargs)
         self.current_task = None       # 現在実行中のタスク情報 (func_name, args, kwargs)
         self.running_asyncio_task = None # 現在実行中の非同期タスク実体
+        self.active_command = None     # 現在発行中のロボットコマンド (KachakaCommand)
+        self.pending_command = None    # 一時停止時に中断したロボットコマンド (再開時はこれだけを発行し直す)
 
         # --- 制御フラグ ---
         self.stop_flag = False         # 停止フラグ (Trueなら実行しない)
         self.pause_event = asyncio.Event()
         self.pause_event.set()         # set=実行可能, clear=一時停止中
 
+        # --- 地図キャッシュ (ロケーション・家具の名前/ID/別名の索引) ---
+        map_settings = config.ROBOTS["kachaka"]["map_cache"]
+        self.map = KachakaMapCache(
+            self.client,
+            aliases=config.ROBOTS["kachaka"]["locations"],
+            refresh_interval=map_settings["refresh_interval"],
+            max_age=map_settings["max_age"],
+        )
+
+        # --- 状態のスナップショット (姿勢・実行中コマンド・バッテリーなど) ---
+        telemetry_settings = config.ROBOTS["kachaka"]["telemetry"]
+        self.telemetry = KachakaTelemetry(
+            self.client,
+            interval=telemetry_settings["interval"],
+            max_age=telemetry_settings["max_age"],
+            slow_interval=telemetry_settings["slow_interval"],
+        )
+
+        # --- 移動時間の学習 (経路ごとの実測値からタイムアウトを決める) ---
+        travel_settings = config.ROBOTS["kachaka"]["travel_model"]
+        self.snap_radius = travel_settings["snap_radius"]
+        self.travel_model = TravelTimeModel(
+            travel_settings["path"],
+            history=travel_settings["history"],
+            min_samples=travel_settings["min_samples"],
+            sigma=travel_settings["sigma"],
+            margin=travel_settings["margin"],
+        )
+
+        # --- 全地点間の移動コスト (距離・見込み所要時間) ---
+        self.travel_costs = TravelCostMatrix(
+            self.map,
+            self.travel_model,
+            seconds_per_meter=travel_settings["seconds_per_meter"],
+            table_path=config.TRAVEL_COSTS_PATH,
+        )
+
+        # --- 移動の見張り (進捗が止まったときだけタイムアウトにする) ---
+        watchdog_settings = config.ROBOTS["kachaka"]["watchdog"]
+        self.watchdog = MotionWatchdog(
+            self.telemetry,
+            interval=watchdog_settings["interval"],
+            stall_seconds=watchdog_settings["stall_seconds"],
+            min_progress=watchdog_settings["min_progress"],
+            min_rotation=watchdog_settings["min_rotation"],
+            budget_factor=watchdog_settings["budget_factor"],
+        )
+
         # --- 設定値 ---
         self.starting_volume = config.ROBOTS["kachaka"]["default_volume"]
 
-        # --- エラーコード定義 ---
-        self.safety_error = config.ROBOTS["kachaka"]["error_codes"]["safety"]
-        self.interrupt_error = config.ROBOTS["kachaka"]["error_codes"]["interrupt"]
+        # --- スピーカー (音量の状態管理・連続発話後の遅延ミュート) ---
+        self.speaker = KachakaSpeaker(
+            self.client,
+            self.starting_volume,
+            idle_mute_delay=config.ROBOTS["kachaka"]["idle_mute_delay"],
+        )
+
+        # --- エラーコード定義 (コード -> 対応方針) ---
+        error_codes = config.ROBOTS["kachaka"]["error_codes"]
+        self.error_policies = build_policy_table(error_codes)
+        self.default_error_policy = error_codes["default_policy"]
+        self.max_retries = error_codes["max_retries"]
+        self.retry_count = 0           # "retry" で連続して再実行した回数
+
+        # --- エラーコード一覧 (初回のみ取得し、以降はバックグラウンドで更新) ---
+        self.error_catalog = ErrorCatalog(
+            self.client,
+            refresh_interval=error_codes["catalog_refresh_interval"],
+        )
 
     # =================================================================
     #  1. Wrapper Function (Execution Guard)
@@ -42,49 +117,60 @@ class KachakaModule:
         
         @wraps(func)
         async def wrapper(self, *args, **kwargs):
-            print(f"\n☑️  {func.__name__}: 実行準備")
+            return await self._run_guarded((func.__name__, args, kwargs), lambda: func(self, *args, **kwargs))
 
-            # --- {Pre-Execution Phase} ---
-            # 停止フラグが立っている場合は実行をスキップ
-            if self.stop_flag:
-                print(f"⚠️ {func.__name__} をスキップします（停止フラグが有効）")
-                return None
+        return wrapper
 
-            # 現在実行中のタスク情報を保存 (中断時の復帰用)
-            self.current_task = (func.__name__, args, kwargs)
-            self.running_asyncio_task = asyncio.current_task()
+    async def _run_guarded(self, task, run):
+        """
+        実行ガードの本体
+        task: 中断時に保存するタスク情報 (メソッド名, args, kwargs)
+        run : 実行するコルーチンを返す関数
+        """
+        name = task[0]
+        print(f"\n☑️  {name}: 実行準備")
+
+        # --- {Pre-Execution Phase} ---
+        # 停止フラグが立っている場合は実行をスキップ
+        if self.stop_flag:
+            print(f"⚠️ {name} をスキップします（停止フラグが有効）")
+            return None
 
-            result = None
+        # 現在実行中のタスク情報を保存 (中断時の復帰用)
+        self.current_task = task
+        self.running_asyncio_task = asyncio.current_task()
 
-            # --- {Execution Phase} ---
-            try:
-                # 関数を実行
-                result = await func(self, *args, **kwargs)
-            
-            except asyncio.CancelledError:
-                # キャンセル（割り込み）発生時の処理
-                print(f"⚠️ {func.__name__} がキャンセルされました")
-                await self.cancel_command()
-                result = None
-            
-            except Exception as e:
-                # 予期せぬエラーの処理
-                print(f"❌ {func.__name__} でエラーが発生しました: {e}")
-                self.pending_task = None # エラー時は再開情報を破棄
-                raise
+        result = None
 
-            finally:
-                # 実行終了後の後処理 (タスク情報のクリア)
-                self.current_task = None
-                self.running_asyncio_task = None
+        # --- {Execution Phase} ---
+        try:
+            # 関数を実行
+            result = await run()
+        
+        except asyncio.CancelledError:
+            # キャンセル（割り込み）発生時の処理
+            print(f"⚠️ {name} がキャンセルされました")
+            await self.cancel_command()
+            result = None
+        
+        except Exception as e:
+            # 予期せぬエラーの処理
+            print(f"❌ {name} でエラーが発生しました: {e}")
+            self.pending_task = None # エラー時は再開情報を破棄
+            self.pending_command = None
+            raise
 
-            # --- {Post-Execution Phase} ---
-            # 一時停止・回復処理の確認
-            await self.handle_pause_and_recovery()
+        finally:
+            # 実行終了後の後処理 (タスク情報のクリア)
+            self.current_task = None
+            self.running_asyncio_task = None
+            self.active_command = None
 
-            return result
+        # --- {Post-Execution Phase} ---
+        # 一時停止・回復処理の確認
+        await self.handle_pause_and_recovery()
 
-        return wrapper
+        return result
 
     # =================================================================
     #  2. Recovery Handler
@@ -101,10 +187,20 @@ class KachakaModule:
         # 中断されたタスクがある場合は再実行
         if self.pending_task is not None:
             # 保存されたタスク情報を取得
-            method_name, saved_args, saved_kwargs = self.pending_task
+            task = self.pending_task
+            method_name, saved_args, saved_kwargs = task
+            command = self.pending_command
             
             # ペンディング情報をクリア
             self.pending_task = None
+            self.pending_command = None
+
+            # ロボットへのコマンドまで進んでいた場合は、そのコマンドだけを発行し直す
+            if command is not None:
+                print(f"🔁 中断されていたコマンド '{command}' を再発行します...")
+                # 元のタスクとして実行する (再び一時停止した場合も、元のタスクとコマンドが保存される)
+                await self._run_guarded(task, lambda: self._resume_command(command))
+                return
 
             print(f"🔁 中断されていたタスク '{method_name}' を再開します...")
             
@@ -126,6 +222,11 @@ class KachakaModule:
         print(f"シリアル番号: {serial_number}")
         version = await self.client.get_robot_version()
         print(f"ソフトウェアバージョン: {version}")
+        snapshot = await self.telemetry.snapshot()
+        if snapshot.battery is None:
+            print("バッテリー: 取得できませんでした")
+        else:
+            print(f"バッテリー: {snapshot.battery[0]}% ({snapshot.battery[1]})")
 
     @decorated_execution
     async def get_id(self):
@@ -152,17 +253,16 @@ class KachakaModule:
     @decorated_execution
     async def get_locations_kachaka(self):
         """ Kachakaに登録されているロケーションの座標情報を取得"""
-        locations = await self.client.get_locations()
+        await self.map.ensure_fresh()
         xyz_coordinates = []
-        for location in locations:
-            pose = location.pose
-            if pose:
+        for location in self.map.locations():
+            if location.has_pose:
                 coordinates = {
                     'id': location.id,
                     'name': location.name,
-                    'x': pose.x,
-                    'y': pose.y,
-                    'z': getattr(pose, 'z', None)
+                    'x': location.x,
+                    'y': location.y,
+                    'z': None
                 }
                 xyz_coordinates.append(coordinates)
         return xyz_coordinates
@@ -174,10 +274,6 @@ class KachakaModule:
         shelf_home_id = config.ROBOTS["kachaka"]["locations"]["living"] # リビング "L03"
         print(f"shelf_homeid = {shelf_home_id}, shelf_id = {shelf_id}")
 
-        # キャッシュ更新用
-        await self.client.get_locations()
-        await self.client.get_shelves()
-
         dis = await self.get_dist("障害物") 
         dis_home = await self.get_dist("リビング", "障害物")
         
@@ -186,37 +282,29 @@ class KachakaModule:
         if dis_home is None: dis_home = 0
         
         total_dist = dis + dis_home
-        timeout = await self.moving_timeout(total_dist, "docking")
-        result = None
+        start = await self.current_place()
+        timeout = await self.moving_timeout(total_dist, "docking", start=start, goal=shelf_home_id)
 
-        try:
-            move_shelf_task = self.client.move_shelf(shelf_id, shelf_home_id)
-            result = await asyncio.wait_for(move_shelf_task, timeout=timeout)
-        except asyncio.TimeoutError:
-            await self.client.cancel_command()
-            result = "TIMEOUT_ERROR"
-        except Exception as e:
-            print(f"❌ コマンド実行エラー: {e}")
-    
-        await self.judge_result("docking_akari", result)
+        await self.run_command(KachakaCommand(
+            "docking_akari", "move_shelf", (shelf_id, shelf_home_id),
+            goal=self.map.lookup(shelf_home_id, "location"), budget=timeout,
+            travel=(start, shelf_home_id, "docking", total_dist), moves_shelf=True,
+        ))
 
 
     @decorated_execution
     async def pick_up(self, furniture_name, destination_name):
         """ 指定した家具を目的地まで運ぶ"""
-        shelves = await self.client.get_shelves()
-        locations = await self.client.get_locations()
-        furniture_mapping = {shelf.name: shelf.id for shelf in shelves}
-        location_mapping = {location.name: location.id for location in locations}
-
-        if furniture_name in furniture_mapping and destination_name in location_mapping:
-            furniture_id = furniture_mapping[furniture_name]
-            destination_id = location_mapping[destination_name]
-
-            result = await self.client.move_shelf(furniture_id, destination_id)
-            
-            print(f"家具 {furniture_name} を目的地 {destination_name} へ運びました。")
-            await self.judge_result("move_shelf", result)
+        furniture = await self.map.resolve(furniture_name, "shelf")
+        destination = await self.map.resolve(destination_name, "location")
+
+        if furniture and destination:
+            start = await self.current_place()
+            print(f"家具 {furniture_name} を目的地 {destination_name} へ運びます。")
+            await self.run_command(KachakaCommand(
+                "move_shelf", "move_shelf", (furniture.id, destination.id),
+                travel=(start, destination.id, "pick_up", None), moves_shelf=True,
+            ))
         else:
             print(f"❌ 指定された家具または目的地が見つかりません: {furniture_name} -> {destination_name}")
 
@@ -224,74 +312,54 @@ class KachakaModule:
     async def undock_shelf(self):
         """ 現在ドッキングしている家具をその場に置く """
         print("家具をその場に置きます。")
-        result = await self.client.undock_shelf()
-        await self.judge_result("undock_shelf", result)
+        await self.run_command(KachakaCommand("undock_shelf", "undock_shelf", moves_shelf=True))
 
     @decorated_execution
     async def put_away(self, shelf_name=None):
         """ 家具を元の位置に片付ける """
-        shelves = await self.client.get_shelves()
-        shelf_mapping = {shelf.name: shelf.id for shelf in shelves}
-        
-        result = None
         if shelf_name:
-            if shelf_name in shelf_mapping:
-                result = await self.client.return_shelf(shelf_mapping[shelf_name])
-            else:
+            shelf = await self.map.resolve(shelf_name, "shelf")
+            if not shelf:
                 print(f"❌ 指定された家具 '{shelf_name}' が見つかりません。")
                 return
+            args = (shelf.id,)
         else:
             print("現在ドッキングしている家具を片付けます。")
-            result = await self.client.return_shelf()
-            
-        await self.judge_result("return_shelf", result)
+            args = ()
+
+        await self.run_command(KachakaCommand("return_shelf", "return_shelf", args, moves_shelf=True))
 
     @decorated_execution
     async def move_to_location(self, location_name):
         """ 指定したロケーションへKachakaを移動させる """
-        await self.client.update_resolver()
-        locations = await self.client.get_locations()
-        location_mapping = {loc.name: loc.id for loc in locations}
+        location = await self.map.resolve(location_name, "location")
     
-        if location_name in location_mapping:
+        if location:
             dis = await self.get_dist(location_name)
             if dis is None: dis = 0
             
-            timeout = await self.moving_timeout(dis)
-            result = None
+            start = await self.current_place()
+            timeout = await self.moving_timeout(dis, "move", start=start, goal=location.id)
 
-            try:
-                task = self.client.move_to_location(location_mapping[location_name])
-                result = await asyncio.wait_for(task, timeout=timeout)
-            except asyncio.TimeoutError:
-                await self.client.cancel_command()
-                result = "TIMEOUT_ERROR"
-            except Exception as e:
-                print(f"❌ エラー: {e}")
-
-            await self.judge_result("move_to_location", result)
+            await self.run_command(KachakaCommand(
+                "move_to_location", "move_to_location", (location.id,),
+                goal=location, budget=timeout, travel=(start, location.id, "move", dis),
+            ))
         else:
             print(f"❌ 指定された場所 '{location_name}' が見つかりません。")
 
     @decorated_execution
     async def state_object_kachaka(self):
         """ Kachakaの現在の状態を取得（RUNNING、READYなど）"""
-        running_command = await self.client.get_running_command()
-        if running_command:
-            return "RUNNING"
-        if await self.client.get_manual_control_enabled() or await self.client.get_auto_homing_enabled():
-            return "READY"
-        if await self.client.get_history_list():
-            return "Waiting"
-        return "Dormant"
+        snapshot = await self.telemetry.snapshot()
+        return snapshot.state()
 
     @decorated_execution
     async def speak_kachaka(self, message):
         """ Kachakaに音声で発話させる """
-        await self.volume_control(self.starting_volume)
-        result = await self.client.speak(message)
+        # 連続した発話は1つのセッションとして扱い、最後の発話の後にまとめてミュートする
+        result = await self.speaker.speak(message)
         await self.judge_result("speak", result)
-        await self.volume_control()
 
     @decorated_execution
     async def return_home(self):
@@ -303,50 +371,45 @@ class KachakaModule:
     @decorated_execution
     async def get_running_command(self):
         """ 実行中のコマンドを返す """
-        return await self.client.get_running_command()
+        snapshot = await self.telemetry.snapshot()
+        return snapshot.running_command
     
     @decorated_execution
     async def get_pose(self):
         """ マップ上の姿勢の取得 """
-        return await self.client.get_robot_pose()
+        snapshot = await self.telemetry.snapshot()
+        return snapshot.pose
     
     # ========== ユーティリティ・制御関数 ==========
 
     async def volume_control(self, vol: int=0):
-        await self.client.set_speaker_volume(vol)
+        """ 音量を設定する (現在と同じ音量なら通信しない) """
+        await self.speaker.set_volume(vol)
     
     async def speak(self, msg):
         """ タスク外での発話用 """
-        await self.volume_control(self.starting_volume)
-        await self.client.speak(msg)
-        await self.volume_control()
+        await self.speaker.speak(msg)
 
     async def get_dist(self, fin_name=None, st_name="kachaka"):
         """ 直線距離を計算 """
         if fin_name is None:
             return None
         
-        locations = await self.client.get_locations()
-        shelves = await self.client.get_shelves()
-        all_targets = list(locations) + list(shelves)
-
-        st_pose = None
-        fin_pose = None
-
+        # 名前の一部でも一致すればよい (ロケーション → 家具 の順に探す)
+        fin_pose = await self.map.resolve(fin_name, partial=True)
         if st_name == "kachaka":
-            st_pose = await self.client.get_robot_pose()
+            st_pose = (await self.telemetry.snapshot()).pose
         else:
-            for part in all_targets:
-                if st_name in part.name:
-                    st_pose = part.pose
-                    break
-        
-        for part in all_targets:
-            if fin_name in part.name:
-                fin_pose = part.pose
-                break
-
-        if fin_pose is None or st_pose is None:
+            st_pose = await self.map.resolve(st_name, partial=True)
+            # 登録地点どうしの距離はコスト行列から引く
+            if st_pose is not None and fin_pose is not None:
+                await self.travel_costs.sync()
+                distance = self.travel_costs.distance(st_pose.id, fin_pose.id)
+                if distance is not None:
+                    print(f"📏 距離 ({st_name}->{fin_name}): {distance:.1f}m")
+                    return distance
+
+        if fin_pose is None or st_pose is None or fin_pose.x is None or st_pose.x is None:
             print(f"⚠️ ターゲットが見つかりません: {st_name} -> {fin_name}")
             return None
         
@@ -356,8 +419,26 @@ class KachakaModule:
         print(f"📏 距離計測 ({st_name}->{fin_name}): {distance:.1f}m")
         return distance
 
-    async def moving_timeout(self, dist=None, act_name=None):
-        """ タイムアウト時間の計算 """
+    async def current_place(self):
+        """ 現在地に最も近い登録ロケーションのID (snap_radius 以内に無ければ "unknown") """
+        pose = (await self.telemetry.snapshot()).pose
+        await self.map.ensure_fresh()
+        location = self.map.nearest(pose.x, pose.y, self.snap_radius)
+        return location.id if location else UNKNOWN_START
+
+    def record_travel(self, result, start, goal, act_name, dist, started):
+        """ 成功した移動の所要時間を学習用に記録する (失敗・中断した移動は記録しない) """
+        if getattr(result, "success", False) is True:
+            self.travel_model.record(start, goal, act_name, dist, time.monotonic() - started)
+
+    async def moving_timeout(self, dist=None, act_name=None, start=None, goal=None):
+        """ タイムアウト時間の計算 (経路の実測値があればそこから、無ければ距離から求める) """
+        if goal is not None:
+            learned = self.travel_model.timeout(start, goal, act_name)
+            if learned is not None:
+                print(f"⏳ タイムアウト設定 (実測 {self.travel_model.estimate(start, goal, act_name)}): {learned:.1f}秒")
+                return learned
+
         default = 30
         timeout = default
         if dist is None:
@@ -370,6 +451,51 @@ class KachakaModule:
         print(f"⏳ タイムアウト設定: {timeout:.1f}秒")
         return timeout
     
+    async def run_command(self, command):
+        """
+        解決済みのコマンドを発行し、結果を判定する
+        発行中のコマンドは active_command に置き、一時停止時は pending_command として再開に使う
+        """
+        self.active_command = command
+        command.attempts += 1
+        result = None
+        started = time.monotonic()
+
+        try:
+            rpc = getattr(self.client, command.rpc)(*command.args)
+            if command.budget is None:
+                result = await rpc
+            else:
+                result = await self.watchdog.watch(rpc, goal=command.goal, budget=command.budget)
+            # 途中で中断した移動の所要時間は経路の実測値にならないため、記録しない
+            if command.travel is not None and not command.resumed:
+                self.record_travel(result, *command.travel, started)
+        except asyncio.TimeoutError:
+            await self.client.cancel_command()
+            result = TIMEOUT_RESULT
+        except Exception as e:
+            if command.budget is None:
+                raise
+            print(f"❌ コマンド実行エラー: {e}") # 見張り付きの移動は従来どおりタスクを止めない
+            await self.client.cancel_command() # 見張りが失敗しても、ロボットの走行は止める
+        finally:
+            command.consume(time.monotonic() - started, floor=self.watchdog.stall_seconds)
+            if command.moves_shelf:
+                self.map.invalidate() # 家具の位置が変わるため
+
+        await self.judge_result(command.label, result)
+
+    async def _resume_command(self, command):
+        """ 中断したコマンドを、解決済みのIDのまま発行し直す """
+        if command.budget is not None and command.goal is not None and command.goal.has_pose:
+            # 見込み時間は現在地から目的地までで求め直す (残り時間では見張りの上限が短くなりすぎるため)
+            pose = (await self.telemetry.snapshot()).pose
+            dist = math.hypot(command.goal.x - pose.x, command.goal.y - pose.y)
+            act_name = command.travel[2] if command.travel else None
+            start = await self.current_place()
+            command.budget = await self.moving_timeout(dist, act_name, start=start, goal=command.goal.id)
+        await self.run_command(command)
+
     async def cancel_command(self):
         """ コマンドキャンセル """
         await self.client.cancel_command()
@@ -388,6 +514,7 @@ class KachakaModule:
         self.stop_flag = True
         self.pause_event.set() # 停止時はpause待ちを解除する
         self.pending_task = None
+        self.pending_command = None
 
     async def pause(self):
         """ pauseイベントをclear (一時停止) する """
@@ -404,8 +531,7 @@ class KachakaModule:
 
         # 実行中のタスクがあれば pending_task に退避
         if self.current_task and self.pending_task is None:
-            self.pending_task = self.current_task
-            print(f"📌 Kachaka: タスクを保存しました: {self.pending_task[0]}")
+            self._save_pending()
             
             # コマンド停止
             if await self.client.is_command_running():
@@ -437,58 +563,76 @@ class KachakaModule:
         print("🔁 Kachaka: リセット(RESET)要求を受信しました")
         self.stop_flag = False 
         self.pending_task = None 
+        self.pending_command = None
         self.current_task = None  
         self.pause_event.set()
 
     # ========== 結果判定 ==========
-    async def judge_result(self, label: str, result: str):
-        result_str = str(result)
-        
-        if "error_code" in result_str.lower():
-            print(f"🔴 {label} 失敗 (Error): {result_str}")
-            try:
-                error_code = int(result_str.split()[1])
-                if error_code in self.interrupt_error:
-                    return # 割り込みによるエラーは無視
-                
-            except ValueError:
-                pass
-
-            if error_code in self.safety_error:
-                self.pause_event.clear()
-                if self.current_task and self.pending_task is None:
-                    self.pending_task = self.current_task
-                    print(f"📌 Kachaka: タスクを保存しました: {self.pending_task[0]}")
-                return # kachakaの警告感知の場合は無視
-            
+    async def judge_result(self, label: str, result):
+        # コマンドが終わったため、次の状態問い合わせでは取得し直す
+        self.telemetry.invalidate()
+        self.error_catalog.start()
+        status, error_code = classify_result(result)
+
+        if status != "error":
+            self.retry_count = 0
+
+        if status == "error":
+            print(f"🔴 {label} 失敗 (Error): {result}")
+            policy = self.error_policies.get(error_code, self.default_error_policy)
+
+            if policy == "ignore":
+                return # 割り込みによるエラーは無視
+
+            if policy == "pause":
+                self._pause_for_recovery()
+                return # kachakaの警告感知の場合は一時停止して RESUME を待つ
+
             # 詳細表示
-            all_errors = await self.client.get_robot_error_code()
-            err = all_errors.get(error_code)
+            err = await self.error_catalog.get(error_code)
             if err:
                 print(f"   [{err.code}] {err.title}: {err.description}")
+
+            if policy == "retry" and self.retry_count < self.max_retries:
+                self.retry_count += 1
+                print(f"🔁 Kachaka: 再試行します ({self.retry_count}/{self.max_retries})")
+                if self.current_task and self.pending_task is None:
+                    self._save_pending() # 実行ガードが再実行する
+                return
+
+            self.retry_count = 0
+            if err:
                 await self.speak(err.description)
-            
-            raise Exception(f"Kachaka Error: {result_str}")
+            raise Exception(f"Kachaka Error: {result}")
 
-        elif "success" in result_str.lower():
+        elif status == "success":
             print(f"🟢 {label} 成功")
 
-        elif "timeout_error" in result_str.lower():
+        elif status == "timeout":
             print(f"🟠 {label} タイムアウト")
             await self.speak("移動に時間がかかりすぎています。経路を確認してください。")
             # タイムアウト時も一時停止状態にする
-            self.pause_event.clear()
-            
-            if self.current_task and self.pending_task is None:
-                self.pending_task = self.current_task
-                print(f"📌 Kachaka: タスクを保存しました: {self.pending_task[0]}")
-            
+            self._pause_for_recovery()
+
         else:
-            print(f"⚪️ {label} 結果: {result_str}")
+            print(f"⚪️ {label} 結果: {result}")
+
+    def _pause_for_recovery(self):
+        """ 一時停止状態にし、実行中のタスクを RESUME 時の再実行用に保存する """
+        self.pause_event.clear()
+        if self.current_task and self.pending_task is None:
+            self._save_pending()
+
+    def _save_pending(self):
+        """ 実行中のタスクと、発行中のロボットコマンドを再開用に保存する """
+        self.pending_task = self.current_task
+        self.pending_command = self.active_command
+        detail = "" if self.pending_command is None else f" ({self.pending_command})"
+        print(f"📌 Kachaka: タスクを保存しました: {self.pending_task[0]}{detail}")
 
     async def jf(self):
         """ お片付け・ホーム帰還 """
-        is_docking = await self.client.get_moving_shelf_id()
+        is_docking = (await self.telemetry.snapshot()).moving_shelf_id
         if is_docking:
             await self.client.return_shelf()
         await self.client.return_home()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+    kachaka_command.py
+    一時停止から再開するための、Kachakaのコマンドの記録
+    名前の解決・距離の計算・タイムアウトの計算を終えた状態 (解決済みのID・目的地・残りの見込み時間) を保持し、
+    RESUME 時はメソッド全体をやり直さず、ロボットへのコマンド (1回の通信) だけを発行し直す
+    (目的地の座標が分かるコマンドは、再開時に現在地からの見込み時間を求め直す)
+"""
+
+
+class KachakaCommand:
+    """ 再開可能なコマンド (KachakaApiClient のメソッド名と解決済みの引数) """
+
+    def __init__(self, label, rpc, args=(), goal=None, budget=None, travel=None, moves_shelf=False):
+        """
+        label      : 結果判定 (judge_result) に使うラベル
+        rpc        : KachakaApiClient のメソッド名 ("move_to_location" など)
+        args       : 解決済みの引数 (ロケーション・家具のID)
+        goal       : 目的地の MapEntity (見張り役が残り距離の計算に使用)
+        budget     : 残りの見込み時間 [秒] (None なら見張らずに完了を待つ。目的地の座標が無い場合の再開に使う)
+        travel     : 所要時間の記録用 (出発地, 目的地, 動作, 距離) (None なら記録しない)
+        moves_shelf: 家具の位置が変わるコマンドか (地図キャッシュの無効化に使用)
+        """
+        self.label = label
+        self.rpc = rpc
+        self.args = tuple(args)
+        self.goal = goal
+        self.budget = budget
+        self.travel = travel
+        self.moves_shelf = moves_shelf
+        self.attempts = 0      # 発行した回数 (2回目以降は再開)
+
+    @property
+    def resumed(self):
+        return self.attempts > 1
+
+    def consume(self, elapsed, floor=0.0):
+        """ 実行にかかった時間を見込み時間から差し引く (再開後も floor 秒は見張りの猶予を残す) """
+        if self.budget is not None:
+            self.budget = max(self.budget - elapsed, floor)
+
+    def __repr__(self):
+        budget = "" if self.budget is None else f", 残り{self.budget:.0f}秒"
+        return f"{self.rpc}{self.args}{budget}"
@@ -0,0 +1,101 @@
+"""
+    kachaka_errors.py
+    Kachakaのコマンド結果の分類と、エラーコードごとの対応方針を定義しているプログラム
+    エラーコードの一覧 (タイトル・説明) は一度だけ取得してメモリに保持し、バックグラウンドで更新する
+"""
+
+import asyncio
+
+# エラーコードごとの対応方針
+#   "pause" : 一時停止し、RESUME で同じコマンドを再実行する (安全機能による停止など)
+#   "retry" : すぐに同じコマンドを再実行する (回数上限を超えたら "abort")
+#   "abort" : エラーを発話してタスクを中断する
+#   "ignore": エラーとして扱わない (ユーザー指示によるキャンセルなど)
+POLICIES = ("pause", "retry", "abort", "ignore")
+
+# タイムアウト時に judge_result へ渡す結果
+TIMEOUT_RESULT = "TIMEOUT_ERROR"
+
+
+def classify_result(result):
+    """
+    コマンドの結果を分類する
+    戻り値: (種類, エラーコード)  種類は "success" / "error" / "timeout" / "unknown"
+    """
+    if isinstance(result, str):
+        if result == TIMEOUT_RESULT:
+            return "timeout", None
+        return "unknown", None
+
+    # kachaka_api の Result (success / error_code フィールド) をそのまま見る
+    if getattr(result, "success", False) is True:
+        return "success", None
+    error_code = getattr(result, "error_code", 0)
+    if error_code:
+        return "error", error_code
+    return "unknown", None
+
+
+def build_policy_table(error_codes):
+    """ config の error_codes (safety / interrupt / policies) から コード -> 方針 の表を作る """
+    table = {}
+    table.update({code: "pause" for code in error_codes.get("safety", ())})
+    table.update({code: "ignore" for code in error_codes.get("interrupt", ())})
+    table.update(error_codes.get("policies", {}))
+
+    unknown = {code: policy for code, policy in table.items() if policy not in POLICIES}
+    if unknown:
+        raise ValueError(f"不明なエラー対応方針: {unknown}")
+    return table
+
+
+class ErrorCatalog:
+    """ エラーコードの一覧 (コード -> タイトル・説明) のキャッシュ """
+
+    def __init__(self, client, refresh_interval=None):
+        """
+        client          : kachaka_api.aio.KachakaApiClient
+        refresh_interval: バックグラウンドで取得し直す間隔 [秒] (None なら初回のみ)
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.errors = None
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def load(self):
+        """ 一覧を取得する """
+        async with self._lock:
+            await self._fetch()
+
+    async def _fetch(self):
+        self.errors = await self.client.get_robot_error_code()
+        print(f"📕 エラーコード一覧を取得しました ({len(self.errors)}件)")
+
+    def start(self):
+        """ 未取得であれば、バックグラウンドで取得 (と定期更新) を始める """
+        if self._refresh_task is None or self._refresh_task.done():
+            if self.errors is None or self.refresh_interval:
+                self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        stale = False   # 初回は get() が先に取得していれば取得しない
+        while True:
+            try:
+                async with self._lock:
+                    if stale or self.errors is None:
+                        await self._fetch()
+            except Exception as e:
+                print(f"⚠️ エラーコード一覧の取得に失敗しました (前回の一覧を使用します): {e}")
+            if not self.refresh_interval:
+                return
+            await asyncio.sleep(self.refresh_interval)
+            stale = True
+
+    async def get(self, code):
+        """ コードの詳細を返す (未取得の場合のみ取得を待つ) """
+        if self.errors is None:
+            async with self._lock:
+                if self.errors is None:   # バックグラウンドの取得が先に終わっていれば取得しない
+                    await self._fetch()
+        return self.errors.get(code)
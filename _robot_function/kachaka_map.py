@@ -0,0 +1,188 @@
+"""
+    kachaka_map.py
+    Kachakaに登録されたロケーション・家具（棚）とその姿勢をメモリ上に保持する地図キャッシュ
+    名前・ID・別名 (config の locations) の索引を作っておき、移動系コマンドのたびに
+    get_locations / get_shelves を呼ばずに検索できるようにする
+"""
+
+import asyncio
+import math
+import time
+import unicodedata
+
+# 検索対象の種類 (種類を指定しない検索はこの順に探す)
+ENTITY_KINDS = ("location", "shelf")
+
+# 見つからなかった名前で再取得を行う最短間隔 [秒] (存在しない名前で何度も問い合わせないため)
+MISS_REFRESH_INTERVAL = 5.0
+
+
+def normalize_name(name):
+    """ 表記ゆれ (全角/半角・大文字/小文字・空白) を吸収した検索用の名前 """
+    return "".join(unicodedata.normalize("NFKC", str(name)).casefold().split())
+
+
+class MapEntity:
+    """ ロケーションまたは家具1件分の情報 """
+
+    def __init__(self, kind, id, name, pose, home_location_id=None):
+        self.kind = kind
+        self.id = id
+        self.name = name
+        self.x = pose.x if pose else None
+        self.y = pose.y if pose else None
+        self.theta = getattr(pose, "theta", None) if pose else None
+        self.home_location_id = home_location_id
+
+    @property
+    def has_pose(self):
+        return self.x is not None and self.y is not None
+
+    def __repr__(self):
+        return f"{self.kind}:{self.id}({self.name})"
+
+
+class KachakaMapCache:
+    """ ロケーション・家具の一覧を保持し、名前・ID・別名から検索する """
+
+    def __init__(self, client, aliases=None, refresh_interval=None, max_age=None):
+        """
+        client          : kachaka_api.aio.KachakaApiClient
+        aliases         : 別名 -> ID の辞書 (config.ROBOTS["kachaka"]["locations"])
+        refresh_interval: バックグラウンドで再取得する間隔 [秒] (None なら行わない)
+        max_age         : これより古い内容は使用前に再取得する [秒] (None なら無期限)
+        """
+        self.client = client
+        self.aliases = {normalize_name(k): v for k, v in (aliases or {}).items()}
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+
+        self.entities = {kind: [] for kind in ENTITY_KINDS}
+        self._by_id = {kind: {} for kind in ENTITY_KINDS}
+        self._by_name = {kind: {} for kind in ENTITY_KINDS}
+
+        self.version = 0         # 取得し直すたびに増える (内容の変化の検知用)
+        self.updated_at = None   # 最後に取得した時刻 (time.monotonic)
+        self._dirty = True       # True なら次の使用前に再取得する
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    # ========== 取得・更新 ==========
+
+    def invalidate(self):
+        """ 内容が変わった可能性がある場合 (家具の移動後など) に呼ぶ。次の使用前に再取得される """
+        self._dirty = True
+
+    def _is_stale(self):
+        if self._dirty or self.updated_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.updated_at > self.max_age
+
+    async def refresh(self):
+        """ ロケーションと家具の一覧を取得し直して索引を作り直す """
+        async with self._lock:
+            await self._refresh_locked()
+
+    async def ensure_fresh(self):
+        """ 内容が古い・無効化されている場合のみ再取得する """
+        self._start_background_refresh()
+        if self._is_stale():
+            async with self._lock:
+                # ロック待ちの間に他の呼び出しが更新していれば何もしない
+                if self._is_stale():
+                    await self._refresh_locked()
+
+    async def _refresh_locked(self):
+        locations, shelves = await asyncio.gather(self.client.get_locations(), self.client.get_shelves())
+
+        self.entities = {
+            "location": [MapEntity("location", loc.id, loc.name, loc.pose) for loc in locations],
+            "shelf": [
+                MapEntity("shelf", shelf.id, shelf.name, shelf.pose, getattr(shelf, "home_location_id", None))
+                for shelf in shelves
+            ],
+        }
+        for kind, entities in self.entities.items():
+            self._by_id[kind] = {e.id: e for e in entities}
+            self._by_name[kind] = {normalize_name(e.name): e for e in entities}
+
+        self.version += 1
+        self.updated_at = time.monotonic()
+        self._dirty = False
+        print(f"🗺️  地図キャッシュを更新しました (ロケーション {len(locations)}件, 家具 {len(shelves)}件)")
+
+    def _start_background_refresh(self):
+        if not self.refresh_interval or (self._refresh_task and not self._refresh_task.done()):
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ 地図キャッシュの定期更新に失敗しました: {e}")
+
+    def close(self):
+        """ バックグラウンド更新を止める """
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    # ========== 検索 ==========
+
+    def lookup(self, key, kind=None, partial=False):
+        """
+        メモリ上の索引から検索する (通信なし)
+        ID → 別名 → 名前 の順に完全一致を探し、partial=True なら名前の部分一致も許可する
+        """
+        if key is None:
+            return None
+        kinds = (kind,) if kind else ENTITY_KINDS
+        normalized = normalize_name(key)
+        alias_id = self.aliases.get(normalized)
+
+        for k in kinds:
+            for entity in (
+                self._by_id[k].get(key),
+                self._by_id[k].get(alias_id),
+                self._by_name[k].get(normalized),
+            ):
+                if entity is not None:
+                    return entity
+
+        if partial:
+            for k in kinds:
+                for name, entity in self._by_name[k].items():
+                    if normalized in name:
+                        return entity
+        return None
+
+    async def resolve(self, key, kind=None, partial=False):
+        """ 検索する。見つからない場合は地図が更新された可能性があるため、一度だけ再取得してから探し直す """
+        await self.ensure_fresh()
+        entity = self.lookup(key, kind, partial)
+        if entity is None and time.monotonic() - self.updated_at > MISS_REFRESH_INTERVAL:
+            await self.refresh()
+            entity = self.lookup(key, kind, partial)
+        return entity
+
+    def nearest(self, x, y, max_distance=None, kind="location"):
+        """ 座標に最も近い登録地点 (max_distance より遠ければ None) """
+        best, best_distance = None, None
+        for entity in self.entities[kind]:
+            if not entity.has_pose:
+                continue
+            distance = math.hypot(entity.x - x, entity.y - y)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = entity, distance
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None
+        return best
+
+    def locations(self):
+        return list(self.entities["location"])
+
+    def shelves(self):
+        return list(self.entities["shelf"])
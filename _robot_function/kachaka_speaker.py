@@ -0,0 +1,65 @@
+"""
+    kachaka_speaker.py
+    Kachakaのスピーカー音量を管理し、発話をまとめて1つの発話セッションとして扱うプログラム
+    現在の音量を覚えておき、同じ音量の再設定は送らない
+    連続した発話の間はミュートせず、最後の発話から一定時間経ったときに1回だけミュートする
+"""
+
+import asyncio
+
+
+class KachakaSpeaker:
+    """ 音量の状態と、発話後の遅延ミュートを管理する """
+
+    def __init__(self, client, speaking_volume, idle_mute_delay=2.0):
+        """
+        client         : kachaka_api.aio.KachakaApiClient
+        speaking_volume: 発話時の音量
+        idle_mute_delay: 最後の発話からミュートするまでの時間 [秒]
+        """
+        self.client = client
+        self.speaking_volume = speaking_volume
+        self.idle_mute_delay = idle_mute_delay
+        self.volume = None        # 最後に設定した音量 (None は不明)
+        self._mute_task = None
+
+    async def set_volume(self, vol):
+        """ 音量を設定する (既に同じ音量なら通信しない) """
+        if vol == self.volume:
+            return
+        try:
+            await self.client.set_speaker_volume(vol)
+        except BaseException:
+            self.volume = None    # 設定できたか分からないため、次回は必ず送る
+            raise
+        self.volume = vol
+
+    async def speak(self, message):
+        """ 発話する。連続した発話の間はミュートせず、最後の発話の後にミュートを予約する """
+        self._cancel_mute()
+        try:
+            await self.set_volume(self.speaking_volume)
+            return await self.client.speak(message)
+        finally:
+            self._schedule_mute()
+
+    async def mute(self):
+        """ 予約を待たずにすぐミュートする (発話セッションの終了) """
+        self._cancel_mute()
+        await self.set_volume(0)
+
+    def _cancel_mute(self):
+        if self._mute_task is not None and not self._mute_task.done():
+            self._mute_task.cancel()
+        self._mute_task = None
+
+    def _schedule_mute(self):
+        self._cancel_mute()
+        self._mute_task = asyncio.create_task(self._mute_later())
+
+    async def _mute_later(self):
+        await asyncio.sleep(self.idle_mute_delay)
+        try:
+            await self.set_volume(0)
+        except Exception as e:
+            print(f"⚠️ Kachaka: ミュートに失敗しました: {e}")
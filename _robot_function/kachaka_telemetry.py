@@ -0,0 +1,170 @@
+"""
+    kachaka_telemetry.py
+    Kachakaの姿勢・実行中コマンド・ドッキング中の家具・バッテリーなどを
+    バックグラウンドで定期取得し、時刻付きのスナップショットとして保持するプログラム
+    状態の問い合わせは、指定した鮮度の範囲内であれば通信せずにスナップショットを返す
+    姿勢・コマンドの状態は毎回、バッテリー・コマンド履歴は長めの間隔でだけ取得する
+    一部のRPCが失敗しても、その項目は前回の値を使い、スナップショット全体は失敗させない
+"""
+
+import asyncio
+import time
+
+# 毎回取得する項目 (項目名 -> KachakaApiClient のメソッド名)
+FAST_FIELDS = {
+    "pose": "get_robot_pose",
+    "running_command": "get_running_command",
+    "moving_shelf_id": "get_moving_shelf_id",
+    "manual_control_enabled": "get_manual_control_enabled",
+    "auto_homing_enabled": "get_auto_homing_enabled",
+}
+
+# slow_interval ごとに取得する項目 (コマンド履歴は一覧全体が返るため重い)
+SLOW_FIELDS = {
+    "battery": "get_battery_info",
+    "history": "get_history_list",
+}
+
+
+class TelemetrySnapshot:
+    """ ある時点でのKachakaの状態 """
+
+    def __init__(self, pose, running_command, moving_shelf_id, battery,
+                 manual_control_enabled, auto_homing_enabled, has_history):
+        self.pose = pose                              # マップ上の姿勢 (x, y, theta)
+        self.running_command = running_command       # 実行中のコマンド (無ければ None)
+        self.moving_shelf_id = moving_shelf_id       # ドッキング中の家具ID (無ければ空)
+        self.battery = battery                        # (残量[%], 給電状態)
+        self.manual_control_enabled = manual_control_enabled
+        self.auto_homing_enabled = auto_homing_enabled
+        self.has_history = has_history               # コマンド履歴があるか
+        self.updated_at = time.monotonic()
+
+    @property
+    def age(self):
+        """ 取得してからの経過時間 [秒] """
+        return time.monotonic() - self.updated_at
+
+    def state(self):
+        """ state_object_kachaka と同じ分類 (RUNNING / READY / Waiting / Dormant) """
+        if self.running_command:
+            return "RUNNING"
+        if self.manual_control_enabled or self.auto_homing_enabled:
+            return "READY"
+        if self.has_history:
+            return "Waiting"
+        return "Dormant"
+
+
+class KachakaTelemetry:
+    """ 状態をバックグラウンドで取得し続け、最新のスナップショットを提供する """
+
+    def __init__(self, client, interval=None, max_age=None, slow_interval=10.0):
+        """
+        client       : kachaka_api.aio.KachakaApiClient
+        interval     : バックグラウンドで取得する間隔 [秒] (None なら行わない)
+        max_age      : スナップショットをそのまま返してよい最大の経過時間 [秒]
+        slow_interval: バッテリー・コマンド履歴を取得し直す間隔 [秒]
+        """
+        self.client = client
+        self.interval = interval
+        self.max_age = max_age
+        self.slow_interval = slow_interval
+        self.latest = None
+        self._values = {}          # 項目ごとの最後に取得できた値
+        self._slow_at = None       # バッテリー・コマンド履歴を最後に取得した時刻
+        self._failed_fields = set()
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._watch_task = None
+
+    def invalidate(self):
+        """ 状態が変わったとき (コマンドの終了時など) に呼ぶ。次の問い合わせで取得し直す """
+        self._stale = True
+
+    def _is_fresh(self, max_age):
+        if self._stale or self.latest is None:
+            return False
+        return max_age is None or self.latest.age <= max_age
+
+    def _slow_due(self):
+        return self._slow_at is None or time.monotonic() - self._slow_at >= self.slow_interval
+
+    async def poll(self):
+        """ 状態をまとめて取得する (各RPCは並行して送り、失敗した項目は前回の値を使う) """
+        async with self._lock:
+            fields = dict(FAST_FIELDS)
+            slow = self._slow_due()
+            if slow:
+                fields.update(SLOW_FIELDS)
+            started = time.monotonic()
+            results = await asyncio.gather(
+                *(getattr(self.client, rpc)() for rpc in fields.values()),
+                return_exceptions=True,
+            )
+
+            errors = {}
+            for name, result in zip(fields, results):
+                if isinstance(result, BaseException):
+                    errors[name] = result
+                else:
+                    self._values[name] = result
+            if slow and not errors.keys() & SLOW_FIELDS.keys():
+                self._slow_at = started
+            self._report(errors)
+            if "pose" not in self._values:
+                raise errors["pose"] # 姿勢が一度も取得できていなければスナップショットを作れない
+
+            values = self._values
+            self.latest = TelemetrySnapshot(
+                values["pose"], values.get("running_command"), values.get("moving_shelf_id"),
+                values.get("battery"), values.get("manual_control_enabled"),
+                values.get("auto_homing_enabled"), bool(values.get("history")),
+            )
+            self._stale = False
+            return self.latest
+
+    def _report(self, errors):
+        """ 取得に失敗した項目が変わったときだけ表示する (定期取得で同じ警告を繰り返さない) """
+        failed = set(errors)
+        for name in sorted(failed - self._failed_fields):
+            print(f"⚠️ Kachakaの状態 {name} の取得に失敗しました (前回の値を使います): {errors[name]}")
+        for name in sorted(self._failed_fields - failed):
+            print(f"✅ Kachakaの状態 {name} の取得が復旧しました")
+        self._failed_fields = failed
+
+    async def snapshot(self, max_age=None):
+        """
+        最新のスナップショットを返す
+        max_age (省略時は設定値) より古い場合、または無効化されている場合のみ取得し直す
+        """
+        self._start_watcher()
+        max_age = self.max_age if max_age is None else max_age
+        if self._is_fresh(max_age):
+            return self.latest
+        return await self.poll()
+
+    def _start_watcher(self):
+        if not self.interval or (self._watch_task and not self._watch_task.done()):
+            return
+        self._watch_task = asyncio.create_task(self._watch_loop())
+
+    async def _watch_loop(self):
+        failed = False
+        while True:
+            try:
+                await self.poll()
+                if failed:
+                    print("✅ Kachakaの状態取得が復旧しました")
+                failed = False
+            except Exception as e:
+                if not failed:
+                    print(f"⚠️ Kachakaの状態取得に失敗しました (前回の値を保持します): {e}")
+                failed = True
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        """ バックグラウンド取得を止める """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
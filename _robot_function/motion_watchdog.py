@@ -0,0 +1,88 @@
+"""
+    motion_watchdog.py
+    Kachakaの移動コマンドの実行中に姿勢を定期的に確認し、進捗が止まった（スタックした）ときだけ
+    タイムアウトとして扱う見張り役
+    ゆっくりでも進んでいる移動は打ち切らず、止まっている移動は数秒で検知する
+"""
+
+import asyncio
+import math
+import time
+
+
+class MotionWatchdog:
+    """ 移動コマンドの進捗 (移動量・回転量・目的地までの残り距離) を見張る """
+
+    def __init__(self, telemetry, interval=1.0, stall_seconds=8.0,
+                 min_progress=0.05, min_rotation=0.1, budget_factor=3.0):
+        """
+        telemetry    : KachakaTelemetry (姿勢の取得に使用)
+        interval     : 姿勢を確認する間隔 [秒]
+        stall_seconds: この時間進捗が無ければスタックとみなす [秒]
+        min_progress : 進捗とみなす移動量・残り距離の減少 [m]
+        min_rotation : 進捗とみなす回転量 [rad] (ドッキング時のその場旋回など)
+        budget_factor: 見込み時間 × この倍率を超えたら、進捗があっても打ち切る (最後の安全策)
+        """
+        self.telemetry = telemetry
+        self.interval = interval
+        self.stall_seconds = stall_seconds
+        self.min_progress = min_progress
+        self.min_rotation = min_rotation
+        self.budget_factor = budget_factor
+
+    async def watch(self, command, goal=None, budget=None):
+        """
+        コマンド (コルーチン) を実行し、その結果を返す
+        goal  : 目的地 (x, y を持つオブジェクト。残り距離の計算に使用)
+        budget: 見込み時間 [秒] (moving_timeout の値)
+        スタックした場合・上限時間を超えた場合は asyncio.TimeoutError を送出する (コマンドは中断される)
+        """
+        task = asyncio.ensure_future(command)
+        started = time.monotonic()
+        limit = None if budget is None else budget * self.budget_factor
+
+        mark = None            # 最後に進捗があったときの姿勢
+        mark_time = started
+        best_remaining = None  # これまでで最も目的地に近かったときの残り距離
+        remaining = None
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.interval)
+                if task in done:
+                    return task.result()
+
+                now = time.monotonic()
+                pose = (await self.telemetry.snapshot(max_age=self.interval)).pose
+                if goal is not None and getattr(goal, "x", None) is not None:
+                    remaining = math.hypot(goal.x - pose.x, goal.y - pose.y)
+
+                if mark is None or self._progressed(mark, pose, best_remaining, remaining):
+                    mark, mark_time = pose, now
+                    if remaining is not None:
+                        best_remaining = remaining if best_remaining is None else min(best_remaining, remaining)
+
+                if now - mark_time >= self.stall_seconds:
+                    detail = "" if remaining is None else f" (残り {remaining:.1f}m)"
+                    print(f"🧱 {self.stall_seconds:.0f}秒間進捗が無いため、スタックとみなします{detail}")
+                    raise asyncio.TimeoutError()
+
+                if limit is not None and now - started >= limit:
+                    print(f"⌛ 見込み時間の{self.budget_factor:.0f}倍 ({limit:.0f}秒) を超えたため打ち切ります")
+                    raise asyncio.TimeoutError()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def _progressed(self, mark, pose, best_remaining, remaining):
+        """ 前回の進捗時点から、移動・回転したか、目的地に近づいたか """
+        if math.hypot(pose.x - mark.x, pose.y - mark.y) >= self.min_progress:
+            return True
+        rotation = abs(math.remainder(pose.theta - mark.theta, math.tau))
+        if rotation >= self.min_rotation:
+            return True
+        return (
+            remaining is not None and best_remaining is not None
+            and best_remaining - remaining >= self.min_progress
+        )
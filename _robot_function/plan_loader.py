@@ -0,0 +1,109 @@
+"""
+    plan_loader.py
+    行動計画スクリプト（Python）を一度だけコンパイルしてキャッシュし、独立した名前空間で実行するプログラム
+    同じ内容のスクリプトはハッシュが一致するため、再実行時に構文解析・コンパイルを行わない
+"""
+
+import ast
+import asyncio
+import builtins
+import hashlib
+from collections import OrderedDict
+
+import config
+from _LLM.script_parser import compile_statement, split_statements
+
+# スクリプト全体をラップする関数名 (a -> kachaka , b -> akari)
+PLAN_FUNCTION = "_main"
+
+
+def plan_namespace(kachaka, akari):
+    """ 行動計画を実行するための最小限の名前空間 (実行ごとに新しく作る) """
+    return {"__builtins__": builtins, "a": kachaka, "b": akari, "asyncio": asyncio}
+
+
+class CompiledPlan:
+    """ コンパイル済みの行動計画 """
+
+    def __init__(self, digest, source):
+        self.digest = digest
+        self.source = source
+        self.code = self._compile(source)
+        self._statements = None
+        self._statement_codes = None
+
+    @staticmethod
+    def _compile(source):
+        """ スクリプト全体を async def _main(a, b) の本体としてコンパイルする """
+        # 文字列でインデントを足すと複数行の文字列リテラルまで書き換わるため、ASTで関数の本体に差し込む
+        module = ast.parse(source, filename="<llm_plan>")
+        wrapper = ast.parse(f"async def {PLAN_FUNCTION}(a, b):\n    pass")
+        if module.body:
+            wrapper.body[0].body = module.body
+        return compile(wrapper, "<llm_plan>", "exec")
+
+    @property
+    def statements(self):
+        """ トップレベル文のリスト (並行実行用。初回のみ分割する) """
+        if self._statements is None:
+            self._statements = split_statements(self.source)
+        return self._statements
+
+    @property
+    def statement_codes(self):
+        """ トップレベル文ごとのコンパイル済みコード (並行実行用。初回のみコンパイルする) """
+        if self._statement_codes is None:
+            self._statement_codes = [compile_statement(st) for st in self.statements]
+        return self._statement_codes
+
+    async def run(self, kachaka, akari):
+        """ 新しい名前空間で実行する (計画内で定義した名前はクライアント側に残らない) """
+        namespace = plan_namespace(kachaka, akari)
+        exec(self.code, namespace)
+        await namespace[PLAN_FUNCTION](kachaka, akari)
+
+
+class PlanCache:
+    """ 内容のハッシュをキーにした、コンパイル済み行動計画のLRUキャッシュ """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source):
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        plan = self._plans.get(digest)
+        if plan is not None:
+            self._plans.move_to_end(digest)
+            self.hits += 1
+            return plan
+
+        plan = CompiledPlan(digest, source)
+        self.misses += 1
+        self._plans[digest] = plan
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        self._plans.clear()
+
+
+_plan_cache = None
+
+
+def get_plan_cache():
+    """ 共有のコンパイル済み行動計画キャッシュ """
+    global _plan_cache
+    if _plan_cache is None:
+        _plan_cache = PlanCache(config.PLAN_CACHE_SIZE)
+    return _plan_cache
+
+
+def load_plan(filepath):
+    """ スクリプトファイルを読み込み、コンパイル済みの行動計画を返す (同じ内容なら再コンパイルしない) """
+    with open(filepath, "r", encoding="utf-8") as f:
+        source = f.read()
+    return get_plan_cache().get(source)
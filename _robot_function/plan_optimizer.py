@@ -0,0 +1,236 @@
+"""
+    plan_optimizer.py
+    生成された行動計画の中で、続けて並んでいる移動 (move_to_location / pick_up) の順序を
+    移動コスト行列にもとづいて並べ替え、全体の移動時間が短くなるように書き換えるプログラム
+    (生成と実行の間に挟む任意の処理。LLMの追加呼び出しは行わない)
+
+    並べ替えの制約:
+      - 移動以外の文 (発話・状態確認・待機など) をまたいで並べ替えない (区間の区切りになる)
+      - 区間の最後の移動は固定する (その後の文が到着地点を前提にしている可能性があるため)
+      - 同じ家具を扱う pick_up どうしの順序は保つ
+"""
+
+import ast
+import inspect
+import itertools
+import json
+
+from _robot_function.action_plan import is_talk_action
+from _robot_function.function_list_kachaka import KachakaModule
+from _robot_function.plan_scheduler import ROBOT_VARIABLES
+from _LLM.script_parser import split_statements, is_talk_statement
+
+# 並べ替えの対象にするKachakaのメソッド
+REORDERABLE_ACTIONS = ("move_to_location", "pick_up")
+
+# これ以下の件数の区間はすべての順序を調べる (超える場合は近い順に選ぶ)
+MAX_EXACT_STEPS = 7
+
+
+class MotionStep:
+    """ 並べ替え対象の1ステップ (名前は地図のIDに解決済み) """
+
+    def __init__(self, item, action, shelf, goal):
+        self.item = item        # 元の文 / アクション
+        self.action = action
+        self.shelf = shelf      # pick_up で運ぶ家具のID (move_to_location は None)
+        self.goal = goal        # 到着地点のID
+        self.order = None       # 区間内での元の順番
+
+
+def _bind(action, args, kwargs):
+    """ メソッドの引数を名前付きの辞書にする (引数が合わなければ None) """
+    try:
+        bound = inspect.signature(getattr(KachakaModule, action)).bind(None, *args, **kwargs)
+    except TypeError:
+        return None
+    return {k: v for k, v in bound.arguments.items() if k != "self"}
+
+
+def motion_from_statement(statement):
+    """ 文が「await a.move_to_location(...)」などの単独の移動なら (メソッド名, 引数) を返す """
+    try:
+        tree = ast.parse(statement)
+    except SyntaxError:
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+        return None
+    node = tree.body[0].value
+    if not isinstance(node, ast.Await) or not isinstance(node.value, ast.Call):
+        return None
+    call = node.value
+    if not (
+        isinstance(call.func, ast.Attribute)
+        and isinstance(call.func.value, ast.Name)
+        and ROBOT_VARIABLES.get(call.func.value.id) == "kachaka"
+        and call.func.attr in REORDERABLE_ACTIONS
+    ):
+        return None
+    # 引数が定数の場合のみ対象にする (変数を使う文は前の文の結果に依存する)
+    try:
+        args = [ast.literal_eval(a) for a in call.args]
+        kwargs = {k.arg: ast.literal_eval(k.value) for k in call.keywords}
+    except ValueError:
+        return None
+    bound = _bind(call.func.attr, args, kwargs)
+    return None if bound is None else (call.func.attr, bound)
+
+
+def motion_from_action(step):
+    """ アクションがKachakaの移動なら (メソッド名, 引数) を返す """
+    if step.get("robot") != "kachaka" or step.get("action") not in REORDERABLE_ACTIONS:
+        return None
+    bound = _bind(step["action"], (), step.get("args", {}))
+    return None if bound is None else (step["action"], bound)
+
+
+def _resolve(item, parse, map_cache):
+    """ 移動のステップなら地図のIDに解決した MotionStep を返す (対象外・解決できなければ None) """
+    motion = parse(item)
+    if motion is None:
+        return None
+    action, args = motion
+    if action == "move_to_location":
+        goal = map_cache.lookup(args.get("location_name"), "location")
+        return MotionStep(item, action, None, goal.id) if goal else None
+    shelf = map_cache.lookup(args.get("furniture_name"), "shelf")
+    goal = map_cache.lookup(args.get("destination_name"), "location")
+    return MotionStep(item, action, shelf.id, goal.id) if shelf and goal else None
+
+
+def _route_cost(steps, start, costs):
+    """ 順に実行した場合の見込み所要時間 (コストが不明な区間を含めば None) """
+    position = start
+    shelf_positions = {}    # 計画の途中で運ばれた家具の現在地
+    total = 0.0
+    for step in steps:
+        legs = []
+        if step.shelf is not None:
+            shelf_at = shelf_positions.get(step.shelf, step.shelf)
+            legs.append((position, shelf_at))
+            legs.append((shelf_at, step.goal))
+            shelf_positions[step.shelf] = step.goal
+        else:
+            legs.append((position, step.goal))
+        for a, b in legs:
+            if a is None:   # 出発地が不明な最初の移動はコストに含めない
+                continue
+            if a == b:
+                continue
+            cost = costs.cost(a, b)
+            if cost is None:
+                return None
+            total += cost
+        position = step.goal
+    return total
+
+
+def _respects_order(steps):
+    """ 同じ家具を扱うステップが元の順序を保っているか """
+    seen = {}
+    for step in steps:
+        if step.shelf is None:
+            continue
+        if seen.get(step.shelf, -1) > step.order:
+            return False
+        seen[step.shelf] = step.order
+    return True
+
+
+def order_segment(steps, start, costs):
+    """ 区間のステップを見込み所要時間が最小になる順に並べる (最後のステップは固定) """
+    for i, step in enumerate(steps):
+        step.order = i
+    head, last = steps[:-1], steps[-1]
+
+    if len(head) <= MAX_EXACT_STEPS:
+        candidates = (list(p) + [last] for p in itertools.permutations(head))
+        best, best_cost = None, None
+        for candidate in candidates:
+            if not _respects_order(candidate):
+                continue
+            cost = _route_cost(candidate, start, costs)
+            if cost is not None and (best_cost is None or cost < best_cost):
+                best, best_cost = candidate, cost
+        return best or steps
+
+    # 件数が多い場合は、制約を満たすステップのうち最も近いものから順に選ぶ
+    remaining, ordered = list(head), []
+    while remaining:
+        feasible = [s for s in remaining if _respects_order(ordered + [s])]
+        position = ordered[-1].goal if ordered else start
+        scored = [(_route_cost([s], position, costs), s) for s in feasible]
+        scored = [(c, s) for c, s in scored if c is not None]
+        if not scored:
+            return steps
+        _, chosen = min(scored, key=lambda cs: cs[0])
+        ordered.append(chosen)
+        remaining.remove(chosen)
+    return ordered + [last]
+
+
+def optimize_items(items, parse, is_talk, map_cache, costs, start=None):
+    """
+    行動計画 (文 または アクション のリスト) の移動区間を並べ替える
+    parse: 移動の判定 (motion_from_statement / motion_from_action)
+    is_talk: 発話の判定 (発話はロボットの位置を変えないため、前後で現在地を引き継ぐ)
+    戻り値: (並べ替え後のリスト, 短縮された見込み時間[秒])
+    """
+    resolved = [_resolve(item, parse, map_cache) for item in items]
+    result, saved = [], 0.0
+    position = start
+    i = 0
+    while i < len(items):
+        if resolved[i] is None:
+            # 発話以外の文は位置を変える可能性があるため、以降の現在地は不明とする
+            if not is_talk(items[i]):
+                position = None
+            result.append(items[i])
+            i += 1
+            continue
+
+        # 連続した移動ステップを1つの区間として取り出す
+        j = i
+        while j < len(items) and resolved[j] is not None:
+            j += 1
+        segment = resolved[i:j]
+
+        if len(segment) >= 3:
+            ordered = order_segment(segment, position, costs)
+            before = _route_cost(segment, position, costs)
+            after = _route_cost(ordered, position, costs)
+            if before is not None and after is not None and after < before:
+                saved += before - after
+                segment = ordered
+
+        result.extend(step.item for step in segment)
+        position = segment[-1].goal
+        i = j
+    return result, saved
+
+
+def optimize_plan_file(filepath, map_cache, costs, start=None):
+    """ 行動計画ファイル (スクリプト / JSONのアクションリスト) を最適化して書き換える。短縮時間[秒]を返す """
+    with open(filepath, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    # 出発地がコスト行列に無い (登録地点から離れている) 場合は、最初の移動をコストに含めない
+    if start not in costs.entities:
+        start = None
+
+    if filepath.endswith(".json"):
+        data = json.loads(content)
+        actions, saved = optimize_items(data["actions"], motion_from_action, is_talk_action, map_cache, costs, start)
+        new_content = json.dumps({"actions": actions}, indent=2, ensure_ascii=False)
+    else:
+        # コメント行は直後の文に付けたまま並べ替える
+        statements, saved = optimize_items(
+            split_statements(content, keep_comments=True), motion_from_statement, is_talk_statement, map_cache, costs, start
+        )
+        new_content = "\n".join(statements)
+
+    if saved > 0:
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(new_content)
+        print(f"🧭 移動順序を最適化しました: 見込み {saved:.0f}秒 短縮 ({filepath})")
+    return saved
@@ -0,0 +1,153 @@
+"""
+    plan_scheduler.py
+    行動計画を依存関係グラフに変換し、互いに独立したステップを並行実行するスケジューラを定義しているプログラム
+    使用するロボットの資源 (config.PLAN_RESOURCES) が重ならず、変数の受け渡しもないステップは同時に動かす
+    発話は会話の順序を保ち、直前の移動 (config.PLAN_MOTION_METHODS) の完了を待ってから行う
+"""
+
+import ast
+import asyncio
+
+import config
+from _LLM.script_parser import TALK_FUNCTIONS
+
+# スクリプト内の変数名 -> ロボット名
+ROBOT_VARIABLES = {"a": "kachaka", "b": "akari"}
+
+
+class PlanStep:
+    """ 行動計画の1ステップ (トップレベル文 または アクション) と、その依存関係 """
+
+    def __init__(self, index, payload, resources, reads=(), writes=(), barrier=False):
+        self.index = index
+        self.payload = payload            # 実行する内容 (文字列の文 / アクションの辞書)
+        self.resources = set(resources)   # 使用するロボット資源
+        self.reads = set(reads)           # 参照する変数
+        self.writes = set(writes)         # 代入する変数
+        self.barrier = barrier            # True なら前後のすべてのステップと順序を保つ
+        self.motion = False               # ロボットが移動するステップか
+        self.speech = False               # 発話するステップか
+        self.depends_on = []              # 先に完了している必要があるステップの番号
+
+    def classify(self, robot, method):
+        """ 呼び出すメソッドから、移動・発話のステップかを記録する """
+        self.motion |= method in config.PLAN_MOTION_METHODS.get(robot, ())
+        self.speech |= method in TALK_FUNCTIONS
+
+
+def resources_for(robot, method):
+    """ ロボットのメソッドが使用する資源 (表に無いメソッドはそのロボットの全資源を使うとみなす) """
+    table = config.PLAN_RESOURCES[robot]
+    return set(table.get(method, table["_default"]))
+
+
+def analyse_statement(index, statement):
+    """ トップレベル文をASTで解析し、使用する資源と変数を求める """
+    tree = ast.parse(statement)
+    step = PlanStep(index, statement, ())
+    robot_calls = 0
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Await):
+            call = node.value
+            if (
+                isinstance(call, ast.Call)
+                and isinstance(call.func, ast.Attribute)
+                and isinstance(call.func.value, ast.Name)
+                and call.func.value.id in ROBOT_VARIABLES
+            ):
+                robot = ROBOT_VARIABLES[call.func.value.id]
+                step.resources |= resources_for(robot, call.func.attr)
+                step.classify(robot, call.func.attr)
+                robot_calls += 1
+            else:
+                # ロボット以外の待機 (asyncio.sleep など) は順序の意図があるため並べ替えない
+                step.barrier = True
+        elif isinstance(node, ast.Name) and node.id not in ROBOT_VARIABLES:
+            if isinstance(node.ctx, (ast.Store, ast.Del)):
+                step.writes.add(node.id)
+            else:
+                step.reads.add(node.id)
+
+    # ロボットを操作しない文は内容が読めないため、前後と順序を保つ
+    if robot_calls == 0:
+        step.barrier = True
+    return step
+
+
+def analyse_actions(actions):
+    """ アクションリストの各アクションをステップに変換する """
+    steps = []
+    for i, action in enumerate(actions):
+        step = PlanStep(i, action, resources_for(action["robot"], action["action"]))
+        step.classify(action["robot"], action["action"])
+        steps.append(step)
+    return steps
+
+
+def _conflicts(earlier, later):
+    return bool(
+        earlier.barrier or later.barrier
+        or earlier.resources & later.resources
+        or earlier.writes & (later.reads | later.writes)
+        or earlier.reads & later.writes
+    )
+
+
+def build_dependencies(steps):
+    """
+    各ステップについて、先に完了している必要がある前のステップを求める
+    資源・変数の競合に加え、発話は直前の発話 (会話の順序) と直前の移動 (到着の報告など) を待つ
+    """
+    last_motion = last_speech = None
+    for j, later in enumerate(steps):
+        depends_on = {i for i in range(j) if _conflicts(steps[i], later)}
+        if later.speech:
+            depends_on |= {i for i in (last_motion, last_speech) if i is not None}
+        later.depends_on = sorted(depends_on)
+        if later.motion:
+            last_motion = j
+        if later.speech:
+            last_speech = j
+    return steps
+
+
+def schedule_levels(steps):
+    """ 各ステップを並行実行した場合に何段目で動くか (1始まり) """
+    levels = []
+    for step in steps:
+        levels.append(1 + max((levels[i] for i in step.depends_on), default=0))
+    return levels
+
+
+def schedule_depth(steps):
+    """ 依存関係の最長の連鎖の長さ (並行実行した場合の段数) """
+    return max(schedule_levels(steps), default=0)
+
+
+async def _run_after(dependencies, step, execute):
+    if dependencies:
+        await asyncio.gather(*dependencies)
+    await execute(step)
+
+
+async def run_plan_graph(steps, execute):
+    """
+    依存関係を満たしたステップから順に並行実行する
+    execute(step) は1ステップを実行するコルーチン関数。いずれかが失敗したら残りをキャンセルして例外を送出する
+    """
+    build_dependencies(steps)
+    print(f"🔀 並行実行: {len(steps)}ステップ → {schedule_depth(steps)}段")
+
+    tasks = []
+    for step in steps:
+        dependencies = [tasks[i] for i in step.depends_on]
+        tasks.append(asyncio.create_task(_run_after(dependencies, step, execute)))
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,135 @@
+"""
+    travel_costs.py
+    登録されているロケーション・家具すべての組について、移動コスト（直線距離と見込み所要時間）を
+    あらかじめ計算しておく全点間コスト行列
+    地図が更新されたときは位置の変わった地点の行・列だけを計算し直す
+    行動計画の最適化や、LLMのプロンプトに渡すコスト表として使用する
+"""
+
+import math
+import os
+
+# プロンプト用のコスト表の見込み時間の刻み [秒]
+# (記録が1件増えるたびに表が変わり、LLM応答キャッシュのキーが変わらないよう丸める)
+TABLE_TIME_STEP = 5
+
+
+class TravelCostMatrix:
+    """ 地図キャッシュの全地点間の移動コスト """
+
+    def __init__(self, map_cache, travel_model, seconds_per_meter, table_path=None):
+        """
+        map_cache        : KachakaMapCache
+        travel_model     : TravelTimeModel (実測の所要時間)
+        seconds_per_meter: 実測の無い経路の所要時間の見積もり [秒/m]
+        table_path       : コスト表 (プロンプト用) の書き出し先 (None なら書き出さない)
+        """
+        self.map = map_cache
+        self.travel_model = travel_model
+        self.seconds_per_meter = seconds_per_meter
+        self.table_path = table_path
+
+        self.entities = {}     # ID -> MapEntity
+        self._distances = {}   # (ID, ID) -> 直線距離 [m]
+        self._map_version = None
+        self._model_version = None
+
+    async def sync(self):
+        """ 地図を最新にし、変化があればコスト行列を更新する。実測の所要時間が増えた場合はコスト表だけ書き直す """
+        await self.map.ensure_fresh()
+        map_changed = self._map_version != self.map.version
+        model_changed = self._model_version != self.travel_model.version
+        if not (map_changed or model_changed):
+            return False
+        if map_changed:
+            self.update(self.map.locations() + self.map.shelves())
+            self._map_version = self.map.version
+        self._model_version = self.travel_model.version
+        self.write_table()
+        return map_changed
+
+    def update(self, entities):
+        """ 追加・移動した地点の行と列だけを計算し直し、削除された地点を取り除く """
+        latest = {e.id: e for e in entities if e.has_pose}
+        removed = [i for i in self.entities if i not in latest]
+        changed = [
+            i for i, e in latest.items()
+            if i not in self.entities or (self.entities[i].x, self.entities[i].y) != (e.x, e.y)
+        ]
+
+        for i in removed:
+            del self.entities[i]
+        self._distances = {
+            pair: d for pair, d in self._distances.items()
+            if pair[0] in latest and pair[1] in latest
+        }
+
+        self.entities.update(latest)
+        for i in changed:
+            a = self.entities[i]
+            for j, b in self.entities.items():
+                d = math.hypot(a.x - b.x, a.y - b.y)
+                self._distances[(i, j)] = d
+                self._distances[(j, i)] = d
+
+        if changed or removed:
+            print(f"🧮 移動コスト行列を更新しました ({len(self.entities)}地点, 再計算 {len(changed)}, 削除 {len(removed)})")
+
+    # ========== 参照 ==========
+
+    def distance(self, a, b):
+        """ 2地点 (ID) 間の直線距離 [m] (不明なら None) """
+        return self._distances.get((a, b))
+
+    def travel_time(self, a, b, act_name="move"):
+        """ 2地点間の見込み所要時間 [秒] (実測があれば平均、無ければ距離から見積もる) """
+        estimate = self.travel_model.estimate(a, b, act_name)
+        if estimate is not None:
+            return estimate.mean
+        d = self.distance(a, b)
+        return None if d is None else d * self.seconds_per_meter
+
+    def cost(self, a, b, act_name="move"):
+        """ 経路最適化に使うコスト (見込み所要時間) """
+        return self.travel_time(a, b, act_name)
+
+    # ========== プロンプト用のコスト表 ==========
+
+    def table(self):
+        """
+        LLMに渡す簡潔なコスト表 (距離[m]/見込み時間[s])
+        位置の固定されたロケーションのみを載せる (家具は運ばれるたびに位置が変わり、表とキャッシュキーが毎回変わるため)
+        """
+        ids = sorted(i for i, e in self.entities.items() if e.kind == "location")
+        if not ids:
+            return ""
+        lines = [
+            "# Travel costs between registered places: distance[m]/expected time[s]",
+            "# " + ", ".join(f"{i}={self.entities[i].name}" for i in ids),
+            "from\\to " + " ".join(ids),
+        ]
+        for a in ids:
+            cells = []
+            for b in ids:
+                if a == b:
+                    cells.append("-")
+                else:
+                    seconds = round(self.travel_time(a, b) / TABLE_TIME_STEP) * TABLE_TIME_STEP
+                    cells.append(f"{self.distance(a, b):.1f}/{seconds:.0f}")
+            lines.append(f"{a} " + " ".join(cells))
+        return "\n".join(lines)
+
+    def write_table(self):
+        """ コスト表をファイルに書き出す (LLMの生成処理が読み込む) """
+        if self.table_path is None:
+            return
+        table = self.table()
+        try:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                if f.read() == table:
+                    return # 内容が同じなら書き換えない
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(self.table_path), exist_ok=True)
+        with open(self.table_path, "w", encoding="utf-8") as f:
+            f.write(table)
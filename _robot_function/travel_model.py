@@ -0,0 +1,110 @@
+"""
+    travel_model.py
+    Kachakaの移動にかかった実際の時間を (出発地, 目的地, 動作) ごとに記録し、
+    経路ごとの所要時間の推定値（平均・ばらつき）から移動のタイムアウトを決めるプログラム
+    記録の無い経路では、従来の距離ベースの計算式にフォールバックする
+"""
+
+import math
+import os
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 出発地が登録地点の近くに無い場合の出発地名
+# (場所の異なる出発がまとめて記録されるため、この出発地の推定値は使わない)
+UNKNOWN_START = "unknown"
+
+
+class RouteEstimate:
+    """ 1経路の所要時間の推定値 """
+
+    def __init__(self, durations):
+        self.count = len(durations)
+        self.mean = sum(durations) / self.count
+        if self.count > 1:
+            variance = sum((d - self.mean) ** 2 for d in durations) / (self.count - 1)
+        else:
+            variance = 0.0
+        self.std = math.sqrt(variance)
+
+    def __repr__(self):
+        return f"{self.mean:.1f}±{self.std:.1f}秒 (n={self.count})"
+
+
+class TravelTimeModel:
+    """ 移動時間の記録 (SQLite) と、経路ごとの推定値 """
+
+    def __init__(self, path, history=20, min_samples=3, sigma=3.0, margin=10.0):
+        """
+        path       : 記録を保存するSQLiteファイル
+        history    : 推定に使う、経路ごとの直近の記録数
+        min_samples: 推定値を使うのに必要な記録数 (足りなければ計算式にフォールバック)
+        sigma      : タイムアウト = 平均 + sigma × 標準偏差 + margin
+        margin     : タイムアウトに加える余裕 [秒]
+        """
+        self.path = path
+        self.history = history
+        self.min_samples = min_samples
+        self.sigma = sigma
+        self.margin = margin
+        self._durations = {}   # (start, goal, action) -> 直近の所要時間
+        self._estimates = {}   # (start, goal, action) -> RouteEstimate
+        self.version = 0       # 記録が増えるたびに増える (推定値を使う側の更新判定用)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS moves ("
+                " start TEXT, goal TEXT, action TEXT,"
+                " distance REAL, duration REAL, recorded REAL)"
+            )
+            rows = conn.execute(
+                "SELECT start, goal, action, duration FROM moves ORDER BY recorded ASC"
+            ).fetchall()
+        for start, goal, action, duration in rows:
+            self._add((start, goal, action), duration)
+
+    @contextmanager
+    def _connect(self):
+        """ 接続を開き、終了時にコミットして閉じる """
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _add(self, route, duration):
+        durations = self._durations.setdefault(route, deque(maxlen=self.history))
+        durations.append(duration)
+        self._estimates[route] = RouteEstimate(durations)
+
+    def record(self, start, goal, action, distance, duration):
+        """ 成功した移動の所要時間を記録し、その経路の推定値を更新する """
+        route = (start, goal, action)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?)",
+                (start, goal, action, distance, duration, time.time())
+            )
+        self._add(route, duration)
+        self.version += 1
+        print(f"🧭 移動時間を記録しました: {start} -> {goal} ({action}) {duration:.1f}秒 / 推定 {self._estimates[route]}")
+
+    def estimate(self, start, goal, action):
+        """ 経路の推定値を返す (記録が min_samples 未満、または出発地が不明なら None) """
+        if start == UNKNOWN_START:
+            return None
+        estimate = self._estimates.get((start, goal, action))
+        if estimate is None or estimate.count < self.min_samples:
+            return None
+        return estimate
+
+    def timeout(self, start, goal, action):
+        """ 経路の推定値から求めたタイムアウト [秒] (推定値が無ければ None) """
+        estimate = self.estimate(start, goal, action)
+        if estimate is None:
+            return None
+        return estimate.mean + self.sigma * estimate.std + self.margin
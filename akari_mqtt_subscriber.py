@@ -1,6 +1,8 @@
 #有線接続と無線だとアドレス変わるよ
 
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 import asyncio
 import speak_audio
 
@@ -19,6 +21,12 @@ STATUS_TOPIC = "akari/result"
 # メッセージを非同期に処理するためのキュー
 message_queue = asyncio.Queue()
 
+# 発話リクエストのキュー (受け取った順に1つずつ発話する)
+speech_queue = asyncio.Queue()
+
+# 発話中のリクエストの相関ID (TimeoutError で取り消す発話の判定に使用)
+speaking_correlation = None
+
 # メインのasyncioイベントループへの参照を保持する変数
 main_event_loop = None
 
@@ -31,8 +39,13 @@ client = None
 
 disconnect_in_progress = False
 
-def send_message(msg):
-    client.publish(STATUS_TOPIC,msg)
+def send_message(msg, correlation=None):
+    # リクエストに相関IDが付いていれば、同じIDを付けて返す (送信側が応答をリクエストに対応付ける)
+    properties = None
+    if correlation is not None:
+        properties = Properties(PacketTypes.PUBLISH)
+        properties.CorrelationData = correlation
+    client.publish(STATUS_TOPIC, msg, properties=properties)
     print(f"{msg}を送りました")
 
 # ブローカーに接続したときに呼び出されるコールバック関数
@@ -52,7 +65,7 @@ def on_disconnect(client, userdata, rc, properties=None, reason_code=None):
 
     # 既に切断処理が進行中の場合は、何もしない
     if disconnect_in_progress:
-        print("\CID{129} on_disconnectが多重に呼び出されましたが、既に処理中です。")
+        print("⚠️ on_disconnectが多重に呼び出されましたが、既に処理中です。")
         return
 
     disconnect_in_progress = True # 処理開始をマーク
@@ -76,7 +89,7 @@ def on_disconnect(client, userdata, rc, properties=None, reason_code=None):
         if is_normal_disconnect:
             print("MQTTブローカーから正常に切断されました。")
         else:
-            print(f"\CID{220} MQTT接続が予期せず切断されました。 (Result Code: {rc})")
+            print(f"⚠️ MQTT接続が予期せず切断されました。 (Result Code: {rc})")
             # 詳細情報があれば表示
             if properties:
                 print(f"  Properties: {properties}")
@@ -86,14 +99,14 @@ def on_disconnect(client, userdata, rc, properties=None, reason_code=None):
             if reason_code is not None:
                 print(f"  Additional Info: {reason_code}")
             if main_event_loop: # メインイベントループへの参照があることを確認
-                print("\CID{2047} 予期せぬ切断を検知しました。音声再生を停止します。")
+                print("🔊 予期せぬ切断を検知しました。音声再生を停止します。")
                 try:
                     # asyncio.create_task を asyncio.run_coroutine_threadsafe に変更
                     asyncio.run_coroutine_threadsafe(speak_audio.stop_speaking(), main_event_loop)
                 except Exception as e:
-                    print(f"\UTF{274C} speak_audio.stop_speaking()の実行中にエラーが発生しました: {e}")
+                    print(f"❌ speak_audio.stop_speaking()の実行中にエラーが発生しました: {e}")
             else:
-                print("\UTF{274C} エラー: メインイベントループが設定されていません。音声停止をスキップします。")
+                print("❌ エラー: メインイベントループが設定されていません。音声停止をスキップします。")
 
     finally:
         disconnect_in_progress = False
@@ -104,10 +117,13 @@ def on_message(client, userdata, msg):
     message_payload = msg.payload.decode('utf-8')
     print(f"トピック上でメッセージを受信した '{msg.topic}': {message_payload}")
     
+    # 相関ID (MQTT v5 の Correlation Data)。古い送信側からのメッセージには無い
+    correlation = getattr(msg.properties, "CorrelationData", None)
+
     if main_event_loop:
-        asyncio.run_coroutine_threadsafe(message_queue.put((msg.topic, message_payload)), main_event_loop)
+        asyncio.run_coroutine_threadsafe(message_queue.put((msg.topic, message_payload, correlation)), main_event_loop)
     else:
-        print("\UTF{274C}　ERROR")
+        print("❌　ERROR")
 
 # ネットワーク状態監視用フラグ
 is_network_available = asyncio.Event() # ネットワークが利用可能ならsetされる
@@ -134,7 +150,7 @@ async def network_watcher(host="172.31.14.45", port=1883, check_interval=0.1): #
             # readerにはclose()もwait_closed()も不要。writerが閉じればソケットは閉じられる。
 
             if not is_network_available.is_set():
-                print("\UTF{2705} ネットワーク接続が回復しました。")
+                print("✅ ネットワーク接続が回復しました。")
                 is_network_available.set()
                 consecutive_failures = 0 # 成功したらリセット
 
@@ -142,18 +158,18 @@ async def network_watcher(host="172.31.14.45", port=1883, check_interval=0.1): #
             consecutive_failures += 1
             if consecutive_failures >= fail_threshold:
                 if is_network_available.is_set():
-                    print(f"\UTF{274C} ネットワーク接続が失われました ({e})。発話を停止します。")
+                    print(f"❌ ネットワーク接続が失われました ({e})。発話を停止します。")
                     if main_event_loop:
                         try:
                             asyncio.run_coroutine_threadsafe(speak_audio.stop_speaking(), main_event_loop)
                         except Exception as stop_e:
-                            print(f"\UTF{274C} speak_audio.stop_speaking()の実行中にエラーが発生しました: {stop_e}")
+                            print(f"❌ speak_audio.stop_speaking()の実行中にエラーが発生しました: {stop_e}")
                     is_network_available.clear() # ネットワーク利用不可状態にセット
             # else: まだ失敗しきい値に達していない場合は何もせず待つ
 
         except Exception as e:
             # このブロックに来ることは稀ですが、デバッグのために残します
-            print(f"\CID{220} ネットワーク監視中に予期せぬエラー: {e}")
+            print(f"⚠️ ネットワーク監視中に予期せぬエラー: {e}")
             consecutive_failures += 1 # エラーも失敗としてカウント
 
         finally:
@@ -172,7 +188,7 @@ async def message_processor():
     while True:
         try:
             # タイムアウトを設定し、一定時間ごとにシャットダウンイベントをチェックできるようにする
-            topic, message = await asyncio.wait_for(message_queue.get(), timeout=1.0) # 1秒ごとにチェック
+            topic, message, correlation = await asyncio.wait_for(message_queue.get(), timeout=1.0) # 1秒ごとにチェック
         except asyncio.TimeoutError:
             continue # タイムアウトしたら再度ループの先頭
 
@@ -181,31 +197,36 @@ async def message_processor():
         if message.startswith("speak "):
             text_to_speak = message[len("speak "):].strip()
             if text_to_speak:
-                print(f"\CID{2047} 音声再生リクエストを受信: '{text_to_speak}'")
-                # send_message(f"akari_mqtt_subscriber.py -> \CID{2047} 音声再生リクエストを受信: '{text_to_speak}'")
+                print(f"🔊 音声再生リクエストを受信: '{text_to_speak}'")
+                # send_message(f"akari_mqtt_subscriber.py -> 🔊 音声再生リクエストを受信: '{text_to_speak}'")
                 try:
-                    asyncio.create_task(speak_audio.synthesize_speech_from_mqtt(text_to_speak))
+                    # 発話中でも受け付け、前の発話が終わってから順に発話する
+                    speech_queue.put_nowait((text_to_speak, correlation))
                 except Exception as e:
-                    print(f"\UTF{274C} speak_audio関数の実行中にエラーが発生しました: {e}")
-                    send_message(f"akari_mqtt_subscriber.py -> \UTF{274C} speak_audio関数の実行中にエラーが発生しました: {e}")
+                    print(f"❌ speak_audio関数の実行中にエラーが発生しました: {e}")
+                    send_message(f"akari_mqtt_subscriber.py -> ❌ speak_audio関数の実行中にエラーが発生しました: {e}")
             else:
-                print("\CID{220} 'speak:' の後に再生するテキストがありません。")
-                send_message("akari_mqtt_subscriber.py -> \CID{220} 'speak:' の後に再生するテキストがありません。")
+                print("⚠️ 'speak:' の後に再生するテキストがありません。")
+                send_message("akari_mqtt_subscriber.py -> ⚠️ 'speak:' の後に再生するテキストがありません。")
                 
         if message.startswith("chat_bot"):
             print("chat_botです")
-            send_message(4)
+            send_message(4, correlation)
             
         
         if message.startswith("TimeoutError"):
-            asyncio.create_task(speak_audio.stop_speaking(1))
+            if correlation is None:
+                asyncio.create_task(speak_audio.stop_speaking(1))
+            else:
+                cancel_speech(correlation) # 相関IDが付いていれば、そのリクエストだけを取り消す
 
         elif message == "stop" or message == "pause" or message == "skip":
+            drop_queued_speech()
             asyncio.create_task(speak_audio.stop_speaking())
 
         elif message == "finish":
-            print("\CID{1905} 'finish'メッセージを受信しました。akari_mqtt_subscriber.pyを終了します。")    
-            send_message("akari_mqtt_subscriber.py -> \CID{1905} 'finish'メッセージを受信しました。akari_mqtt_subscriber.pyを終了します。")
+            print("🏁 'finish'メッセージを受信しました。akari_mqtt_subscriber.pyを終了します。")    
+            send_message("akari_mqtt_subscriber.py -> 🏁 'finish'メッセージを受信しました。akari_mqtt_subscriber.pyを終了します。")
             client.disconnect()
             break # message_processorループを抜ける
         else:
@@ -215,11 +236,52 @@ async def message_processor():
     
     
 
+# 発話キューから1つずつ取り出して発話する非同期タスク
+async def speech_worker():
+    global speaking_correlation
+    while True:
+        text_to_speak, correlation = await speech_queue.get()
+        speaking_correlation = correlation
+        try:
+            await speak_audio.synthesize_speech_from_mqtt(text_to_speak, correlation)
+        except Exception as e:
+            print(f"speak_audio関数の実行中にエラーが発生しました: {e}")
+            send_message(2, correlation)
+        finally:
+            speaking_correlation = None
+            speech_queue.task_done()
+
+
+# 停止・一時停止・スキップ時に、まだ発話していないリクエストを破棄する (中断として完了を返す)
+# correlation を指定した場合は、その相関IDのリクエストだけを破棄する
+def drop_queued_speech(correlation=None):
+    kept = []
+    while not speech_queue.empty():
+        text_to_speak, queued_correlation = speech_queue.get_nowait()
+        speech_queue.task_done()
+        if correlation is not None and queued_correlation != correlation:
+            kept.append((text_to_speak, queued_correlation))
+            continue
+        print(f"発話待ちのリクエストを破棄しました: '{text_to_speak}'")
+        send_message(1, queued_correlation)
+    for request in kept:
+        speech_queue.put_nowait(request)
+
+
+# 応答待ちがタイムアウトしたリクエストを取り消す (発話中なら停止し、発話待ちなら破棄する)
+def cancel_speech(correlation):
+    if speaking_correlation == correlation:
+        asyncio.create_task(speak_audio.stop_speaking(1))
+    else:
+        drop_queued_speech(correlation)
+
+
 async def main():
     global main_event_loop, client
     main_event_loop = asyncio.get_running_loop()
 
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    # 相関ID (Correlation Data) を受け取るため MQTT v5 で接続する (v3.1.1 の送信側とも通信できる)
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
 
     client.on_connect = on_connect
     client.on_message = on_message
@@ -229,6 +291,7 @@ async def main():
     client.connect(BROKER_ADDRESS, BROKER_PORT, MQTT_KEEP_ALIVE_INTERVAL) # mqtt接続が切れた際のエラーがでるまでの許容時間
 
     client.loop_start() 
+    speech_task = asyncio.create_task(speech_worker())
     # network_monitoring_task = asyncio.create_task(network_watcher(BROKER_ADDRESS, BROKER_PORT))
     
     try:
@@ -242,6 +305,7 @@ async def main():
     except BaseException as e:
         send_message(f"akari_mqtt_subscriber.py -> 致命的なエラーが発生しました: {e}")
     finally:
+        speech_task.cancel()
         client.loop_stop()
         # if not network_monitoring_task.done(): # 既に完了/キャンセル済みでなければ
         #      network_monitoring_task.cancel()
@@ -26,14 +26,45 @@ OPENAI_MODEL = "gpt-4o"
 # 0に近いほど毎回同じ答え、大きいほどランダム性が増します。
 OPENAI_TEMPERATURE = 1.0
 
+# --- API通信の設定 ---
+# タイムアウト（秒）: 接続確立 / 応答待ち（ストリームでは断片ごと）/ 送信 / 接続プールの空き待ち
+OPENAI_TIMEOUT = {
+    "connect": 5.0,
+    "read": 60.0,
+    "write": 10.0,
+    "pool": 5.0,
+}
+
+# 通信エラー時の自動リトライ回数
+OPENAI_MAX_RETRIES = 2
+
+# 接続プール（keep-alive で接続を使い回し、毎回のTLSハンドシェイクを省く）
+OPENAI_CONNECTION_POOL = {
+    "max_connections": 10,
+    "max_keepalive_connections": 5,
+    "keepalive_expiry": 300.0,  # 使われていない接続を保持する秒数
+}
+
 # --- プロンプト（AIへの指令書）のファイルパス ---
 PROMPTS = {
     # 行動計画生成用のプロンプト
     "task": get_path("_LLM", "prompt", "re_create_task_en.json"),
     # 会話生成用のプロンプト
     "talk": get_path("_LLM", "prompt", "re_create_talk_en.json"),
+    # 会話生成用のプロンプト (差分形式: 発話の挿入位置と内容だけを返させる)
+    "talk_insert": get_path("_LLM", "prompt", "re_create_talk_insert_en.json"),
+    # アクションリスト (Function calling) で生成する際の出力形式の指示 (行動・会話用と組み合わせて使用)
+    "action": get_path("_LLM", "prompt", "re_create_action_en.json"),
+    # 行動計画と会話文を一括生成する際の出力形式の指示 (上の2つと組み合わせて使用)
+    "combined": get_path("_LLM", "prompt", "re_create_combined_en.json"),
 }
 
+# --- 会話文の生成形式 ---
+# "script" : 行動計画スクリプト全体に会話文を加えて書き直させる（従来の動作）
+# "inserts": 発話の挿入位置(文番号)・ロボット・内容のリストだけを返させ、手元で合成する
+#            （出力トークンが計画の長さに比例しないため高速・低コスト）
+LLM_TALK_FORMAT = "script"
+
 # --- ログファイルの保存先 ---
 LOGS = {
     "task":  get_path("_LLM", "log", "task_log.txt"),   # 行動計画の履歴
@@ -41,6 +72,16 @@ LOGS = {
     "token": get_path("_LLM", "log", "token_log.txt"),  # 課金計算用のトークン使用量
 }
 
+# --- 応答キャッシュ ---
+# 同じオーダー・プロンプト・モデル設定の生成結果をディスクに保存して再利用し、API呼び出しを省略します。
+# ※ キャッシュヒット時は TEMPERATURE に関わらず前回と同じ計画が返ります
+LLM_CACHE = {
+    "enabled": True,
+    "path": get_path("_LLM", "cache", "response_cache.sqlite3"),
+    "max_entries": 200,              # 保存する最大件数
+    "max_bytes": 5 * 1024 * 1024,    # 保存する内容の合計サイズ上限
+}
+
 # --- 生成されたPythonスクリプトの保存先 ---
 # LLMが生成した「行動計画スクリプト」の一時保存先
 LLM_TASK_SCRIPT_PATH = get_path("_robot_programs", "llm_task.txt")
@@ -48,6 +89,36 @@ LLM_TASK_SCRIPT_PATH = get_path("_robot_programs", "llm_task.txt")
 # 最終的に実行される「会話付きスクリプト」の保存先
 LLM_FINAL_SCRIPT_PATH = get_path("_robot_programs", "llm_final.txt")
 
+# 構造化された行動計画（JSONのアクションリスト）の保存先 ("actions" モードで使用)
+LLM_ACTION_PLAN_PATH = get_path("_robot_programs", "llm_actions.json")
+
+# 登録地点間の移動コスト表の保存先 (ロボット側で地図の更新時に書き出し、行動計画の生成時にプロンプトへ添付)
+TRAVEL_COSTS_PATH = get_path("_robot_programs", "travel_costs.txt")
+LLM_INCLUDE_TRAVEL_COSTS = True
+
+# --- 生成パイプラインのモード ---
+# "sequential": 行動計画 → 会話文を順に生成し、完了後にファイルから実行（従来の動作）
+# "stream"    : 行動計画をストリーミング生成し、完成した文から順に即時実行（会話文の生成は省略）
+# "combined"  : 行動計画と会話文を1回のAPI呼び出しで生成し、完了後にファイルから実行
+# "concurrent": 行動計画の生成後すぐに実行を開始し、並行して生成した会話文を届き次第差し込む
+# "actions"   : 会話文を含む行動計画を Function calling でJSONのアクションリストとして生成し、専用の実行器で実行
+LLM_GENERATION_MODE = "sequential"
+
+# ファイルから実行する行動計画を依存関係グラフに変換し、独立したステップを並行実行するか
+# (False の場合は従来どおり上から順に1文ずつ実行)
+PLAN_PARALLEL = False
+
+# 生成された行動計画の中で続けて並んでいる移動 (move_to_location / pick_up) を、
+# 移動コスト行列にもとづいて所要時間が短くなる順に並べ替えてから実行するか ("stream" モードでは行わない)
+PLAN_OPTIMIZE = False
+
+# コンパイル済みの行動計画を保持する件数 (同じ内容のスクリプトは再コンパイルせずに実行)
+PLAN_CACHE_SIZE = 16
+
+# "concurrent" モードで、会話文の到着時に既に通過していた発話の扱い
+# "drop" : 破棄する / "defer": 次の文の直前にまとめて発話する
+LLM_LATE_TALK_POLICY = "drop"
+
 
 
 
@@ -86,6 +157,9 @@ ROBOTS = {
         # 音量の初期値
         "default_volume": 7,
 
+        # 最後の発話からミュートするまでの時間 [秒] (連続した発話の間はミュートしない)
+        "idle_mute_delay": 3.0,
+
         "error_codes": {
             # 安全機能による停止 -> 一時停止扱いにしたいもの
             "safety": {
@@ -96,7 +170,16 @@ ROBOTS = {
             # ユーザー指示によるキャンセル -> エラーとして扱わないもの
             "interrupt": {
                 10001  # キャンセルコマンド (Command cancelled)
-            }
+            },
+            # コードごとの対応方針 ("pause" / "retry" / "abort" / "ignore")。safety・interrupt より優先
+            # 例: 11009: "retry"  # 経路なし -> すぐに1回だけ再試行
+            "policies": {},
+            # 上記に無いコードの対応方針
+            "default_policy": "abort",
+            # "retry" で連続して再実行する回数の上限 (超えたら "abort")
+            "max_retries": 1,
+            # エラーコード一覧 (タイトル・説明) を取得し直す間隔 [秒] (None なら起動後の1回のみ)
+            "catalog_refresh_interval": 600,
         },
         
         # --- 場所定義 (Locations) ---
@@ -114,7 +197,40 @@ ROBOTS = {
             "obstacle_area": "L05",    # ID: L05 (名前: 障害物置き場)
             
             "charger": "home",         # 充電ドック
-        }
+        },
+
+        # --- 地図キャッシュ (ロケーション・家具の一覧をメモリ上に保持) ---
+        "map_cache": {
+            "refresh_interval": 60,  # バックグラウンドで再取得する間隔 [秒] (None で無効)
+            "max_age": 300,          # これより古い内容は使用前に再取得する [秒]
+        },
+
+        # --- 状態の定期取得 (姿勢・実行中コマンド・ドッキング中の家具・バッテリー) ---
+        "telemetry": {
+            "interval": 0.5,  # バックグラウンドで取得する間隔 [秒] (None で無効)
+            "max_age": 2.0,   # 状態の問い合わせで、これより新しければ通信せずに返す [秒]
+            "slow_interval": 10.0,  # バッテリー・コマンド履歴を取得し直す間隔 [秒] (姿勢・コマンドの状態は毎回取得)
+        },
+
+        # --- 移動時間の学習 (経路ごとの実測値からタイムアウトを決める) ---
+        "travel_model": {
+            "path": get_path("_robot_function", "cache", "travel_times.sqlite3"),
+            "history": 20,       # 推定に使う経路ごとの直近の記録数
+            "min_samples": 3,    # これ未満の経路は従来の計算式 (30 + 距離×5) を使う
+            "sigma": 3.0,        # タイムアウト = 平均 + sigma × 標準偏差 + margin
+            "margin": 10.0,      # [秒]
+            "snap_radius": 1.0,  # 出発地を登録地点とみなす距離 [m] (これより遠ければ "unknown")
+            "seconds_per_meter": 3.0,  # 実測の無い経路の所要時間の見積もり (移動コスト行列で使用)
+        },
+
+        # --- 移動の見張り (姿勢を確認し、進捗が止まったときだけタイムアウトにする) ---
+        "watchdog": {
+            "interval": 1.0,        # 姿勢を確認する間隔 [秒]
+            "stall_seconds": 8.0,   # この時間進捗が無ければスタックとみなす [秒]
+            "min_progress": 0.05,   # 進捗とみなす移動量・目的地への接近 [m]
+            "min_rotation": 0.1,    # 進捗とみなす回転量 [rad]
+            "budget_factor": 3.0,   # タイムアウト計算値 × この倍率を超えたら進捗があっても打ち切る
+        },
     },
 
     # --- Akari (卓上ロボット) の設定 ---
@@ -130,6 +246,81 @@ ROBOTS = {
         "topics": {
             "chat": "chat/message",   # Akariに喋らせる内容を送る
             "result": "akari/result"  # Akariの動作完了通知
-        }
+        },
+
+        # 送信ごとに相関ID (MQTT v5) を付け、応答をリクエストごとに対応付ける
+        # False の場合は MQTT v3.1.1 で接続し、応答は送信順に対応付ける
+        "correlation_ids": True,
+        # 発話・chat_bot の完了通知を待つ時間 [秒]
+        "response_timeout": 20.0,
+
+        # M5Stackの画面表示
+        "display": {
+            "debounce": 0.05,      # 続けて届いた更新をまとめる時間 [秒] (最後の状態だけを書き込む)
+            "revert_delay": 10.0,  # 表情の色を白に戻すまでの時間 [秒]
+        },
+
+        # 首の速度を変えた後、動き出すまで待つ時間 [秒] (同じ速度が続く経由点では待たない)
+        "velocity_settle": 0.5,
     }
-}
\ No newline at end of file
+}
+
+
+
+
+
+# ==========================================
+#  並行実行 (PLAN_PARALLEL) の資源定義
+# ==========================================
+# 各メソッドが使うロボットの資源です。資源が重ならないステップは同時に実行されます。
+# 表に無いメソッドは "_default" (そのロボットの全資源) を使うものとして扱います。
+PLAN_RESOURCES = {
+    "kachaka": {
+        "_default": ["kachaka_base", "kachaka_speaker"],
+        # Kachakaの発話もコマンドとして実行され、走行中のコマンドを打ち切るため走行と同時には行わない
+        "speak_kachaka": ["kachaka_base", "kachaka_speaker"],
+    },
+    "akari": {
+        # AkariModule の実行ガードは1ロボットにつき1タスクしか追跡しない (PAUSE/RESUME のため)
+        # ので、ガード付きメソッド同士は同時に動かさない
+        "_default": ["akari_speaker", "akari_joints"],
+    },
+}
+
+# 移動を伴うメソッドです。発話は、直前にあるこれらのステップの完了を待ってから行います
+# (「〜に着きました」を到着後に話すため)。移動より前の発話は走行と同時に行われます。
+PLAN_MOTION_METHODS = {
+    "kachaka": ["move_to_location", "pick_up", "docking_akari", "undock_shelf", "put_away", "return_home"],
+}
+
+
+
+
+
+# ==========================================
+#  ジョブスケジューラ設定
+# ==========================================
+# ロボットに実行させるジョブ (タスクファイル・オーダー・個別コマンド) は1つずつ順に実行されます。
+# priority: 大きいほど先に実行
+# policy  : "queue"   待機列に並べる
+#           "preempt" 実行中のジョブを STOP で止めてから並べる
+#           "merge"   同じ種類の待機中ジョブがあれば新しい内容で置き換える
+#           "reject"  実行中・待機中のジョブがあれば受け付けない
+JOB_SCHEDULER = {
+    "max_queue": 8,  # 待機できるジョブの最大数 (超えた分は REJECTED を return トピックへ通知)
+    "jobs": {
+        "start":  {"priority": 0, "policy": "queue"},    # START <file>
+        "order":  {"priority": 1, "policy": "preempt"},  # LLMオーダーから生成したタスク
+        "manual": {"priority": 2, "policy": "preempt"},  # KACHAKA / AKARI の個別コマンド
+    },
+}
+
+
+# ==========================================
+#  イベントループの遅延モニタ
+# ==========================================
+# robots_client.py のイベントループが予定よりどれだけ遅れて起床したかを計測します (LOOP コマンドで表示)
+LOOP_MONITOR = {
+    "interval": 0.1,        # 計測間隔 [秒]
+    "warn_threshold": 0.2,  # この遅れを超えたら警告を表示 [秒]
+}
@@ -0,0 +1,185 @@
+"""
+    job_scheduler.py
+    ロボットに実行させるジョブ（タスクファイル実行・個別コマンドなど）を優先度付きキューで管理するスケジューラ
+    ジョブごとの方針（queue / preempt / merge / reject）に従って受付・割り込みを行い、
+    実行中・待機中のジョブをIDで追跡してキャンセルできるようにする
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+# ジョブの受付方針
+POLICIES = ("queue", "preempt", "merge", "reject")
+
+
+class Job:
+    """ スケジューラで管理する1つのジョブ """
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, name, factory, priority=0, policy="queue"):
+        if policy not in POLICIES:
+            raise ValueError(f"不明なジョブ方針: {policy}")
+        self.id = next(Job._ids)
+        self.kind = kind          # ジョブの種類 (config.JOB_SCHEDULER["jobs"] のキー)
+        self.name = name          # 表示用の名前 (ファイル名・コマンドなど)
+        self.factory = factory    # 実行するコルーチンを生成する関数
+        self.priority = priority  # 大きいほど先に実行
+        self.policy = policy
+        self.task = None          # 実行中の asyncio.Task
+        self.submitted_at = time.monotonic()
+
+    def __repr__(self):
+        return f"#{self.id} {self.kind}:{self.name}"
+
+
+class JobScheduler:
+    """ ジョブを1つずつ実行する優先度付きスケジューラ """
+
+    def __init__(self, max_queue, notify, preempt):
+        """
+        max_queue: 待機できるジョブの最大数
+        notify   : 状態通知 (バックプレッシャー等) を送るコルーチン関数 notify(message)
+        preempt  : 実行中のジョブを止めるためのコルーチン関数 (ロボットへのSTOP送信など)
+        """
+        self.max_queue = max_queue
+        self.notify = notify
+        self.preempt = preempt
+        self.current = None
+        self._heap = []                 # (-priority, 受付順, Job)
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.metrics = {
+            "submitted": 0, "started": 0, "completed": 0, "failed": 0,
+            "cancelled": 0, "preempted": 0, "merged": 0, "rejected": 0,
+            "max_depth": 0,
+        }
+
+    # ========== 状態 ==========
+
+    def depth(self):
+        """ 待機中のジョブ数 """
+        return len(self._heap)
+
+    def is_busy(self):
+        return self.current is not None or bool(self._heap)
+
+    def queued_jobs(self):
+        """ 待機中のジョブを実行順に返す """
+        return [job for _, _, job in sorted(self._heap)]
+
+    def snapshot(self):
+        """ キューの状態と統計を表示用の文字列で返す """
+        running = f"{self.current}" if self.current else "なし"
+        queued = ", ".join(str(job) for job in self.queued_jobs()) or "なし"
+        stats = ", ".join(f"{k}={v}" for k, v in self.metrics.items())
+        return f"実行中: {running} / 待機中({self.depth()}/{self.max_queue}): {queued} / {stats}"
+
+    # ========== 受付 ==========
+
+    async def submit(self, job):
+        """ ジョブを方針に従って受け付ける。受け付けた場合は True """
+        self.metrics["submitted"] += 1
+
+        if job.policy == "reject" and self.is_busy():
+            return await self._reject(job, "他のジョブが実行中・待機中です")
+
+        if job.policy == "merge":
+            for i, (_, _, queued) in enumerate(self._heap):
+                if queued.kind == job.kind:
+                    # 同じ種類の待機中ジョブを新しい内容で置き換える (待機順は引き継ぐ)
+                    key, order, _ = self._heap[i]
+                    job.submitted_at = queued.submitted_at
+                    self._heap[i] = (key, order, job)
+                    self.metrics["merged"] += 1
+                    print(f"🔀 ジョブを統合しました: {queued} -> {job}")
+                    return True
+
+        if self.depth() >= self.max_queue:
+            return await self._reject(job, f"キューが満杯です ({self.depth()}/{self.max_queue})")
+
+        # 割り込む場合も先に待機列へ積む (止めたジョブの終了時に、先に待っていたジョブが動き出さないように)
+        heapq.heappush(self._heap, (-job.priority, next(self._order), job))
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.depth())
+        self._wakeup.set()
+
+        if job.policy == "preempt" and self.current is not None:
+            print(f"⏩ {job} のため実行中のジョブを中断します: {self.current}")
+            self.metrics["preempted"] += 1
+            await self.stop_running()
+        elif self.current is not None or self.depth() > 1:
+            print(f"📋 ジョブを待機列に追加しました: {job} (待機 {self.depth()}/{self.max_queue})")
+            await self.notify(f"QUEUED {job} depth={self.depth()}/{self.max_queue}")
+        if self.depth() >= self.max_queue:
+            # 満杯になったことを送信側へ知らせ、送信ペースを落としてもらう
+            await self.notify(f"BUSY depth={self.depth()}/{self.max_queue}")
+        return True
+
+    async def _reject(self, job, reason):
+        self.metrics["rejected"] += 1
+        print(f"⚠️ ジョブを受け付けませんでした: {job} ({reason})")
+        await self.notify(f"REJECTED {job}: {reason}")
+        return False
+
+    # ========== 中断・キャンセル ==========
+
+    async def stop_running(self):
+        """ 実行中のジョブを止め、終了を待つ """
+        job = self.current
+        if job is None or job.task is None:
+            return
+        await self.preempt()
+        # STOP でロボットを止めた後、計画の残りが自然に終わるのを待たずにタスクを打ち切る
+        job.task.cancel()
+        await asyncio.wait([job.task])
+
+    def clear_queue(self):
+        """ 待機中のジョブをすべて破棄する。破棄した数を返す """
+        removed = len(self._heap)
+        self._heap.clear()
+        self.metrics["cancelled"] += removed
+        if removed:
+            print(f"🗑️  待機中のジョブを破棄しました ({removed}件)")
+        return removed
+
+    async def cancel(self, job_id):
+        """ 指定IDのジョブをキャンセルする (待機中なら取り除き、実行中なら停止する) """
+        if self.current is not None and self.current.id == job_id:
+            await self.stop_running() # 件数は run() がキャンセル済みとして数える
+            return True
+        for i, (_, _, job) in enumerate(self._heap):
+            if job.id == job_id:
+                self._heap.pop(i)
+                heapq.heapify(self._heap)
+                self.metrics["cancelled"] += 1
+                print(f"🗑️  待機中のジョブをキャンセルしました: {job}")
+                return True
+        return False
+
+    # ========== 実行 ==========
+
+    async def run(self):
+        """ 待機列の先頭から1つずつジョブを実行するワーカー """
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            _, _, job = heapq.heappop(self._heap)
+            self.current = job
+            self.metrics["started"] += 1
+            waited = time.monotonic() - job.submitted_at
+            print(f"▶️  ジョブ開始: {job} (待ち時間 {waited:.1f}秒, 残り待機 {self.depth()})")
+
+            job.task = asyncio.create_task(job.factory())
+            await asyncio.wait([job.task])
+
+            if job.task.cancelled():
+                self.metrics["cancelled"] += 1
+            elif job.task.exception() is not None:
+                self.metrics["failed"] += 1
+                print(f"❌ ジョブ {job} でエラーが発生しました: {job.task.exception()}")
+            else:
+                self.metrics["completed"] += 1
+            self.current = None
@@ -0,0 +1,52 @@
+"""
+    loop_monitor.py
+    イベントループの遅延 (ラグ) を計測するモニタ
+    一定間隔で sleep し、予定より起床が遅れた時間を記録する。ブロッキング処理がループを止めていると値が大きくなる
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class LoopLagMonitor:
+    """ イベントループの起床遅れの統計 """
+
+    def __init__(self, interval=0.1, warn_threshold=0.2, window=600):
+        """
+        interval      : 計測間隔 [秒]
+        warn_threshold: この遅れを超えたら警告を表示する [秒]
+        window        : 直近の統計に使う計測数
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.recent = deque(maxlen=window)
+        self.metrics = {"samples": 0, "max": 0.0, "over_threshold": 0}
+
+    async def run(self):
+        """ 計測ループ (キャンセルされるまで動く) """
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.monotonic() - expected))
+
+    def record(self, lag):
+        self.recent.append(lag)
+        self.metrics["samples"] += 1
+        self.metrics["max"] = max(self.metrics["max"], lag)
+        if lag >= self.warn_threshold:
+            self.metrics["over_threshold"] += 1
+            print(f"🐢 イベントループが {lag * 1000:.0f}ms 停止していました")
+
+    def snapshot(self):
+        """ 直近の平均・95パーセンタイル・最大と、起動後の最大 [ms] """
+        if not self.recent:
+            return "no samples"
+        ordered = sorted(self.recent)
+        mean = sum(ordered) / len(ordered)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return (
+            f"lag mean={mean * 1000:.1f}ms p95={p95 * 1000:.1f}ms max={ordered[-1] * 1000:.1f}ms "
+            f"(total max={self.metrics['max'] * 1000:.1f}ms, over {self.warn_threshold * 1000:.0f}ms: "
+            f"{self.metrics['over_threshold']}/{self.metrics['samples']})"
+        )
@@ -28,6 +28,9 @@ class RobotRemoteController:
             "resume":  ("RESUME",  "再開"),
             "skip":    ("SKIP",    "現在のタスクをスキップ"),
             "reset":   ("RESET",   "状態リセット"),
+            "cache_clear": ("CACHE_CLEAR", "LLM応答キャッシュを削除 (task / talk などの種類を指定可)"),
+            "jobs":    ("JOBS",    "ジョブキューの状態を表示"),
+            "loop":    ("LOOP",    "イベントループの遅延を表示"),
         }
 
     def _on_connect(self, client, userdata, flags, rc, properties=None):
@@ -81,6 +84,7 @@ class RobotRemoteController:
         print("  - order <msg>    : LLMに行動生成を依頼 ")
         print("  - kachaka <cmd>  : Kachakaに直接コマンド送信 ")
         print("  - akari <cmd>    : Akariに直接コマンド送信 ")
+        print("  - cancel <id>    : 指定したジョブをキャンセル ")
         print("  - help           : このヘルプを表示")
         print("  - exit           : 終了")
         print("============================================\n")
@@ -102,6 +106,9 @@ class RobotRemoteController:
                 # --- 1. 単純コマンド (STOP, PAUSE等) ---
                 if cmd in self.simple_commands:
                     msg, _ = self.simple_commands[cmd]
+                    # cache_clear は削除する種類 (task / talk など) を引数で指定できる
+                    if cmd == "cache_clear" and arg:
+                        msg = f"{msg} {arg}"
                     self.client.publish(MQTT_TOPICS["command"], msg)
                     print(f"📤 {msg} 指令送信")
 
@@ -138,7 +145,16 @@ class RobotRemoteController:
                     else:
                         print("⚠️ コマンドを指定してください (例: akari move_home)")
 
-                # --- 4. その他 ---
+                # --- 4. ジョブ操作 ---
+                elif cmd == "cancel":
+                    if arg:
+                        msg = f"CANCEL {arg}"
+                        self.client.publish(MQTT_TOPICS["command"], msg)
+                        print(f"📤 CANCEL 指令送信: {arg}")
+                    else:
+                        print("⚠️ ジョブIDを指定してください (例: cancel 3)")
+
+                # --- 5. その他 ---
                 elif cmd == "help":
                     self._show_help()
                 
@@ -5,8 +5,11 @@
 
 import asyncio
 import aiomqtt
+import inspect
 import os
+import shutil
 import sys
+from types import SimpleNamespace
 
 # ===== 設定の読み込み =====
 try:
@@ -16,14 +19,38 @@ except ImportError:
     print("❌ Critical Error: 'config.py' が見つかりません。実行を中止します。")
     sys.exit(1)
 
-from _LLM import task_generate, talk_generate
+from _LLM import task_generate, talk_generate, combined_generate, action_generate
+from _LLM.LLM_manager import clear_response_cache, read_file, save_response_to_file, append_to_script_log
+from _LLM.script_parser import compile_statement, split_statements, render_talk_insert, strip_talk_statements
+from _robot_function.action_plan import load_action_plan, run_action_plan, render_script
+from _robot_function.plan_loader import load_plan, plan_namespace
+from _robot_function.plan_optimizer import optimize_plan_file
+from _robot_function.plan_scheduler import analyse_statement, analyse_actions, run_plan_graph
 from robot_api_manager import get_robot_api_manager
+from job_scheduler import Job, JobScheduler
+from loop_monitor import LoopLagMonitor
+
+# 受信ループから即座に実行する割り込みコマンド (優先レーン)
+INTERRUPT_COMMANDS = ("STOP", "RESET", "PAUSE", "RESUME", "SKIP")
 
 class RobotClient:
     def __init__(self):
-        # タスク実行管理フラグ (set=実行可能/待機中, clear=実行中)
-        self.running_task = asyncio.Event()
-        self.running_task.set()
+        # ロボットに実行させるジョブの管理 (main_loop でMQTT接続後に生成)
+        self.jobs = None
+
+        # イベントループの遅延の計測 (ブロッキング処理の検出用)
+        self.loop_monitor = LoopLagMonitor(
+            interval=config.LOOP_MONITOR["interval"],
+            warn_threshold=config.LOOP_MONITOR["warn_threshold"],
+        )
+
+        # 生成中のオーダー処理 (STOPや新しいORDERでキャンセルする)
+        self.generation_task = None
+
+        # 受信メッセージの振り分け先 (割り込み以外のコマンド / LLMオーダー)
+        self.command_queue = asyncio.Queue()
+        self.order_queue = asyncio.Queue()
+        self.background_tasks = set()
 
         # ロボットクライアント (async_initで初期化)
         self.api_manager = None
@@ -39,38 +66,23 @@ class RobotClient:
 
     async def running_robots_task(self, filepath):
         """ 生成されたロボットタスクファイルを実行する """
-        print(f"\n====================  ☑️  タスク開始: {filepath}  ====================")
+        await self._run_guarded(filepath, self._exec_script_file(filepath))
+
+    async def running_robots_stream(self, statements: asyncio.Queue):
+        """ ストリーミング生成されたトップレベル文を、届いた順に実行する (None で終了) """
+        await self._run_guarded("stream", self._exec_statement_stream(statements))
+
+    async def _run_guarded(self, label, plan):
+        """ タスク実行の共通処理 (実行中フラグ・例外処理・終了時リセット) """
+        print(f"\n====================  ☑️  タスク開始: {label}  ====================")
         
         if self.kachaka_client is None or self.akari_client is None:
             print("🚫 クライアントが利用できません。タスクを開始できません。")
+            plan.close()
             return
-        
-        # フラグを下ろして「実行中」にする
-        self.running_task.clear()
 
         try:
-            # ファイル読み込み
-            if not os.path.exists(filepath):
-                 # カレントディレクトリからの相対パスでも探してみる
-                 filepath = os.path.join(config.BASE_DIR, filepath)
-                 
-            with open(filepath, "r", encoding="utf-8") as f:
-                code = f.read()
-            
-            # コードを関数 _main() にラップする
-            # ※ LLMが生成するコードはインデントされていない前提のため、インデントを追加
-            # a -> kachaka , b -> akari
-            wrapped_code = (
-                "async def _main(a,b):\n"
-                + "\n".join("    " + line for line in code.splitlines())
-            )
-            
-            # 動的コード実行
-            # globals() を渡すことで、このスクリプト内のコンテキストでコードを実行可能にする
-            exec(wrapped_code, globals())
-            
-            # 定義された _main 関数を非同期実行
-            await globals()["_main"](self.kachaka_client, self.akari_client)
+            await plan
 
         except asyncio.CancelledError:
             print("⚠️ タスクがキャンセルされました (asyncio.CancelledError)")
@@ -83,17 +95,116 @@ class RobotClient:
             # 終了処理（成功・失敗に関わらず実行）
             await self.kachaka_client.reset()
             await self.akari_client.reset()
-            
-            # フラグを上げて「待機中」に戻す
-            self.running_task.set()
             print("====================  ✅ タスク終了 ====================")
 
-    async def start_robot_task(self, filename):
-        """ 指定されたファイル名のタスク実行をスケジュールする """
-        if not self.running_task.is_set():
-            print("⚠️ 他のタスクが実行中のため、開始できません。")
+    async def _exec_script_file(self, filepath):
+        """ スクリプトファイルをコンパイル済みの行動計画として実行する """
+        # ファイル読み込み
+        if not os.path.exists(filepath):
+             # カレントディレクトリからの相対パスでも探してみる
+             filepath = os.path.join(config.BASE_DIR, filepath)
+
+        # JSONのアクションリストは exec せず専用の実行器で実行する
+        if filepath.endswith(".json"):
+            actions = load_action_plan(filepath)
+            robots = {"kachaka": self.kachaka_client, "akari": self.akari_client}
+            if config.PLAN_PARALLEL:
+                async def execute(step):
+                    await run_action_plan([step.payload], robots)
+                await run_plan_graph(analyse_actions(actions), execute)
+            else:
+                await run_action_plan(actions, robots)
+            return
+             
+        # 同じ内容のスクリプトはキャッシュ済みのコードを使う (構文解析・コンパイルを省略)
+        plan = load_plan(filepath)
+
+        # 依存関係グラフに変換し、独立した文を並行実行する
+        if config.PLAN_PARALLEL:
+            namespace = self._new_namespace()
+            steps = [analyse_statement(i, st) for i, st in enumerate(plan.statements)]
+            codes = plan.statement_codes
+            async def execute(step):
+                await self._run_statement(step.payload, namespace, codes[step.index])
+            await run_plan_graph(steps, execute)
             return
 
+        # async def _main(a, b) として実行 (a -> kachaka , b -> akari)
+        # 実行ごとに新しい名前空間を使うため、計画内の変数がクライアントに残らない
+        await plan.run(self.kachaka_client, self.akari_client)
+
+    def _new_namespace(self):
+        """ 文単位実行用の名前空間 (a -> kachaka , b -> akari) """
+        return plan_namespace(self.kachaka_client, self.akari_client)
+
+    async def _run_statement(self, statement, namespace, code=None):
+        """ トップレベル文を1つ実行する (文をまたいで変数を引き継ぐため名前空間を共有。code はコンパイル済みの文) """
+        print(f"▶️  文を実行: {statement.splitlines()[0]}")
+        if code is None:
+            code = compile_statement(statement)
+        result = eval(code, namespace)
+        if inspect.iscoroutine(result):
+            await result
+
+    async def _exec_statement_stream(self, statements: asyncio.Queue):
+        """ キューから受け取ったトップレベル文を、共有の名前空間で1文ずつ実行する """
+        namespace = self._new_namespace()
+        while True:
+            statement = await statements.get()
+            if statement is None:
+                break
+            await self._run_statement(statement, namespace)
+
+    async def running_robots_with_talk(self, statements, talk_task: asyncio.Task):
+        """ 行動計画を即時実行し、並行生成中の会話文が届き次第、その挿入位置で発話させる """
+        await self._run_guarded("plan + talk", self._exec_with_talk(statements, talk_task))
+
+    async def _exec_with_talk(self, statements, talk_task: asyncio.Task):
+        """ 各文の直前 (アンカー位置) で到着済みの発話を実行する。会話文の到着は待たない """
+        namespace = self._new_namespace()
+        utterances = None # 会話文の到着前は None
+
+        for index in range(len(statements) + 1):
+            if utterances is None and talk_task.done():
+                utterances = self._schedule_talk(talk_task, index)
+
+            for utterance in (utterances or {}).pop(index, []):
+                await self._run_statement(utterance, namespace)
+
+            if index < len(statements):
+                await self._run_statement(statements[index], namespace)
+
+        if utterances is None:
+            print("💬 会話文の生成が計画の終了に間に合わなかったため、発話を省略しました")
+
+    def _schedule_talk(self, talk_task: asyncio.Task, index):
+        """ 到着した発話挿入をアンカー位置ごとに振り分ける (通過済みの位置は方針に従い破棄/繰り延べ) """
+        if talk_task.cancelled() or talk_task.exception() is not None:
+            print("⚠️ 会話文の生成に失敗したため、発話なしで実行を続けます")
+            return {}
+
+        utterances = {}
+        dropped = 0
+        for insert in sorted(talk_task.result(), key=lambda i: i["index"]):
+            anchor = insert["index"]
+            if anchor < index:
+                if config.LLM_LATE_TALK_POLICY != "defer":
+                    dropped += 1
+                    continue
+                anchor = index # 次のアンカー位置へ繰り延べる
+            utterances.setdefault(anchor, []).append(render_talk_insert(insert))
+
+        print(f"💬 会話文が到着しました (文 {index} の時点, 省略 {dropped}件)")
+        return utterances
+
+    async def submit_job(self, kind, name, factory):
+        """ ジョブの種類に応じた優先度・方針 (config.JOB_SCHEDULER) でジョブを登録する。受け付けた場合は True """
+        settings = config.JOB_SCHEDULER["jobs"][kind]
+        job = Job(kind, name, factory, priority=settings["priority"], policy=settings["policy"])
+        return await self.jobs.submit(job)
+
+    async def start_robot_task(self, filename, kind="start"):
+        """ 指定されたファイル名のタスク実行をスケジュールする。受け付けた場合は True """
         # configで定義されたパスを使うか、引数をそのまま使うか柔軟に対応
         # 基本は _robot_programs フォルダ内を探す
         path = filename
@@ -102,11 +213,150 @@ class RobotClient:
              
         if not os.path.isfile(path):
             print(f"❌ ファイルが存在しません: {path}")
+            return False
+
+        # スケジューラのワーカーが順に実行する（メインループをブロックしないため）
+        if not await self.submit_job(kind, filename, lambda: self.running_robots_task(path)):
+            return False
+        print(f"✅ ロボットタスク '{filename}' をスケジュールしました。")
+        return True
+
+    async def _process_order(self, client, payload):
+        """ LLMでオーダーからスクリプトを生成し、タスクを開始する """
+        try:
+            # 割り込み方針のオーダーは、生成を待たずに実行中のタスクを止める
+            if config.JOB_SCHEDULER["jobs"]["order"]["policy"] == "preempt" and self.jobs.current is not None:
+                print("🛑 タスク実行中のため、強制停止して新しいオーダーを処理します")
+                await self.jobs.stop_running()
+
+            # 行動計画のプロンプトに添付する移動コスト表を最新にする
+            await self._sync_travel_costs()
+
+            if config.LLM_GENERATION_MODE == "stream":
+                await self._process_order_stream(client, payload)
+                return
+
+            if config.LLM_GENERATION_MODE == "concurrent":
+                await self._process_order_concurrent(client, payload)
+                return
+
+            if config.LLM_GENERATION_MODE == "actions":
+                print("🤖 アクションリストを生成中...")
+                if await action_generate.main_async(payload):
+                    output_file = config.LLM_ACTION_PLAN_PATH
+                    await self._optimize_plan(output_file)
+                    if await self.start_robot_task(output_file, kind="order"):
+                        await client.publish(config.MQTT_TOPICS["return"], f"Generated & Starting: {output_file}")
+                return
+
+            if config.LLM_GENERATION_MODE == "combined":
+                print("🤖 行動計画と会話スクリプトを一括生成中...")
+                if not await combined_generate.main_async(payload):
+                    print("❌ スクリプトを生成できなかったため、タスクを実行しません")
+                    return
+                await self._optimize_plan(config.LLM_FINAL_SCRIPT_PATH)
+            else:
+                print("🤖 1. 行動計画の生成中...")
+                if not await task_generate.main_async(payload):
+                    print("❌ 行動計画を生成できなかったため、タスクを実行しません")
+                    return
+                # 会話文は並べ替えた後の行動計画に対して生成する
+                await self._optimize_plan(config.LLM_TASK_SCRIPT_PATH)
+                
+                print("💬 2. 会話スクリプトの生成中...")
+                if not await talk_generate.main_async(payload):
+                    print("❌ 会話スクリプトを生成できなかったため、タスクを実行しません")
+                    return
+            
+            output_file = config.LLM_FINAL_SCRIPT_PATH
+            print(f"✅ 生成完了。タスクを実行します: {output_file}")
+            
+            if await self.start_robot_task(output_file, kind="order"):
+                await client.publish(config.MQTT_TOPICS["return"], f"Generated & Starting: {output_file}")
+
+        except asyncio.CancelledError:
+            print(f"⚠️ オーダーの生成を中断しました: {payload}")
+            raise
+        except Exception as e:
+            print(f"❌ オーダー処理中にエラーが発生しました: {e}")
+
+    async def _sync_travel_costs(self):
+        """ 地図に変化があれば移動コスト表を作り直す (失敗しても前回の表で生成を続ける) """
+        try:
+            await self.kachaka_client.travel_costs.sync()
+        except Exception as e:
+            print(f"⚠️ 移動コスト表を更新できませんでした (前回の表を使用します): {e}")
+
+    async def _optimize_plan(self, filepath):
+        """
+        生成された行動計画の移動順序を並べ替える (PLAN_OPTIMIZE 有効時。失敗しても元の計画で続ける)
+        並べ替えた場合は、同じ計画の他の形式 (行動計画・最終スクリプト) も書き直し、最適化後の計画をログに残す
+        """
+        if not config.PLAN_OPTIMIZE:
+            return
+        try:
+            kachaka = self.kachaka_client
+            await kachaka.travel_costs.sync()
+            start = await kachaka.current_place()
+            saved = optimize_plan_file(filepath, kachaka.map, kachaka.travel_costs, start)
+        except Exception as e:
+            print(f"⚠️ 行動計画の最適化に失敗しました (元の順序で実行します): {e}")
+            return
+        if saved <= 0:
             return
 
-        # 別タスクとして実行（メインループをブロックしないため）
-        asyncio.create_task(self.running_robots_task(path))
-        print(f"✅ ロボットタスク '{filename}' を開始しました。")
+        if filepath.endswith(".json"):
+            actions = load_action_plan(filepath)
+            save_response_to_file(SimpleNamespace(content=render_script(actions, include_talk=False)), config.LLM_TASK_SCRIPT_PATH)
+            save_response_to_file(SimpleNamespace(content=render_script(actions)), config.LLM_FINAL_SCRIPT_PATH)
+        elif filepath != config.LLM_TASK_SCRIPT_PATH:
+            # 会話付きスクリプト (一括生成) を並べ替えた場合は、行動計画も同じ順序にする
+            save_response_to_file(SimpleNamespace(content=strip_talk_statements(read_file(filepath))), config.LLM_TASK_SCRIPT_PATH)
+
+        note = f"移動順序を最適化しました (見込み {saved:.0f}秒 短縮)"
+        append_to_script_log(config.LLM_TASK_SCRIPT_PATH, config.LOGS["task"], note=note)
+        if filepath != config.LLM_TASK_SCRIPT_PATH:
+            append_to_script_log(config.LLM_FINAL_SCRIPT_PATH, config.LOGS["talk"], note=note)
+
+    async def _process_order_concurrent(self, client, payload):
+        """ 行動計画の生成後すぐに実行を開始し、会話文は並行して生成する """
+        print("🤖 1. 行動計画の生成中...")
+        if not await task_generate.main_async(payload):
+            print("❌ 行動計画を生成できなかったため、タスクを実行しません")
+            return
+        await self._optimize_plan(config.LLM_TASK_SCRIPT_PATH)
+        statements = split_statements(read_file(config.LLM_TASK_SCRIPT_PATH))
+
+        print("💬 2. 行動計画を実行しながら会話文を生成します...")
+        talk_task = asyncio.create_task(talk_generate.generate_inserts_async(payload))
+        if not await self.submit_job("order", "plan + talk", lambda: self.running_robots_with_talk(statements, talk_task)):
+            talk_task.cancel()
+            return
+        await client.publish(config.MQTT_TOPICS["return"], f"Generated & Starting (talk pending): {config.LLM_TASK_SCRIPT_PATH}")
+
+        # このオーダー処理がキャンセルされた場合は、会話文の生成も中断される
+        await talk_task
+
+    async def _process_order_stream(self, client, payload):
+        """ 行動計画をストリーミング生成しながら、完成した文から順に実行する """
+        statements = asyncio.Queue()
+
+        print("🤖 行動計画をストリーミング生成しながら実行します...")
+        if not await self.submit_job("order", "stream", lambda: self.running_robots_stream(statements)):
+            return
+        await client.publish(config.MQTT_TOPICS["return"], "Streaming & Starting")
+
+        try:
+            async for statement in task_generate.main_stream(payload):
+                statements.put_nowait(statement)
+        finally:
+            # 中断された場合も、受信済みの文を実行し終えたら実行器を終了させる
+            statements.put_nowait(None)
+
+        # ストリームモードでは会話文を付与しないため、行動計画をそのまま最終スクリプトとする
+        if os.path.exists(config.LLM_TASK_SCRIPT_PATH):
+            shutil.copyfile(config.LLM_TASK_SCRIPT_PATH, config.LLM_FINAL_SCRIPT_PATH)
+        print(f"✅ ストリーミング生成完了: {config.LLM_FINAL_SCRIPT_PATH}")
 
     async def _handle_interrupt_command(self, client, command: str):
         """ 割り込み処理 """
@@ -142,7 +392,6 @@ class RobotClient:
         method = getattr(robot_client_instance, method_name, None)
         if method:
             try:
-                self.running_task.clear() # 他のタスクが走らないようにブロック
                 if args_str:
                     await method(args_str)
                 else:
@@ -155,17 +404,128 @@ class RobotClient:
 
             except Exception as e:
                 print(f"❌ 個別コマンド実行エラー: {e}")
-            finally:
-                self.running_task.set()
         else:
             print(f"❌ 指定されたメソッド '{method_name}' は存在しません。")
 
+    def _spawn(self, coro):
+        """ 参照を保持したままバックグラウンドタスクを起動する (完了時に自動で破棄) """
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    def _dispatch_message(self, client, topic, payload):
+        """
+        受信メッセージを振り分ける (受信ループを止めないよう、ここでは await しない)
+        割り込みコマンドは即座に専用タスクで実行し、その他のコマンド・オーダーは各ワーカーのキューへ積む
+        戻り値: プログラムを終了する場合は False
+        """
+        # --- ステータス受信 ---
+        if topic == config.MQTT_TOPICS["status"]:
+            if payload == "fin":
+                self._spawn(self.akari_client.send_message_to_akari("finish"))
+            elif payload == "finish":
+                return False # プログラム終了
+
+        # --- コマンド受信 (manager.py から) ---
+        elif topic == config.MQTT_TOPICS["command"]:
+            # 割り込み指示 (STOP, PAUSE, RESUME, etc.) は優先レーンで即時実行
+            if payload in INTERRUPT_COMMANDS:
+                # STOP は生成中のオーダーも中断する
+                if payload == "STOP" and self.generation_task is not None:
+                    self.generation_task.cancel()
+                # STOP は待機中のジョブも破棄する (止めた直後に次のジョブが動き出さないように)
+                if payload == "STOP" and self.jobs is not None:
+                    self.jobs.clear_queue()
+                self._spawn(self._handle_interrupt_command(client, payload))
+            else:
+                self.command_queue.put_nowait(payload)
+
+        # --- LLM オーダー受信 ---
+        elif topic == config.MQTT_TOPICS["order"]:
+            # 生成中のオーダーがあれば中断し、新しいオーダーを優先する
+            if self.generation_task is not None:
+                self.generation_task.cancel()
+            self.order_queue.put_nowait(payload)
+
+        return True
+
+    async def _command_worker(self, client):
+        """ 割り込み以外のコマンド (START / KACHAKA / AKARI / JOBS / LOOP / CANCEL / CACHE_CLEAR) を順に処理するワーカー """
+        while True:
+            payload = await self.command_queue.get()
+            try:
+                await self._handle_command(client, payload)
+            except Exception as e:
+                print(f"❌ コマンド処理中にエラーが発生しました ({payload}): {e}")
+
+    async def _handle_command(self, client, payload):
+        # ファイル指定実行 (START filename)
+        if payload.startswith("START "):
+            filename = payload.split()[1]
+            if await self.start_robot_task(filename):
+                await client.publish(config.MQTT_TOPICS["return"], f"Task started: {filename}")
+
+        # KACHAKA 直接操作
+        elif payload.startswith("KACHAKA "):
+            func_parts = payload.split()[1:]
+            await self.submit_job("manual", payload, lambda: self.manual_command(self.kachaka_client, client, func_parts))
+
+        # AKARI 直接操作
+        elif payload.startswith("AKARI "):
+            func_parts = payload.split()[1:]
+            await self.submit_job("manual", payload, lambda: self.manual_command(self.akari_client, client, func_parts))
+
+        # ジョブキューの状態 (JOBS)
+        elif payload == "JOBS":
+            snapshot = self.jobs.snapshot()
+            print(f"📋 {snapshot}")
+            await client.publish(config.MQTT_TOPICS["return"], f"Jobs: {snapshot}")
+
+        # イベントループの遅延 (LOOP)
+        elif payload == "LOOP":
+            snapshot = self.loop_monitor.snapshot()
+            akari_io = self.akari_client.io.stats
+            print(f"🐢 {snapshot} / Akari I/O: {akari_io}")
+            await client.publish(config.MQTT_TOPICS["return"], f"Loop: {snapshot} / Akari I/O: {akari_io}")
+
+        # ジョブのキャンセル (CANCEL <id>)
+        elif payload.startswith("CANCEL "):
+            job_id = payload.split()[1].lstrip("#")
+            if job_id.isdigit() and await self.jobs.cancel(int(job_id)):
+                await client.publish(config.MQTT_TOPICS["return"], f"Job cancelled: #{job_id}")
+            else:
+                await client.publish(config.MQTT_TOPICS["return"], f"ERROR: ジョブが見つかりません: {job_id}")
+
+        # LLM応答キャッシュの削除 (CACHE_CLEAR [task|talk])
+        elif payload.startswith("CACHE_CLEAR"):
+            parts = payload.split()
+            kind = parts[1] if len(parts) > 1 else None
+            removed = clear_response_cache(kind)
+            await client.publish(config.MQTT_TOPICS["return"], f"Cache cleared: {removed}")
+
+        else:
+            print(f"⚠️ 不明なコマンドです: {payload}")
+
+    async def _order_worker(self, client):
+        """ LLMオーダーを処理するワーカー (溜まっている場合は最新のオーダーだけを処理する) """
+        while True:
+            payload = await self.order_queue.get()
+            while not self.order_queue.empty():
+                print(f"⏭️  新しいオーダーが届いたため破棄します: {payload}")
+                payload = self.order_queue.get_nowait()
+
+            self.generation_task = asyncio.create_task(self._process_order(client, payload))
+            # 生成タスクがキャンセルされてもワーカー自体は止めない
+            await asyncio.wait([self.generation_task])
+
     async def main_loop(self):
         """ MQTTメッセージ受信のメインループ """
         if self.kachaka_client is None or self.akari_client is None:
             print("❌ クライアント初期化失敗のため終了します。")
             return
 
+        workers = []
         try:
             print(f"🔌 MQTTブローカー接続開始: {config.MQTT_BROKER}")
             async with aiomqtt.Client(config.MQTT_BROKER) as client:
@@ -174,6 +534,21 @@ class RobotClient:
                 await client.subscribe(config.MQTT_TOPICS["command"])
                 await client.subscribe(config.MQTT_TOPICS["order"])
 
+                # ジョブスケジューラ (受付状況は return トピックへ通知、割り込み時は STOP を送る)
+                self.jobs = JobScheduler(
+                    config.JOB_SCHEDULER["max_queue"],
+                    notify=lambda message: client.publish(config.MQTT_TOPICS["return"], message),
+                    preempt=lambda: self._handle_interrupt_command(client, "STOP"),
+                )
+
+                # ジョブ・コマンド・オーダーの処理ワーカーを起動 (受信ループとは独立して動く)
+                workers = [
+                    asyncio.create_task(self.jobs.run()),
+                    asyncio.create_task(self.loop_monitor.run()),
+                    asyncio.create_task(self._command_worker(client)),
+                    asyncio.create_task(self._order_worker(client)),
+                ]
+
                 print("📥 メッセージ待機中...")
 
                 async for message in client.messages:
@@ -181,70 +556,14 @@ class RobotClient:
                     payload = message.payload.decode()
                     print(f"\n📥 受信 [{topic}]: {payload}")
 
-                    # --- ステータス受信 ---
-                    if topic == config.MQTT_TOPICS["status"]:
-                        if payload == "fin":
-                            await self.akari_client.send_message_to_akari("finish")
-                        elif payload == "finish":
-                            return # プログラム終了
-
-                    # --- コマンド受信 (manager.py から) ---
-                    elif topic == config.MQTT_TOPICS["command"]:
-                        
-                        # ファイル指定実行 (START filename)
-                        if payload.startswith("START "):
-                            filename = payload.split()[1]
-                            await self.start_robot_task(filename)
-                            await client.publish(config.MQTT_TOPICS["return"], f"Task started: {filename}")
-
-                        # KACHAKA 直接操作
-                        elif payload.startswith("KACHAKA "):
-                            if not self.running_task.is_set():
-                                print("⚠️ 実行中のタスクを停止して割り込みます")
-                                await self._handle_interrupt_command(client, "STOP")
-                                await self.running_task.wait()
-                            
-                            func_parts = payload.split()[1:]
-                            asyncio.create_task(self.manual_command(self.kachaka_client, client, func_parts))
-
-                        # AKARI 直接操作
-                        elif payload.startswith("AKARI "):
-                            if not self.running_task.is_set():
-                                print("⚠️ 実行中のタスクを停止して割り込みます")
-                                await self._handle_interrupt_command(client, "STOP")
-                                await self.running_task.wait()
-
-                            func_parts = payload.split()[1:]
-                            asyncio.create_task(self.manual_command(self.akari_client, client, func_parts))
-
-                        # 割り込み指示 (STOP, PAUSE, RESUME, etc.)
-                        elif payload in ["STOP", "RESET", "PAUSE", "RESUME", "SKIP"]:
-                            # タスク実行中かどうかに関わらず、コマンド自体はメソッドとして存在するなら実行を試みる
-                            asyncio.create_task(self._handle_interrupt_command(client, payload))
-                            
-
-                    # --- LLM オーダー受信 ---
-                    elif topic == config.MQTT_TOPICS["order"]:
-                        if not self.running_task.is_set():
-                            print("🛑 タスク実行中のため、強制停止して新しいオーダーを処理します")
-                            await self._handle_interrupt_command(client, "STOP")
-                            await self.running_task.wait()
-
-                        print("🤖 1. 行動計画の生成中...")
-                        await asyncio.to_thread(task_generate.main, payload)
-                        
-                        print("💬 2. 会話スクリプトの生成中...")
-                        await asyncio.to_thread(talk_generate.main, payload)
-                        
-                        output_file = config.LLM_FINAL_SCRIPT_PATH
-                        print(f"✅ 生成完了。タスクを実行します: {output_file}")
-                        
-                        await client.publish(config.MQTT_TOPICS["return"], f"Generated & Starting: {output_file}")
-                        await self.start_robot_task(output_file)
+                    if not self._dispatch_message(client, topic, payload):
+                        return # プログラム終了
 
         except Exception as e:
             print(f"❌ main_loop で致命的なエラー: {e}")
         finally:
+            for worker in workers:
+                worker.cancel()
             print("プログラムを終了します")
 
 # アプリケーションのエントリーポイント
@@ -7,6 +7,8 @@ import asyncio
 import datetime
 from google.api_core import exceptions
 
+from tts_cache import TTSCache, tts_cache_key
+
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/xxxxxxxxxxx" 
 INTERRUPT_FILE = "/home/aitclab2011/AKARI_LLM/interrupt.flag" # 割り込みフラグファイルのパス
 RATE = 24000 # サンプリングレート　
@@ -15,9 +17,17 @@ SPEAKING_RATE = 1
 
 TIMEOUT = 5 # 音声変換のタイムアウト時間
 
+LANGUAGE_CODE = "ja-JP"
+VOICE_NAME = "ja-JP-Wavenet-A"
+
 SAVE_DIR = "/home/aitclab2011/AKARI_LLM/"
 TEXT_LOG_FILE = os.path.join(SAVE_DIR, "log_te" "axt.txt")
 
+# 音声キャッシュ (同じ文章・同じ声の設定なら、音声変換をせずに保存したPCMを再生する)
+CACHE_DIR = os.path.join(SAVE_DIR, "tts_cache")
+CACHE_MAX_BYTES = 200 * 1024 * 1024 # キャッシュの合計サイズの上限 (超えたら使われていない順に削除)
+audio_cache = TTSCache(CACHE_DIR, CACHE_MAX_BYTES)
+
 # 発話中かどうかを示すフラグ
 _is_speaking = False
 stop_speak_flag = False
@@ -62,14 +72,14 @@ async def synthesize_speech(text, speaking_rate=SPEAKING_RATE):
         return
     
     # 音声を再生
-    print("\UTF{2713} 音声再生を開始します")
+    print("✓ 音声再生を開始します")
     result = await play_audio(response.audio_content)
     if result == 0:
-        print("\UTF{2705} 音声再生が正常に完了しました")
+        print("✅ 音声再生が正常に完了しました")
     elif result == 1:
-        print("\CID{1931} stop命令により強制終了しました")
+        print("⏹️ stop命令により強制終了しました")
     else:
-        print("\UTF{274C} speak_audio.py -> 異常な終了をしました1")
+        print("❌ speak_audio.py -> 異常な終了をしました1")
     _is_speaking = False # 発話終了時にフラグを下ろす
     stop_speak_flag = False
     return result
@@ -82,73 +92,83 @@ async def synthesize_speech_2(text, speaking_rate=SPEAKING_RATE, max_retries = 3
     _is_speaking = True # 発話開始時にフラグを立てる
     stop_speak_flag = False
 
-    try:
-        # Google Cloud Text-to-Speech のクライアントを作成
-        client = texttospeech.TextToSpeechClient()
-
-        # 入力テキストを指定（読み上げたい文章）
-        input_text = texttospeech.SynthesisInput(text=text)
-
-        # 音声設定（日本語・話者「ja-JP-Wavenet-A」）
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="ja-JP",  # 日本語を指定
-            name="ja-JP-Wavenet-A"  # 特定の日本語話者を選択
-        )
-
-        # 音声出力の設定（LINEAR16形式、話す速さを指定）
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16,  # 無圧縮PCM形式
-            speaking_rate=speaking_rate,  # 話すスピード（1.0が標準）
-            sample_rate_hertz=RATE,
-            pitch=PITCH,
-        )
-
-        # 音声合成リクエストを送信し、レスポンス（音声データ）を取得
-        response = client.synthesize_speech(
-            input=input_text,
-            voice=voice,
-            audio_config=audio_config,
-            timeout=TIMEOUT,
-        )
-
-        # 音声データが空であればエラーメッセージを表示して終了
-        if not response.audio_content:
-            print("音声が生成されませんでした")
-            _is_speaking = False # 発話終了
-            return 2
+    # 同じ内容の音声がキャッシュにあれば、音声変換 (通信) をせずに再生する
+    cache_key = tts_cache_key(text, VOICE_NAME, speaking_rate, PITCH, RATE)
+    audio = audio_cache.open(cache_key)
+    if audio is not None:
+        print("💾 キャッシュした音声を再生します")
+    else:
+        try:
+            # Google Cloud Text-to-Speech のクライアントを作成
+            client = texttospeech.TextToSpeechClient()
+
+            # 入力テキストを指定（読み上げたい文章）
+            input_text = texttospeech.SynthesisInput(text=text)
+
+            # 音声設定（日本語・話者「ja-JP-Wavenet-A」）
+            voice = texttospeech.VoiceSelectionParams(
+                language_code=LANGUAGE_CODE,  # 日本語を指定
+                name=VOICE_NAME  # 特定の日本語話者を選択
+            )
+
+            # 音声出力の設定（LINEAR16形式、話す速さを指定）
+            audio_config = texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.LINEAR16,  # 無圧縮PCM形式
+                speaking_rate=speaking_rate,  # 話すスピード（1.0が標準）
+                sample_rate_hertz=RATE,
+                pitch=PITCH,
+            )
+
+            # 音声合成リクエストを送信し、レスポンス（音声データ）を取得
+            response = client.synthesize_speech(
+                input=input_text,
+                voice=voice,
+                audio_config=audio_config,
+                timeout=TIMEOUT,
+            )
+
+            # 音声データが空であればエラーメッセージを表示して終了
+            if not response.audio_content:
+                print("音声が生成されませんでした")
+                _is_speaking = False # 発話終了
+                return 2
         
     
-    except exceptions.DeadlineExceeded:
-        # タイムアウトした場合
-        print(f"\UTF{26A0} 音声変換の際にタイムアウトしました ({TIMEOUT}秒)")
-        return -1 
-    except Exception as e:
-        print(f"\UTF{274C} speak_audio.py -> error: {e}")
-        return 2
-    
-        
+        except exceptions.DeadlineExceeded:
+            # タイムアウトした場合
+            print(f"⚠ 音声変換の際にタイムアウトしました ({TIMEOUT}秒)")
+            return -1 
+        except Exception as e:
+            print(f"❌ speak_audio.py -> error: {e}")
+            return 2
+
+        audio = audio_cache.store(cache_key, response.audio_content)
+
     # 音声を再生
-    print("\UTF{2713} 音声再生を開始します")
-    result = await play_audio(response.audio_content)
+    print("✓ 音声再生を開始します")
+    try:
+        result = await play_audio(audio)
+    finally:
+        audio_cache.release(audio)
     if result == 0:
-        print("\UTF{2705} 音声再生が正常に完了しました")
+        print("✅ 音声再生が正常に完了しました")
     elif result == 1:
-        print("\CID{1931} stop命令により強制終了しました")
+        print("⏹️ stop命令により強制終了しました")
     elif result == -1:
         print("● timeoutError")
         return("timeout -> 強制終了しました")
     else:
-        print("\UTF{274C} speak_audio.py -> 異常な終了をしました")
+        print("❌ speak_audio.py -> 異常な終了をしました")
     _is_speaking = False # 発話終了時にフラグを下ろす
     stop_speak_flag = False
     return result
 
 
 
-async def synthesize_speech_from_mqtt(text):
+async def synthesize_speech_from_mqtt(text, correlation=None):
     result = await synthesize_speech_2(text)
     import __main__  # 呼び出し元のスクリプトから send_message を取る
-    __main__.send_message(result)
+    __main__.send_message(result, correlation) # リクエストの相関IDを付けて完了を返す
 
 
 
@@ -193,9 +213,9 @@ async def stop_speaking(timeout=None):
 
     if _is_speaking:
         stop_speak_flag = True
-        print("\CID{2452} ストップフラグを立てました")
+        print("🚩 ストップフラグを立てました")
     else:
-        print("\UTF{274C} 現在発話中の音声はありません。")
+        print("❌ 現在発話中の音声はありません。")
 
 # 以下はspeak_audio.pyを直接実行した場合のテスト用コードなので、
 # 他のスクリプトからimportして使う場合はコメントアウトまたは削除してください。
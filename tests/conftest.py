@@ -0,0 +1,8 @@
+"""
+    テスト共通設定 (リポジトリのルートを import パスに追加する)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,125 @@
+"""
+    job_scheduler.py のテスト (方針ごとの受付・割り込み・統合・拒否)
+"""
+
+import asyncio
+
+import pytest
+
+from job_scheduler import Job, JobScheduler
+
+
+class _Robot:
+    """ ジョブの実行順と、割り込み時に送られた STOP を記録する """
+
+    def __init__(self):
+        self.log = []
+        self.notices = []
+        self.stops = 0
+
+    def job(self, name, release=None):
+        async def run():
+            self.log.append(f"{name} start")
+            if release is not None:
+                await release.wait()
+            self.log.append(f"{name} end")
+        return run
+
+    async def notify(self, message):
+        self.notices.append(message)
+
+    async def stop(self):
+        self.stops += 1
+
+
+def _run(scenario):
+    async def main():
+        robot = _Robot()
+        jobs = JobScheduler(max_queue=2, notify=robot.notify, preempt=robot.stop)
+        worker = asyncio.create_task(jobs.run())
+        try:
+            await scenario(jobs, robot)
+        finally:
+            worker.cancel()
+        return jobs, robot
+    return asyncio.run(main())
+
+
+async def _until_started(robot, name):
+    while f"{name} start" not in robot.log:
+        await asyncio.sleep(0)
+
+
+async def _until_idle(jobs):
+    while jobs.is_busy():
+        await asyncio.sleep(0)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Job("start", "a", None, policy="later")
+
+
+def test_preempt_runs_before_queued_jobs():
+    async def scenario(jobs, robot):
+        hold = asyncio.Event()
+        await jobs.submit(Job("start", "A", robot.job("A", hold)))
+        await _until_started(robot, "A")
+        await jobs.submit(Job("start", "B", robot.job("B")))
+        await jobs.submit(Job("manual", "P", robot.job("P"), priority=2, policy="preempt"))
+        await _until_idle(jobs)
+
+    jobs, robot = _run(scenario)
+    # A は中断され、先に待っていた B より割り込んだ P が先に動く
+    assert robot.log == ["A start", "P start", "P end", "B start", "B end"]
+    assert robot.stops == 1
+    assert jobs.metrics["preempted"] == 1
+    assert jobs.metrics["cancelled"] == 1
+    assert jobs.metrics["completed"] == 2
+
+
+def test_preempt_when_idle_does_not_stop_the_robot():
+    async def scenario(jobs, robot):
+        await jobs.submit(Job("manual", "P", robot.job("P"), priority=2, policy="preempt"))
+        await _until_idle(jobs)
+
+    jobs, robot = _run(scenario)
+    assert robot.log == ["P start", "P end"]
+    assert robot.stops == 0
+
+
+def test_merge_replaces_the_queued_job_of_the_same_kind():
+    async def scenario(jobs, robot):
+        hold = asyncio.Event()
+        await jobs.submit(Job("start", "A", robot.job("A", hold)))
+        await _until_started(robot, "A")
+        await jobs.submit(Job("order", "old", robot.job("old"), policy="merge"))
+        assert await jobs.submit(Job("order", "new", robot.job("new"), policy="merge"))
+        assert [job.name for job in jobs.queued_jobs()] == ["new"]
+        hold.set()
+        await _until_idle(jobs)
+
+    jobs, robot = _run(scenario)
+    assert robot.log == ["A start", "A end", "new start", "new end"]
+    assert jobs.metrics["merged"] == 1
+
+
+def test_reject_when_busy_and_when_the_queue_is_full():
+    async def scenario(jobs, robot):
+        hold = asyncio.Event()
+        await jobs.submit(Job("start", "A", robot.job("A", hold)))
+        await _until_started(robot, "A")
+        assert not await jobs.submit(Job("start", "R", robot.job("R"), policy="reject"))
+        assert await jobs.submit(Job("start", "B", robot.job("B")))
+        assert await jobs.submit(Job("start", "C", robot.job("C")))
+        assert not await jobs.submit(Job("start", "D", robot.job("D")))
+        hold.set()
+        await _until_idle(jobs)
+        assert await jobs.submit(Job("start", "R", robot.job("R"), policy="reject"))
+        await _until_idle(jobs)
+
+    jobs, robot = _run(scenario)
+    assert [line for line in robot.log if line.endswith("start")] == ["A start", "B start", "C start", "R start"]
+    assert jobs.metrics["rejected"] == 2
+    assert any(notice.startswith("BUSY") for notice in robot.notices)
+    assert sum(notice.startswith("REJECTED") for notice in robot.notices) == 2
@@ -0,0 +1,79 @@
+"""
+    plan_scheduler.py のテスト (依存関係グラフと並行実行の段数)
+"""
+
+import asyncio
+
+from _robot_function.plan_scheduler import (
+    analyse_actions, analyse_statement, build_dependencies, run_plan_graph, schedule_depth, schedule_levels,
+)
+
+
+def _steps(*statements):
+    return build_dependencies([analyse_statement(i, st) for i, st in enumerate(statements)])
+
+
+def test_speech_before_move_runs_with_the_move():
+    steps = _steps(
+        'await b.speak_akari("冷蔵庫に行くね")',
+        'await a.move_to_location("冷蔵庫")',
+    )
+    assert schedule_levels(steps) == [1, 1]
+
+
+def test_speech_after_move_waits_for_the_move():
+    steps = _steps(
+        'await a.move_to_location("冷蔵庫")',
+        'await b.move_head([(0.1, 0.0)])',
+        'await b.speak_akari("冷蔵庫に着きました")',
+    )
+    assert schedule_levels(steps) == [1, 1, 2]
+    assert steps[2].depends_on == [0, 1]
+
+
+def test_speech_keeps_conversation_order_across_robots():
+    steps = _steps(
+        'await a.speak_kachaka("行くよ")',
+        'await b.speak_akari("うん")',
+    )
+    assert steps[1].depends_on == [0]
+
+
+def test_variables_and_barriers_keep_order():
+    steps = _steps(
+        'state = await a.state_object_kachaka()',
+        'await b.move_head([(0.1, 0.0)])',
+        'if state == "RUNNING":\n    await a.stop_task_kachaka()',
+        'await asyncio.sleep(1)',
+        'await b.move_head([(0.0, 0.0)])',
+    )
+    assert schedule_levels(steps) == [1, 1, 2, 3, 4]
+    assert schedule_depth(steps) == 4
+
+
+def test_action_plan_levels():
+    steps = build_dependencies(analyse_actions([
+        {"robot": "kachaka", "action": "move_to_location", "args": {"location_name": "冷蔵庫"}},
+        {"robot": "akari", "action": "speak_akari", "args": {"message": "着きました"}},
+        {"robot": "akari", "action": "move_head", "args": {"waypoints": [[0.1, 0.0]]}},
+    ]))
+    assert schedule_levels(steps) == [1, 2, 3]
+
+
+def test_run_plan_graph_runs_independent_steps_together():
+    steps = [analyse_statement(i, st) for i, st in enumerate([
+        'await b.speak_akari("出発するね")',
+        'await a.move_to_location("冷蔵庫")',
+        'await b.speak_akari("着きました")',
+    ])]
+    running, overlaps = set(), []
+
+    async def execute(step):
+        running.add(step.index)
+        overlaps.append(set(running))
+        await asyncio.sleep(0.01)
+        running.discard(step.index)
+
+    asyncio.run(run_plan_graph(steps, execute))
+    assert {0, 1} in overlaps
+    assert not any(2 in s and 1 in s for s in overlaps)
@@ -0,0 +1,79 @@
+"""
+    response_cache.py のテスト (キャッシュキーの安定性と、最終利用が古い順の削除)
+"""
+
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from _LLM import response_cache
+from _LLM.response_cache import ResponseCache, make_cache_key
+
+
+@pytest.fixture
+def prompt(tmp_path):
+    path = tmp_path / "prompt.txt"
+    path.write_text("ロボットへの指示", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 保存・参照の順序が時刻の分解能に左右されないように、呼ぶたびに1秒進む時計にする
+    ticks = itertools.count(1)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def _cache(tmp_path, max_entries=3, max_bytes=1024):
+    return ResponseCache(str(tmp_path / "cache" / "responses.sqlite3"), max_entries, max_bytes)
+
+
+def test_cache_key_is_stable(prompt):
+    key = make_cache_key("task", "冷蔵庫に行って", [prompt])
+    assert key == make_cache_key("task", "冷蔵庫に行って", [prompt])
+    # 全角/半角・空白の揺れは同じオーダーとして扱う
+    assert key == make_cache_key("task", "  冷蔵庫に行って\n", [prompt])
+    assert make_cache_key("task", "ＡＢＣ  123", []) == make_cache_key("task", "ABC 123", [])
+
+
+def test_cache_key_changes_with_its_inputs(prompt):
+    key = make_cache_key("task", "冷蔵庫に行って", [prompt])
+    assert key != make_cache_key("talk", "冷蔵庫に行って", [prompt])
+    assert key != make_cache_key("task", "玄関に行って", [prompt])
+    assert key != make_cache_key("task", "冷蔵庫に行って", [prompt], context="元の行動計画")
+    assert key != make_cache_key("task", "冷蔵庫に行って", [prompt], temperature=1.5)
+    prompt.write_text("変更したロボットへの指示", encoding="utf-8")
+    assert key != make_cache_key("task", "冷蔵庫に行って", [prompt])
+
+
+def test_get_and_clear(tmp_path, clock):
+    cache = _cache(tmp_path)
+    assert cache.get("a") is None
+    cache.put("a", "task", "await a.return_home()")
+    cache.put("b", "talk", 'await b.speak_akari("ただいま")')
+    assert cache.get("a") == "await a.return_home()"
+    assert cache.clear("talk") == 1
+    assert cache.get("b") is None
+    assert cache.clear() == 1
+
+
+def test_evicts_least_recently_used_entries(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", "task", "A")
+    cache.put("b", "task", "B")
+    cache.get("a")  # a を使ったので、b の方が古い
+    cache.put("c", "task", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_evicts_until_under_the_size_limit(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=10)
+    cache.put("a", "task", "x" * 4)
+    cache.put("b", "task", "y" * 4)
+    cache.put("c", "task", "z" * 4)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 4
+    assert cache.get("c") == "z" * 4
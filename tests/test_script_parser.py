@@ -0,0 +1,103 @@
+"""
+    script_parser.py のテスト (トップレベル文への分割と発話文の判定)
+"""
+
+from _LLM.script_parser import StatementStreamParser, is_talk_statement, split_statements, strip_talk_statements
+
+
+def _feed_in_chunks(code, size):
+    parser = StatementStreamParser()
+    statements = []
+    for i in range(0, len(code), size):
+        statements.extend(parser.feed(code[i:i + size]))
+    return statements + parser.close()
+
+
+SCRIPT = '''```python
+await a.move_to_location("冷蔵庫")
+await b.speak_akari("冷蔵庫に行くね")
+
+for place in ["玄関", "寝室"]:
+    await a.move_to_location(place)
+await a.return_home()
+```'''
+
+
+def test_split_statements():
+    assert split_statements(SCRIPT) == [
+        'await a.move_to_location("冷蔵庫")',
+        'await b.speak_akari("冷蔵庫に行くね")',
+        'for place in ["玄関", "寝室"]:\n    await a.move_to_location(place)',
+        'await a.return_home()',
+    ]
+
+
+def test_chunked_feed_gives_the_same_statements():
+    # 文の途中・行の途中で区切られた断片でも、まとめて渡した場合と同じ文になる
+    for size in (1, 3, 7, 64):
+        assert _feed_in_chunks(SCRIPT, size) == split_statements(SCRIPT)
+
+
+def test_statements_are_yielded_as_soon_as_they_are_complete():
+    parser = StatementStreamParser()
+    assert parser.feed('await a.move_to_location("冷蔵庫")') == []
+    assert parser.feed('\nif ok:\n    await a.return_home()\n') == ['await a.move_to_location("冷蔵庫")']
+    # ブロック文はインデントが戻るまで確定しない
+    assert parser.feed('await a.speak_kachaka("完了")\n') == ['if ok:\n    await a.return_home()', 'await a.speak_kachaka("完了")']
+    assert parser.close() == []
+
+
+def test_try_else_is_one_statement():
+    code = (
+        'try:\n'
+        '    await a.move_to_location("冷蔵庫")\n'
+        'except Exception:\n'
+        '    await a.speak_kachaka("失敗しました")\n'
+        'else:\n'
+        '    await a.speak_kachaka("着きました")\n'
+        'finally:\n'
+        '    await a.return_home()\n'
+        'await b.speak_akari("おわり")'
+    )
+    statements = split_statements(code)
+    assert len(statements) == 2
+    assert statements[0].startswith("try:") and statements[0].endswith("await a.return_home()")
+    assert statements[1] == 'await b.speak_akari("おわり")'
+
+
+def test_triple_quoted_string_spanning_lines():
+    # 文字列の中にある、インデントなしの行・コメント風の行・継続キーワードで分割しない
+    code = (
+        'message = """\n'
+        'else:\n'
+        '# 文字列の一部\n'
+        'await a.return_home()\n'
+        '"""\n'
+        'await a.speak_kachaka(message)'
+    )
+    assert split_statements(code) == [
+        'message = """\nelse:\n# 文字列の一部\nawait a.return_home()\n"""',
+        'await a.speak_kachaka(message)',
+    ]
+    assert _feed_in_chunks(code, 2) == split_statements(code)
+
+
+def test_keep_comments_attaches_comments_to_the_next_statement():
+    code = '# 冷蔵庫へ\nawait a.move_to_location("冷蔵庫")\n# 最後のコメント'
+    assert split_statements(code) == ['await a.move_to_location("冷蔵庫")']
+    assert split_statements(code, keep_comments=True) == [
+        '# 冷蔵庫へ\nawait a.move_to_location("冷蔵庫")',
+        '# 最後のコメント',
+    ]
+
+
+def test_talk_statements():
+    assert is_talk_statement('await b.speak_akari("こんにちは")')
+    assert is_talk_statement('a.speak_kachaka("こんにちは")')
+    assert not is_talk_statement('await a.move_to_location("冷蔵庫")')
+    assert not is_talk_statement('if ok:\n    await b.speak_akari("こんにちは")')
+    assert strip_talk_statements(SCRIPT) == (
+        'await a.move_to_location("冷蔵庫")\n'
+        'for place in ["玄関", "寝室"]:\n    await a.move_to_location(place)\n'
+        'await a.return_home()'
+    )
@@ -0,0 +1,112 @@
+"""
+    tts_cache.py
+    【Akari本体用】speak_audio.py が使う音声キャッシュ
+    一度変換した音声を、文章と声の設定のハッシュをキーにしたPCMファイル (16bit モノラル) として保存する
+    音声ライブラリに依存しないため、Akari本体以外でも読み込んで確認できる
+"""
+
+import hashlib
+import json
+import mmap
+import os
+
+SAMPLE_WIDTH = 2 # LINEAR16 の1サンプルのバイト数
+
+
+def tts_cache_key(text, voice, speaking_rate, pitch, sample_rate):
+    """ 文章と声の設定から、キャッシュのキー (内容のハッシュ) を作る """
+    source = json.dumps([text, voice, speaking_rate, pitch, sample_rate], ensure_ascii=False)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def pcm_from_wav(content):
+    """ LINEAR16 の応答 (WAVヘッダ付き) から、PCMのデータ部分だけを取り出す (サンプルの途中で切れていれば切り詰める) """
+    if content[:4] == b"RIFF" and content[8:12] == b"WAVE":
+        pos = 12
+        while pos + 8 <= len(content):
+            chunk_id = content[pos:pos + 4]
+            size = int.from_bytes(content[pos + 4:pos + 8], "little")
+            if chunk_id == b"data":
+                content = content[pos + 8:pos + 8 + size]
+                break
+            pos += 8 + size + (size & 1)
+    return content[:len(content) - len(content) % SAMPLE_WIDTH]
+
+
+class TTSCache:
+    """ PCMファイルの音声キャッシュ (合計サイズの上限を超えたら使われていない順に削除) """
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        cache_dir: キャッシュを保存するディレクトリ
+        max_bytes: キャッシュの合計サイズの上限 [バイト]
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def open(self, key):
+        """ キャッシュがあればPCMをメモリマップして返す (無い・壊れている場合は None) """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError): # 無い・空のファイル
+            return None
+        if len(audio) % SAMPLE_WIDTH:
+            # サンプルの途中で切れたファイルは再生できないため、削除して変換し直す
+            audio.close()
+            print(f"⚠️ 壊れた音声キャッシュを削除します: {path}")
+            self._remove(path)
+            return None
+        os.utime(path) # 最近使った順に残すため、更新時刻を使用時刻にする
+        return audio
+
+    @staticmethod
+    def release(audio):
+        """ open で開いたメモリマップを閉じる """
+        if isinstance(audio, mmap.mmap):
+            try:
+                audio.close()
+            except BufferError:
+                pass # 再生用の配列がまだ参照している場合は、参照が無くなったときに解放される
+
+    def store(self, key, audio_content):
+        """ 音声をPCMとしてキャッシュに保存し、保存したPCMを返す (保存に失敗しても再生はできる) """
+        pcm = pcm_from_wav(audio_content)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(pcm)
+            os.replace(tmp_path, path) # 書き込み途中のファイルを読まないように置き換える
+            self.evict()
+        except OSError as e:
+            print(f"⚠️ 音声キャッシュの保存に失敗しました: {e}")
+            self._remove(tmp_path) # 書きかけのファイルを残さない
+        return pcm
+
+    def evict(self):
+        """ 合計サイズが上限を超えていれば、使われていない順に削除する """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pcm"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False